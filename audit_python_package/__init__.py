@@ -1,68 +1,173 @@
 from __future__ import unicode_literals
 
-import codecs
-from six.moves.configparser import ConfigParser
+from contextlib import contextmanager
 import os
+import sys
+
+from audit_python_package.file_cache import FileCache
+from audit_python_package.policy import VersionPolicy
+from audit_python_package.requirements import DependencyOrder, RequirementsGraph
+from audit_python_package.scanner import RuleSet  # noqa: F401 (re-exported for check modules)
+from audit_python_package.timing import timed
+from audit_python_package.versions import LazyVersions, load_versions, preferred_value
 
 DATA_DIRECTORY_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), 'data'))
 
+#: Cache of file content shared by all of the file helper functions below
+FILE_CACHE = FileCache()
+
+#: Parsed requirements files and the include relationships between them
+REQUIREMENTS_GRAPH = RequirementsGraph(FILE_CACHE)
+
+#: The fixture functions defined by each module of checks, keyed by module
+#: name and then fixture name; each value is a (function, scope) pair
+FIXTURES = {}
+
+
+def fixture(scope='function'):
+    """Decorator for the fixtures used by the checks.  Registers the function
+    for use by the native check engine, and also makes it a pytest fixture if
+    pytest is running (without importing pytest when it isn't)."""
+    def decorator(function):
+        FIXTURES.setdefault(function.__module__, {})[function.__name__] = (function, scope)
+        pytest = sys.modules.get('pytest')
+        if pytest is not None:
+            return pytest.fixture(scope=scope)(function)
+        return function
+    return decorator
+
 
 def parse_config_file(path):
-    """Get the parsed content of an INI-style config file (using ConfigParser)"""
-    config = ConfigParser()
-    if os.path.exists(path):
-        config.read(path)
-    return config
+    """Get the parsed content of an INI-style config file (using ConfigParser).
+    The returned object may be shared with other callers, so don't modify it."""
+    cached = FILE_CACHE.get(path)
+    if cached is None:
+        from six.moves.configparser import ConfigParser
+        return ConfigParser()
+    with timed('parse', path):
+        return cached.config
+
+
+@contextmanager
+def file_source(source):
+    """Context manager which makes the file helper functions read files from
+    the given FileSource (like a GitTreeSource) instead of the filesystem"""
+    previous = FILE_CACHE.source
+    FILE_CACHE.source = source
+    try:
+        yield source
+    finally:
+        FILE_CACHE.source = previous
+
+
+def file_exists(path):
+    """Determine if there is a file or directory at the specified path"""
+    return FILE_CACHE.source.exists(path)
+
+
+def is_executable(path):
+    """Determine if there is a file with execute permission at the specified
+    path"""
+    return FILE_CACHE.source.is_executable(path)
+
+
+def list_directory(path):
+    """Get the sorted names of the entries in the directory at the specified
+    path, or an empty list if there is no such directory"""
+    return FILE_CACHE.source.list_directory(path)
 
 
 def get_file_content(path):
     """Get the content of the UTF-8 text file at the specified path.
     Used for pytest fixtures."""
-    if not os.path.exists(path):
+    cached = FILE_CACHE.get(path)
+    if cached is None:
         return ''
-    with codecs.open(path, 'r', 'utf-8') as f:
-        return f.read()
+    return cached.text
 
 
 def get_file_lines(path):
     """Get a list of the lines in the UTF-8 text file at the specified path.
     Strips leading and trailing whitespace from each line.
     Used for pytest fixtures."""
-    if not os.path.exists(path):
+    cached = FILE_CACHE.get(path)
+    if cached is None:
         return []
-    with codecs.open(path, 'r', 'utf-8') as f:
-        return [line.strip() for line in f.readlines()]
+    return list(cached.lines)
+
+
+def get_requirements(path):
+    """Get the Requirements parsed from a requirements file, including those
+    from any other requirements files it includes"""
+    with timed('parse', path):
+        return REQUIREMENTS_GRAPH.requirements(path)
 
 
 def get_requirement_lines(path):
-    """Get the lines from a requirements file (or any other requirements file
-    it includes) which contain a requirement specification."""
-    lines = get_file_lines(path)
-    result = []
-    for line in lines:
-        if line.startswith('#'):
-            continue
-        if line.startswith('-r') or line.startswith('--requirement'):
-            base_dir = os.path.dirname(path)
-            sub_path = os.path.join(base_dir, line.split()[-1])
-            result.extend(get_requirement_lines(sub_path))
-            continue
-        if '==' not in line:
-            continue
-        line = line.partition(';')[0].strip()
-        result.append(line)
-    return result
+    """Get the ``name==version`` lines for the requirements in a requirements
+    file (or any other requirements file it includes) which are pinned to a
+    single version."""
+    with timed('parse', path):
+        return REQUIREMENTS_GRAPH.requirement_lines(path)
+
+
+def get_requirements_index(path):
+    """Get a RequirementsIndex of the requirement lines in a requirements file
+    (and any others it includes), for fast lookups by line or package name.
+    Used for pytest fixtures."""
+    with timed('parse', path):
+        return REQUIREMENTS_GRAPH.requirements_index(path)
+
+
+def get_requirements_digest(path):
+    """Get a digest of the content of a requirements file and any others it
+    includes, for telling if any of them changed since it was installed"""
+    return REQUIREMENTS_GRAPH.digest(path)
+
+
+def get_setup_model(path='setup.py'):
+    """Get the SetupModel of the setup.py script at the specified path,
+    parsed without running it.  Used for pytest fixtures."""
+    from audit_python_package.setup_model import parse_setup
+    with timed('parse', path):
+        return parse_setup(get_file_content(path))
+
+
+def validate_readme(path='README.rst'):
+    """Get a (valid, warnings) pair describing whether the README at the
+    specified path renders without warnings as reStructuredText on PyPI.
+    Results are cached by content, so an unchanged README isn't rendered
+    again (see the readme module).  Used for pytest fixtures."""
+    from audit_python_package.readme import ReadmeCache
+    cached = FILE_CACHE.get(path)
+    if cached is None:
+        return False, 'There is no {}'.format(path)
+    with timed('render', path):
+        return ReadmeCache().validate(cached.content)
+
+
+def get_dependency_order():
+    """Get the DependencyOrder constraints listed in data/dependency_order.txt.
+    Used for pytest fixtures."""
+    return DependencyOrder.parse(get_file_lines(os.path.join(DATA_DIRECTORY_PATH, 'dependency_order.txt')))
 
 
 def _get_versions_dict():
     """Parse the preferred versions list in data/requirements.txt into a
     dictionary for ease of use in tests"""
     path = os.path.join(DATA_DIRECTORY_PATH, 'requirements.txt')
-    lines = get_requirement_lines(path)
-    result = {}
-    for line in lines:
-        name, version = (part.strip() for part in line.split('=='))
-        result[name] = version
-    return result
-
-VERSIONS = _get_versions_dict()
+    with timed('parse', path):
+        return {requirement.name: preferred_value(requirement.specifier)
+                for requirement in REQUIREMENTS_GRAPH.requirements(path) if requirement.specifier}
+
+
+def _load_versions():
+    with timed('load', 'VERSIONS'):
+        return load_versions(_get_versions_dict)
+
+
+#: Preferred versions of packages, loaded on first use
+VERSIONS = LazyVersions(_load_versions)
+
+#: Evaluates pinned requirements against the preferred versions in VERSIONS
+VERSION_POLICY = VersionPolicy(VERSIONS)
@@ -6,15 +6,30 @@
 
 from __future__ import print_function, unicode_literals
 
+import argparse
+import codecs
+from collections import namedtuple
+import json
+from multiprocessing.pool import ThreadPool
 import os
 import re
-from subprocess import CalledProcessError, check_output, STDOUT
+from subprocess import call, CalledProcessError, check_output, STDOUT
 import sys
 
-from audit_python_package import get_file_content
+from six import string_types
 
+from audit_python_package import FILE_CACHE, file_source, get_file_content, get_requirements_digest
+from audit_python_package.report import (count_outcomes, format_report, is_success, merge_results, PASSED,
+                                         read_results, write_results)
+from audit_python_package.timing import RECORDER, timed
 
-def upload_requirements():
+
+#: The outcome of uploading the requirements files for one repository and
+#: branch in a bulk upload; ``error`` is None if the upload succeeded
+BulkUploadResult = namedtuple('BulkUploadResult', ['root', 'repository', 'branch', 'error'])
+
+
+def upload_requirements(args=None):
     """
     Command line utility to upload requirements files to requires.io.  Can't do
     this easily via tox commands because it doesn't have good support for using
@@ -23,8 +38,35 @@ def upload_requirements():
     variable has been set to the requires.io API access token, and that it's
     being run from the project's root directory (the parent of the
     ``requirements`` directory).
+
+    Alternatively, the root directories of any number of repositories can be
+    given (each optionally followed by ``@`` and the name of the branch to
+    upload the files as, which defaults to the repository's current branch).
+    The uploads for all of them are then performed concurrently, and any
+    failures are reported at the end instead of stopping at the first one.
     """
+    parser = argparse.ArgumentParser(prog='upload_requirements', description=upload_requirements.__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('targets', metavar='ROOT[@BRANCH]', nargs='*',
+                        help='root directory of a repository to upload requirements for')
+    parser.add_argument('-j', '--jobs', type=int, default=8,
+                        help='maximum number of concurrent uploads (default: %(default)s)')
+    parser.add_argument('--api-url', default=None, help='base URL of the requires.io API')
+    options = parser.parse_args(args)
     verify_requires_token()
+    if options.targets:
+        targets = [_parse_upload_target(target) for target in options.targets]
+        results = upload_branches(targets, os.getenv('REQUIRES_TOKEN'), options.jobs, options.api_url)
+        failed = False
+        for result in results:
+            if result.error:
+                failed = True
+                print('FAILED {} ({} {}): {}'.format(result.root, result.repository, result.branch, result.error))
+            else:
+                print('Uploaded {} ({} {})'.format(result.root, result.repository, result.branch))
+        if failed:
+            sys.exit(1)
+        return
     repository_name = get_repository_name()
     update_repo(repository_name)
     branch_name = get_branch_name()
@@ -42,31 +84,46 @@ def verify_requires_token():
 
 def get_repository_name():
     """Get the name of the repository from setup.py"""
-    setup = get_file_content('setup.py')
-    match = re.search(r'name=[\'"]([^\'"]+)[\'"]', setup)
-    if not match:
+    name = find_repository_name(get_file_content('setup.py'))
+    if not name:
         print('Could not find repository name in setup.py')
         sys.exit(1)
     else:
-        return match.group(1)
+        return name
+
+
+def find_repository_name(setup):
+    """Find the name of the repository in the given setup.py content, or
+    return None if it can't be found"""
+    from audit_python_package.setup_model import parse_setup
+    model = parse_setup(setup)
+    if model.syntax_error:
+        # Probably Python 2 only syntax, which can't be parsed here
+        match = re.search(r'name=[\'"]([^\'"]+)[\'"]', setup)
+        return match.group(1) if match else None
+    name = model.name
+    return name if isinstance(name, string_types) and name else None
 
 
 def get_branch_name():
     """Get the name of the current git branch"""
     try:
-        return check_output(['git', 'rev-parse', '--abbrev-ref', 'HEAD'], universal_newlines=True).strip()
+        with timed('subprocess', 'git rev-parse'):
+            return check_output(['git', 'rev-parse', '--abbrev-ref', 'HEAD'], universal_newlines=True).strip()
     except Exception as e:
         print('Error getting current git branch: {}'.format(e))
         print(e.output)
         sys.exit(1)
 
 
-def requirements_file_paths():
+def requirements_file_paths(root='.', listdir=None):
     """List the paths relative to the project root of all requirements files
     that should be uploaded to requires.io.  Excludes
-    ``requirements/uninstall.txt``."""
+    ``requirements/uninstall.txt``.  The ``requirements`` directory is listed
+    with ``listdir`` (like a FileSource's list_directory method) if given,
+    or os.listdir() otherwise."""
     paths = []
-    for filename in os.listdir('requirements'):
+    for filename in (listdir or os.listdir)(os.path.join(root, 'requirements')):
         if len(filename) < 5 or filename[-4:] != '.txt' or filename == 'uninstall.txt':
             continue
         path = os.path.join('requirements', filename)
@@ -77,8 +134,9 @@ def requirements_file_paths():
 def update_repo(repository_name):
     """Create or update a private repository entry in requires.io"""
     try:
-        output = check_output(['requires.io', 'update-repo', '--repository', repository_name, '--private'],
-                              stderr=STDOUT, universal_newlines=True)
+        with timed('subprocess', 'requires.io update-repo'):
+            output = check_output(['requires.io', 'update-repo', '--repository', repository_name, '--private'],
+                                  stderr=STDOUT, universal_newlines=True)
         print(output)
     except CalledProcessError as e:
         print('Unable to create or update {} on requires.io'.format(repository_name))
@@ -93,9 +151,528 @@ def update_branch(repository_name, branch_name, paths):
     for path in paths:
         args.append(path)
     try:
-        output = check_output(args, stderr=STDOUT, universal_newlines=True)
+        with timed('subprocess', 'requires.io update-branch'):
+            output = check_output(args, stderr=STDOUT, universal_newlines=True)
         print(output)
     except CalledProcessError as e:
         print('Unable to update branch {} on requires.io'.format(branch_name))
         print(e.output)
         sys.exit(1)
+
+
+def upload_branches(targets, token, jobs=8, api_url=None):
+    """
+    Upload the requirements files for many repositories and branches to
+    requires.io, using up to ``jobs`` concurrent requests.  ``targets`` is a
+    sequence of (root directory, branch name) pairs; if the branch name is
+    None, the repository's current branch is used.  Each repository is
+    created or updated once, then each of its branches is uploaded.  Returns
+    a list of BulkUploadResults in the same order as ``targets``; failures
+    are recorded in them rather than aborting the remaining uploads.
+    """
+    from requires_io.api import RequiresAPI
+    api = RequiresAPI(token, api_url) if api_url else RequiresAPI(token)
+    if not targets:
+        return []
+    pool = ThreadPool(max(1, min(jobs, len(targets))))
+    try:
+        prepared = pool.map(_prepare_upload, targets)
+        names = sorted({result.repository for result, paths in prepared if not result.error})
+        errors = pool.map(lambda name: _call_api(api.update_repository, name, True), names)
+        repository_errors = dict(zip(names, errors))
+
+        def upload(item):
+            result, paths = item
+            if result.error:
+                return result
+            error = repository_errors[result.repository]
+            if error:
+                return result._replace(error='Unable to create or update {} on requires.io: {}'.format(
+                    result.repository, error))
+            error = _call_api(api.update_branch, result.repository, result.branch, paths)
+            if error:
+                return result._replace(error='Unable to update branch {} on requires.io: {}'.format(
+                    result.branch, error))
+            return result
+        return pool.map(upload, prepared)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _parse_upload_target(target):
+    """Split a ROOT[@BRANCH] command line argument into its parts"""
+    if '@' not in target:
+        return target, None
+    root, _, branch = target.rpartition('@')
+    return root, branch
+
+
+def _prepare_upload(target):
+    """Determine the repository name, branch name, and requirements files to
+    upload for a (root directory, branch name) pair"""
+    root, branch = target
+    result = BulkUploadResult(root, None, branch, None)
+    repository = find_repository_name(get_file_content(os.path.join(root, 'setup.py')))
+    if not repository:
+        return result._replace(error='Could not find repository name in setup.py'), None
+    result = result._replace(repository=repository)
+    try:
+        if not branch:
+            with timed('subprocess', 'git rev-parse'):
+                branch = check_output(['git', 'rev-parse', '--abbrev-ref', 'HEAD'], cwd=root,
+                                      stderr=STDOUT, universal_newlines=True).strip()
+            result = result._replace(branch=branch)
+        paths = {os.path.abspath(os.path.join(root, path)): path.replace(os.sep, '/')
+                 for path in requirements_file_paths(root)}
+    except (CalledProcessError, OSError) as e:
+        return result._replace(error=getattr(e, 'output', None) or str(e)), None
+    return result, paths
+
+
+def _call_api(method, *args):
+    """Call a requires.io API method, returning a description of the error if
+    it fails (or None if it succeeds)"""
+    try:
+        method(*args)
+    except Exception as e:
+        return str(e) or e.__class__.__name__
+    return None
+
+
+#: Name of the file in the environment's ``sys.prefix`` directory recording the
+#: digest of each requirements file installed by install_requirements
+INSTALLED_REQUIREMENTS_STAMP = 'installed-requirements.json'
+
+
+def install_requirements(args=None):
+    """
+    Command line utility to install requirements files with pip, skipping any
+    file whose content (and that of any requirements files it includes)
+    hasn't changed since it was last installed successfully in the current
+    environment.  Intended for use in tox.ini, so repeated tox runs don't
+    spend most of their time in pip confirming that nothing needs to be
+    installed.  Any other options are passed on to pip; options which take a
+    value must be given as ``--option=value``.
+    """
+    parser = argparse.ArgumentParser(prog='install_requirements', description=install_requirements.__doc__)
+    parser.add_argument('paths', metavar='PATH', nargs='+', help='requirements file to install')
+    parser.add_argument('--stamp', metavar='PATH', default=os.path.join(sys.prefix, INSTALLED_REQUIREMENTS_STAMP),
+                        help='file recording the digests of the installed requirements files '
+                             '(default: %(default)s)')
+    options, pip_args = parser.parse_known_args(args)
+    installed = {}
+    if os.path.exists(options.stamp):
+        try:
+            with codecs.open(options.stamp, 'r', 'utf-8') as f:
+                installed = json.loads(f.read())
+        except ValueError:
+            # Corrupt or partially written; just reinstall everything
+            pass
+    status = 0
+    for path in options.paths:
+        key = os.path.abspath(path)
+        digest = get_requirements_digest(path)
+        if installed.get(key) == digest:
+            print('{} is unchanged since it was installed'.format(path))
+            continue
+        command = [sys.executable, '-m', 'pip', 'install', '--disable-pip-version-check', '--requirement', path]
+        with timed('subprocess', 'pip install'):
+            status = call(command + pip_args)
+        if status:
+            installed.pop(key, None)
+            break
+        installed[key] = digest
+    temp_path = options.stamp + '.tmp'
+    with codecs.open(temp_path, 'w', 'utf-8') as f:
+        f.write(json.dumps(installed, indent=1, sort_keys=True))
+    getattr(os, 'replace', os.rename)(temp_path, options.stamp)
+    if status:
+        sys.exit(status)
+
+
+def audit_fleet(args=None):
+    """
+    Command line utility to audit many repositories at once.  Each repository
+    root given on the command line is audited in a pool of worker processes
+    (one per CPU core by default), and a single merged report is printed when
+    they have all finished.  A root may be followed by ``@`` and a git
+    revision to audit that revision's files instead of the working directory.
+    Exits with a non-zero status if any check failed in any repository.
+    With ``--pin-matrix``, the requirements listed by every repository are
+    also saved for later queries with ``audit_pins``.  With ``--shard I/N``,
+    only the I-th of N deterministic, cost-balanced portions of the checks
+    is run, so the audit can be split across machines and the saved results
+    combined with ``audit_merge``.
+    """
+    parser = argparse.ArgumentParser(prog='audit_fleet', description=audit_fleet.__doc__)
+    parser.add_argument('roots', metavar='ROOT[@REV]', nargs='+',
+                        help='root directory of a repository to audit, optionally with a git revision to audit')
+    parser.add_argument('-j', '--processes', type=int, default=None,
+                        help='number of worker processes (default: number of CPU cores)')
+    parser.add_argument('-k', dest='keyword', default=None,
+                        help='only run checks matching the given keyword expression')
+    parser.add_argument('--json', dest='json_path', default=None,
+                        help='also save the merged results as JSON to the given path')
+    parser.add_argument('--pin-matrix', metavar='PATH', default=None,
+                        help='also save the requirements of every repository to the given SQLite file')
+    parser.add_argument('--shard', metavar='I/N', default=None,
+                        help='only run the I-th of N portions of the (repository, check) pairs')
+    parser.add_argument('--shard-timings', metavar='PATH', default=None,
+                        help='balance the shards using check times saved by --audit-timings-json')
+    parser.add_argument('--audit-timings-json', metavar='PATH', default=None,
+                        help='save timing data for all audit operations to a JSON file')
+    options = parser.parse_args(args)
+    from audit_python_package.fleet import audit_repositories
+    roots, check_ids = options.roots, None
+    if options.shard:
+        check_ids = _shard_check_ids(parser, options)
+        roots = [root for root in options.roots if root in check_ids]
+    order = {root: index for index, root in enumerate(options.roots)}
+    pins = {} if options.pin_matrix else None
+    timings = RECORDER if options.audit_timings_json else None
+    if timings is not None:
+        timings.clear()
+    results = []
+    for repository_results in audit_repositories(roots, options.processes, options.keyword, pins, check_ids,
+                                                 timings):
+        results.extend(repository_results)
+    results.sort(key=lambda result: order.get(result.repository, len(order)))
+    format_report(results)
+    if options.json_path:
+        write_results(results, options.json_path)
+    if options.pin_matrix:
+        from audit_python_package.pin_matrix import PinMatrix
+        PinMatrix.build(pins).save(options.pin_matrix)
+    if timings is not None:
+        timings.dump(options.audit_timings_json)
+    if not is_success(results):
+        sys.exit(1)
+
+
+def _shard_check_ids(parser, options):
+    """Get the identifiers of the checks to run against each repository in
+    the shard selected by the ``audit_fleet`` options, as a dictionary of sets
+    keyed by root"""
+    from audit_python_package.engine import CheckEngine
+    from audit_python_package.sharding import load_check_costs, parse_shard, shard_units
+    try:
+        index, count = parse_shard(options.shard)
+    except ValueError as e:
+        parser.error(str(e))
+    costs = None
+    if options.shard_timings:
+        try:
+            costs = load_check_costs(options.shard_timings)
+        except (IOError, OSError, ValueError, KeyError) as e:
+            parser.error('Unable to read timing data from {}: {}'.format(options.shard_timings, e))
+    checks = CheckEngine().checks(options.keyword)
+    units = [(root, check.id) for root in options.roots for check in checks]
+    check_ids = {}
+    for root, check_id in shard_units(units, index, count, costs):
+        check_ids.setdefault(root, set()).add(check_id)
+    return check_ids
+
+
+def audit_merge(args=None):
+    """
+    Command line utility to combine the results saved by ``audit_fleet
+    --json`` in separate runs (like the shards of a sharded audit) into a
+    single report.  Exits with a non-zero status if any check failed in any
+    repository, or if the runs reported different outcomes for the same
+    check.
+    """
+    parser = argparse.ArgumentParser(prog='audit_merge', description=audit_merge.__doc__)
+    parser.add_argument('paths', metavar='RESULTS', nargs='+', help='path of a JSON file saved by audit_fleet --json')
+    parser.add_argument('--json', dest='json_path', default=None,
+                        help='also save the merged results as JSON to the given path')
+    options = parser.parse_args(args)
+    from audit_python_package.engine import CheckEngine
+    try:
+        result_lists = [read_results(path) for path in options.paths]
+        order = [check.id for check in CheckEngine().checks()]
+        results = merge_results(result_lists, order)
+    except (IOError, OSError, TypeError, ValueError) as e:
+        print(e)
+        sys.exit(2)
+    format_report(results)
+    if options.json_path:
+        write_results(results, options.json_path)
+    if not is_success(results):
+        sys.exit(1)
+
+
+def audit_pins(args=None):
+    """
+    Command line utility to query the requirements of many repositories, as
+    saved by ``audit_fleet --pin-matrix``.  Lists each requirement of the
+    given package (or with ``--drift``, of every package) as the repository,
+    requirements file, and requirement, optionally limited to those pinned
+    below a version or to versions which don't match the preferred version
+    policy.  Without a package or ``--drift``, summarizes the saved matrix.
+    """
+    parser = argparse.ArgumentParser(prog='audit_pins', description=audit_pins.__doc__)
+    parser.add_argument('matrix', metavar='MATRIX', help='path of the file saved by audit_fleet --pin-matrix')
+    parser.add_argument('package', metavar='PACKAGE', nargs='?', default=None,
+                        help='name of the package to list the requirements of')
+    parser.add_argument('--below', metavar='VERSION', default=None,
+                        help='only list pins of the package to versions lower than this one')
+    parser.add_argument('--drift', action='store_true', default=False,
+                        help='only list pins to versions which don\'t match the preferred version policy')
+    options = parser.parse_args(args)
+    if options.below and not options.package:
+        parser.error('--below requires a PACKAGE')
+    from audit_python_package.pin_matrix import PinMatrix
+    try:
+        matrix = PinMatrix.load(options.matrix)
+    except ValueError as e:
+        print(e)
+        sys.exit(2)
+    if options.package is None and not options.drift:
+        print('{} requirements of {} packages in {} repositories'.format(
+            len(matrix), len(matrix.packages), len(matrix.repositories)))
+        return
+    if options.below:
+        from packaging.version import InvalidVersion
+        try:
+            pins = matrix.below(options.package, options.below)
+        except InvalidVersion:
+            parser.error('Invalid version for --below: {}'.format(options.below))
+    else:
+        pins = matrix.pins(options.package)
+    if options.drift:
+        from audit_python_package import VERSION_POLICY
+        drifted = set(matrix.drift(VERSION_POLICY, options.package))
+        pins = [pin for pin in pins if pin in drifted]
+    for repository, path, name, specifier in pins:
+        print('{} {} {}{}'.format(repository, path, name, specifier))
+
+
+def audit_package(args=None):
+    """
+    Command line utility to run the audit checks against a repository (the
+    current directory by default) without the overhead of running them via
+    pytest.  With ``--rev``, the files are read from the given git revision
+    instead of the working directory, so no checkout is needed.  A built
+    source distribution or wheel can also be audited, without extracting it.
+    Prints any failures followed by a summary, and exits with a non-zero
+    status if any check failed.  With ``--watch``, keeps running and re-runs
+    the affected checks whenever one of the audited files changes.  With
+    ``--all-packages``, finds and audits every package in the repository.
+    """
+    parser = argparse.ArgumentParser(prog='audit_package', description=audit_package.__doc__)
+    parser.add_argument('root', metavar='ROOT', nargs='?', default='.',
+                        help='root directory of the repository (or path of the sdist or wheel) to audit '
+                             '(default: current directory)')
+    parser.add_argument('-k', dest='keyword', default=None,
+                        help='only run checks matching the given keyword expression')
+    parser.add_argument('--json', dest='json_path', default=None,
+                        help='also save the results as JSON to the given path')
+    parser.add_argument('--rev', dest='revision', default=None,
+                        help='audit the given git commit, branch, or tag instead of the working directory')
+    parser.add_argument('--incremental', action='store_true', default=False,
+                        help='only run checks whose input files changed since they last passed')
+    parser.add_argument('--audit-cache-dir', default=None,
+                        help='directory for saving results between incremental runs (default: ROOT/.audit_cache)')
+    parser.add_argument('--audit-timings', type=int, metavar='N', default=None,
+                        help='show the N slowest checks, fixtures, and other audit operations')
+    parser.add_argument('--audit-timings-json', metavar='PATH', default=None,
+                        help='save timing data for all audit operations to a JSON file')
+    parser.add_argument('--watch', action='store_true', default=False,
+                        help='keep running, and re-run the checks affected by each change to the audited files')
+    parser.add_argument('--all-packages', action='store_true', default=False,
+                        help='audit every package (directory containing a setup.py) under ROOT')
+    options = parser.parse_args(args)
+    from audit_python_package.engine import CheckEngine
+    timing = options.audit_timings is not None or options.audit_timings_json
+    if timing:
+        RECORDER.clear()
+        RECORDER.enabled = True
+    from audit_python_package.sources import source_for
+    engine = CheckEngine()
+    source, root = source_for(options.root, options.revision)
+    try:
+        checks = engine.checks(options.keyword)
+        if source is not None:
+            source.verify()
+    except ValueError as e:
+        print(e)
+        sys.exit(2)
+    if source is not None and (options.watch or options.all_packages):
+        source.close()
+        print('--{} can only be used to audit a working directory'.format(
+            'watch' if options.watch else 'all-packages'))
+        sys.exit(2)
+    if options.watch:
+        if options.all_packages:
+            print('--watch can only be used to audit a single package')
+            sys.exit(2)
+        _watch(engine, checks, root, options.keyword)
+        return
+    if options.all_packages:
+        from audit_python_package.discovery import find_package_roots
+        packages = find_package_roots(root)
+        if not packages:
+            print('No packages found in {}'.format(options.root))
+            sys.exit(2)
+    else:
+        packages = ['.']
+    if options.incremental:
+        from audit_python_package.incremental import DEFAULT_CACHE_DIRECTORY, Fingerprinter, ResultStore
+    unchanged = 0
+    cache_directories = []
+    results = []
+    try:
+        with file_source(source or FILE_CACHE.source):
+            for package in packages:
+                package_root = root if package == '.' else os.path.join(root, package)
+                repository = options.root if package == '.' else os.path.join(options.root, package)
+                package_checks = checks
+                if options.incremental:
+                    store = ResultStore(os.path.normpath(os.path.join(options.audit_cache_dir, package))
+                                        if options.audit_cache_dir else
+                                        os.path.join(package_root, DEFAULT_CACHE_DIRECTORY))
+                    fingerprinter = Fingerprinter(package_root, options.keyword)
+                    fingerprints = {name: fingerprinter.fingerprint(name)
+                                    for name in {check.module_name for check in checks}}
+                    package_checks = [check for check in checks
+                                      if not store.is_unchanged(check.id, fingerprints[check.module_name])]
+                    unchanged += len(checks) - len(package_checks)
+                    cache_directories.append(store.directory)
+                with timed('audit', repository):
+                    package_results = engine.run(package_root, options.keyword, package_checks, repository=repository,
+                                                 source=source)
+                if options.incremental:
+                    for check, result in zip(package_checks, package_results):
+                        store.record(check.id, fingerprints[check.module_name], result.outcome == PASSED)
+                    store.save()
+                results.extend(package_results)
+    finally:
+        if source is not None:
+            source.close()
+    if options.all_packages:
+        format_report(results)
+    else:
+        for result in results:
+            if result.outcome != PASSED:
+                print(_result_line(result))
+        counts = count_outcomes(results)
+        summary = ', '.join('{} {}'.format(count, outcome) for outcome, count in counts.items() if count)
+        print(summary or 'no checks run')
+    if unchanged:
+        print('{} checks skipped: unchanged since they last passed (cache in {})'.format(
+            unchanged, ', '.join(os.path.abspath(directory) for directory in cache_directories)))
+    if timing:
+        if options.audit_timings:
+            RECORDER.format_table(options.audit_timings)
+        if options.audit_timings_json:
+            RECORDER.dump(options.audit_timings_json)
+        RECORDER.enabled = False
+    if options.json_path:
+        write_results(results, options.json_path)
+    if not is_success(results):
+        sys.exit(1)
+
+
+def _watch(engine, checks, root, keyword=None):
+    """Run the checks, then re-run those affected by each change to the
+    files they read until interrupted; exits with a non-zero status if any
+    checks were failing at the time"""
+    from audit_python_package.watch import Watcher
+    watcher = Watcher(engine, checks, root, keyword)
+
+    def report(changed, results, elapsed):
+        if changed:
+            print('{} changed: re-ran {} checks in {:.3f}s'.format(', '.join(changed), len(results), elapsed))
+        else:
+            print('Ran {} checks in {:.3f}s'.format(len(results), elapsed))
+        for result in watcher.failures():
+            print(_result_line(result))
+        counts = count_outcomes(watcher.current_results())
+        summary = ', '.join('{} {}'.format(count, outcome) for outcome, count in counts.items() if count)
+        print(summary or 'no checks run')
+        print('Watching for changes (press Ctrl+C to stop)')
+        sys.stdout.flush()
+    try:
+        watcher.watch(report)
+    except KeyboardInterrupt:
+        pass
+    if not is_success(watcher.current_results()):
+        sys.exit(1)
+
+
+def audit_history(args=None):
+    """
+    Command line utility to audit each commit in a range of a git repository's
+    history (like ``v1.0..master``, following only the first parent of merge
+    commits) without checking any of them out.  Prints the failures at the
+    first commit, then each commit at which a check started or stopped
+    failing.  With ``--bisect``, instead finds the first commit at which any
+    of the checks matching ``-k`` fails.
+    """
+    parser = argparse.ArgumentParser(prog='audit_history', description=audit_history.__doc__)
+    parser.add_argument('revision_range', metavar='RANGE', help='range of git revisions to audit')
+    parser.add_argument('-C', dest='repository', default='.',
+                        help='root directory of the git repository (default: current directory)')
+    parser.add_argument('-k', dest='keyword', default=None,
+                        help='only run checks matching the given keyword expression')
+    parser.add_argument('--bisect', action='store_true', default=False,
+                        help='find the first commit at which any of the selected checks fails')
+    parser.add_argument('--json', dest='json_path', default=None,
+                        help='also save the results for every audited commit as JSON to the given path')
+    parser.add_argument('--no-cache', action='store_true', default=False,
+                        help="don't load or save results in the repository's .audit_cache directory")
+    options = parser.parse_args(args)
+    from audit_python_package.history import HistoryAudit, list_commits
+    try:
+        commits = list_commits(options.revision_range, options.repository)
+    except CalledProcessError:
+        print('Unable to list the commits in {}'.format(options.revision_range))
+        sys.exit(2)
+    try:
+        audit = HistoryAudit(options.repository, options.keyword, False if options.no_cache else None)
+    except ValueError as e:
+        print(e)
+        sys.exit(2)
+    all_results = []
+    with audit:
+        if options.bisect:
+            commit, failures = audit.bisect(commits)
+            all_results.extend(failures)
+            if commit is None:
+                print('No failures at the last commit in {}'.format(options.revision_range))
+            else:
+                if commit is commits[0]:
+                    print('Already failing at the first commit in {}:'.format(options.revision_range))
+                else:
+                    print('First failing commit:')
+                print('{} {}'.format(commit.id, commit.subject))
+                for result in failures:
+                    print('    ' + _result_line(result))
+        else:
+            failing = None
+            for commit, results in audit.scan(commits):
+                all_results.extend(results)
+                now_failing = [result for result in results if result.outcome != PASSED]
+                if failing is None:
+                    print('{} {}'.format(commit.id[:10], commit.subject))
+                    print('    {}'.format(', '.join('{} {}'.format(count, outcome) for outcome, count
+                                                    in count_outcomes(results).items() if count)))
+                    lines = [_result_line(result) for result in now_failing]
+                else:
+                    now_failing_checks = {result.check for result in now_failing}
+                    lines = [_result_line(result) for result in now_failing if result.check not in failing]
+                    lines.extend('FIXED {}'.format(check) for check in sorted(failing - now_failing_checks))
+                    if lines:
+                        print('{} {}'.format(commit.id[:10], commit.subject))
+                for line in lines:
+                    print('    ' + line)
+                failing = {result.check for result in now_failing}
+        print('{} commits audited, {} of them using only earlier results'.format(audit.audited, audit.reused))
+    if options.json_path:
+        write_results(all_results, options.json_path)
+
+
+def _result_line(result):
+    """Describe a check result which didn't pass in one line"""
+    return '{} {}: {}'.format(result.outcome.upper(), result.check, result.message)
@@ -0,0 +1,59 @@
+# encoding: utf-8
+"""
+Finding the packages to audit in a repository which contains more than one
+(each with its own ``setup.py``, ``tox.ini``, ``requirements`` directory,
+and so on).  The tree is walked once, skipping the same directories that
+pytest is told not to search for tests (see ``norecursedirs`` in the tox.ini
+checks); every directory containing a ``setup.py`` is a package root.  The
+packages are then audited one after another in the same process, so files
+they share (like a common requirements file included via ``-r ../``) are
+only read and parsed once.
+"""
+
+from __future__ import unicode_literals
+
+from fnmatch import fnmatch
+import os
+
+#: Names of directories which can't contain a package root
+PRUNED_DIRECTORIES = ('.*', 'docs', 'requirements', 've')
+
+#: The file which marks the root directory of a package
+PACKAGE_MARKER = 'setup.py'
+
+
+def _is_pruned(name):
+    return any(fnmatch(name, pattern) for pattern in PRUNED_DIRECTORIES)
+
+
+def _scan_directory(path):
+    """Get the names of the files and of the subdirectories in a directory"""
+    files, directories = [], []
+    scandir = getattr(os, 'scandir', None)
+    try:
+        if scandir is not None:
+            for entry in scandir(path):
+                (directories if entry.is_dir(follow_symlinks=False) else files).append(entry.name)
+        else:
+            for name in os.listdir(path):
+                full_path = os.path.join(path, name)
+                (directories if os.path.isdir(full_path) and not os.path.islink(full_path) else files).append(name)
+    except OSError:
+        pass
+    return files, directories
+
+
+def find_package_roots(root='.'):
+    """Get the sorted paths (relative to ``root``, so ``.`` for the root
+    itself) of the package root directories in the tree at ``root``.
+    Symbolic links to directories aren't followed."""
+    roots = []
+    pending = ['']
+    while pending:
+        relative = pending.pop()
+        path = os.path.join(root, relative) if relative else root
+        files, directories = _scan_directory(path)
+        if PACKAGE_MARKER in files:
+            roots.append(relative or '.')
+        pending.extend(os.path.join(relative, name) for name in directories if not _is_pruned(name))
+    return sorted(roots)
@@ -0,0 +1,254 @@
+# encoding: utf-8
+"""
+A lightweight runner for the audit checks which doesn't need pytest.  Most
+checks are only a line or two of code, so when the audit is run via pytest
+nearly all of the time goes to importing pytest and its plugins and to
+collecting the test modules.  The engine instead imports the check modules
+directly, finds the checks in them by the same naming conventions pytest
+uses (``test_*`` functions, and ``test_*`` methods of ``Test*`` classes), and
+passes each one the fixtures named by its arguments.
+
+The check modules remain ordinary pytest test modules, so the audit can still
+be run either way with the same results.
+"""
+
+from __future__ import unicode_literals
+
+import os
+import re
+import sys
+import traceback
+
+from audit_python_package import FILE_CACHE, FIXTURES, file_source
+from audit_python_package.incremental import CHECK_INPUTS, TESTS_DIRECTORY_PATH
+from audit_python_package.report import CheckResult, ERROR, FAILED, PASSED
+from audit_python_package.timing import timed
+
+#: The modules of checks run by the engine, in the order they're run.  The
+#: other test modules in the tests directory are the package's own unit tests.
+CHECK_MODULES = sorted(CHECK_INPUTS)
+
+_KEYWORD_TOKEN = re.compile(r'\(|\)|[^\s()]+')
+_KEYWORD_OPERATORS = ('and', 'or', 'not', '(', ')')
+
+
+class Check(object):
+    """A single check found in one of the check modules"""
+
+    __slots__ = ('id', 'module_name', 'cls', 'function', 'argnames', 'lineno')
+
+    def __init__(self, module_name, cls, function):
+        self.module_name = module_name
+        self.cls = cls
+        self.function = function
+        code = function.__code__
+        self.argnames = code.co_varnames[:code.co_argcount]
+        if cls is not None:
+            self.argnames = self.argnames[1:]
+            self.id = '{}::{}::{}'.format(module_name, cls.__name__, function.__name__)
+        else:
+            self.id = '{}::{}'.format(module_name, function.__name__)
+        self.lineno = code.co_firstlineno
+
+    @property
+    def keywords(self):
+        """The names a keyword expression can match this check by"""
+        return self.id.lower().split('::')
+
+    def __repr__(self):
+        return '<Check {}>'.format(self.id)
+
+
+def keyword_matcher(expression):
+    """Get a function which tests whether a check matches a pytest-style
+    keyword expression like ``tox and not python_35``; each name in the
+    expression matches a check if it's a case-insensitive substring of the
+    check's module, class, or function name"""
+    if not expression:
+        return lambda check: True
+    tokens = _KEYWORD_TOKEN.findall(expression)
+
+    def matches(check):
+        keywords = check.keywords
+        parts = []
+        for token in tokens:
+            if token in _KEYWORD_OPERATORS:
+                parts.append(token)
+            else:
+                parts.append(repr(any(token.lower() in keyword for keyword in keywords)))
+        try:
+            return eval(' '.join(parts), {'__builtins__': {}}, {})
+        except SyntaxError:
+            raise ValueError('Invalid keyword expression: {}'.format(expression))
+    return matches
+
+
+def _import_module(name, path):
+    """Import a check module from its file without adding it to sys.modules"""
+    try:
+        from importlib.util import module_from_spec, spec_from_file_location
+    except ImportError:
+        import imp
+        module = imp.load_source(name, path)
+        del sys.modules[name]
+        return module
+    spec = spec_from_file_location(name, path)
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _find_checks(module_name, module, fixtures):
+    """List the checks in an imported module, in definition order"""
+    checks = []
+    for name, value in vars(module).items():
+        if name in fixtures:
+            continue
+        if name.startswith('test') and hasattr(value, '__code__'):
+            checks.append(Check(module_name, None, value))
+        elif name.startswith('Test') and isinstance(value, type):
+            for method_name, method in vars(value).items():
+                if method_name.startswith('test') and hasattr(method, '__code__'):
+                    checks.append(Check(module_name, value, method))
+    checks.sort(key=lambda check: check.lineno)
+    return checks
+
+
+def _failure_message(exc_info):
+    """Summarize an exception raised by a check or fixture in one line,
+    including the line of code which raised it"""
+    exc_type, exc, tb = exc_info
+    message = ''.join(traceback.format_exception_only(exc_type, exc)).strip().splitlines()[-1]
+    frames = traceback.extract_tb(tb)
+    if frames:
+        filename, lineno, _, line = frames[-1]
+        message = '{} ({}:{}: {})'.format(message, os.path.basename(filename), lineno, (line or '').strip())
+    return message
+
+
+class _FixtureError(Exception):
+    """Raised in place of the original error when a fixture fails"""
+
+
+class _Config(object):
+    """The part of pytest's ``pytestconfig`` fixture available to checks run
+    by the engine: the keyword expression selecting the checks, as
+    ``getoption('keyword')``"""
+
+    def __init__(self, keyword=None):
+        self.keyword = keyword or ''
+
+    def getoption(self, name, default=None):
+        return self.keyword if name == 'keyword' else default
+
+
+class CheckEngine(object):
+    """Finds and runs the audit checks.  The check modules are imported only
+    once, so a single engine can efficiently audit several repositories (or
+    the same repository repeatedly)."""
+
+    def __init__(self, module_names=None, directory=TESTS_DIRECTORY_PATH):
+        self.module_names = list(module_names or CHECK_MODULES)
+        self.directory = directory
+        self._modules = {}
+
+    def load(self, module_name, reload=False):
+        """Import the named check module (if it hasn't been already), and
+        return a (checks, fixtures) pair for it"""
+        if reload or module_name not in self._modules:
+            name = '_audit_checks.' + module_name[:-3]
+            with timed('import', module_name):
+                module = _import_module(name, os.path.join(self.directory, module_name))
+            fixtures = FIXTURES.pop(name, {})
+            self._modules[module_name] = (_find_checks(module_name, module, fixtures), fixtures)
+        return self._modules[module_name]
+
+    def checks(self, keyword=None):
+        """List the checks matching the given keyword expression (or all of
+        them, if there is none)"""
+        matches = keyword_matcher(keyword)
+        result = []
+        for module_name in self.module_names:
+            result.extend(check for check in self.load(module_name)[0] if matches(check))
+        return result
+
+    def run(self, root='.', keyword=None, checks=None, repository=None, source=None):
+        """Run the checks (by default, all of those matching the keyword
+        expression) against the repository at the given path, returning a
+        list of CheckResults.  The keyword expression is also available to
+        the checks through the ``pytestconfig`` fixture, as under pytest.  ``repository`` is the name to report results
+        under, which defaults to ``root``.  The repository's files are read
+        from ``source`` (like a GitTreeSource), if given."""
+        if checks is None:
+            checks = self.checks(keyword)
+        repository = root if repository is None else repository
+        original_directory = os.getcwd()
+        os.chdir(root)
+        try:
+            with file_source(source or FILE_CACHE.source):
+                return self._run_checks(checks, repository, keyword)
+        finally:
+            os.chdir(original_directory)
+
+    def _run_checks(self, checks, repository, keyword):
+        results = []
+        session_cache = {'pytestconfig': (True, _Config(keyword))}
+        by_module = []
+        for check in checks:
+            if not by_module or by_module[-1][0] != check.module_name:
+                by_module.append((check.module_name, []))
+            by_module[-1][1].append(check)
+        for module_name, module_checks in by_module:
+            fixtures = self.load(module_name)[1]
+            caches = {'session': session_cache, 'package': session_cache, 'module': {}}
+            current_class = None
+            for check in module_checks:
+                if check.cls is not current_class:
+                    current_class = check.cls
+                    caches['class'] = {}
+                caches['function'] = {}
+                results.append(self._run_check(check, fixtures, caches, repository))
+        return results
+
+    def _run_check(self, check, fixtures, caches, repository):
+        try:
+            args = [self._fixture_value(name, fixtures, caches, ()) for name in check.argnames]
+        except _FixtureError as e:
+            return CheckResult(repository, check.id, ERROR, str(e))
+        function = check.function
+        if check.cls is not None:
+            function = function.__get__(check.cls(), check.cls)
+        try:
+            with timed('check', check.id):
+                function(*args)
+        except Exception:
+            return CheckResult(repository, check.id, FAILED, _failure_message(sys.exc_info()))
+        return CheckResult(repository, check.id, PASSED, '')
+
+    def _fixture_value(self, name, fixtures, caches, requested_by):
+        """Get the value of the named fixture, calling it (and any fixtures it
+        depends on) only if it hasn't been for its scope yet"""
+        if name not in fixtures:
+            if name in caches['session']:
+                # Built in, like pytestconfig
+                return caches['session'][name][1]
+            raise _FixtureError('Unknown fixture {}'.format(name))
+        if name in requested_by:
+            raise _FixtureError('Recursive dependency on fixture {}'.format(name))
+        function, scope = fixtures[name]
+        cache = caches.get(scope, caches['function'])
+        if name not in cache:
+            code = function.__code__
+            try:
+                args = [self._fixture_value(argname, fixtures, caches, requested_by + (name,))
+                        for argname in code.co_varnames[:code.co_argcount]]
+                with timed('fixture', name):
+                    cache[name] = (True, function(*args))
+            except _FixtureError as e:
+                cache[name] = (False, e)
+            except Exception:
+                cache[name] = (False, _FixtureError('{} in fixture {}'.format(_failure_message(sys.exc_info()), name)))
+        succeeded, value = cache[name]
+        if not succeeded:
+            raise value
+        return value
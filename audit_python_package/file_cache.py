@@ -0,0 +1,103 @@
+# encoding: utf-8
+"""
+A cache of file content shared by the helper functions used to load the
+files being audited, so that each file is only read from disk once no matter
+how many fixtures (or audited repositories sharing a file) need it.  Entries
+are validated against the file's modification time and size on each access,
+so edits made while the cache is in use are picked up automatically.  Files
+can also be read from other sources, like a git tree (see the sources
+module).
+"""
+
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+import io
+import threading
+
+from audit_python_package.sources import WorkingTreeSource
+
+
+class CachedFile(object):
+    """The content of a single file, decoded as UTF-8 text (and split into
+    lines or parsed as an INI file) only when first requested"""
+
+    __slots__ = ('content', '_text', '_lines', '_config')
+
+    def __init__(self, content):
+        self.content = content
+        self._text = None
+        self._lines = None
+        self._config = None
+
+    @property
+    def text(self):
+        """The file content as a Unicode string"""
+        if self._text is None:
+            self._text = self.content.decode('utf-8')
+        return self._text
+
+    @property
+    def lines(self):
+        """The lines of the file, with leading and trailing whitespace
+        stripped from each one"""
+        if self._lines is None:
+            self._lines = [line.strip() for line in self.text.splitlines()]
+        return self._lines
+
+    @property
+    def config(self):
+        """The file parsed as an INI-style config file.  This object is
+        shared between callers, so it should not be modified."""
+        if self._config is None:
+            from six.moves.configparser import ConfigParser
+            config = ConfigParser()
+            if hasattr(config, 'read_string'):
+                config.read_string(self.text)
+            else:
+                config.readfp(io.StringIO(self.text))
+            self._config = config
+        return self._config
+
+
+class FileCache(object):
+    """Least-recently-used cache of file content read from a FileSource (by
+    default, the filesystem).  For files on the filesystem, entries are keyed
+    on each file's absolute path, modification time, and size."""
+
+    def __init__(self, maxsize=256, source=None):
+        self.maxsize = maxsize
+        self.source = source or WorkingTreeSource()
+        self.bytes_read = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """Get the CachedFile for the file at the specified path, reading it
+        from the source only if it isn't cached or has changed since it was.
+        Returns None if there is no such file."""
+        source = self.source
+        key = source.cache_key(path)
+        if key is None:
+            return None
+        identity, version = key
+        with self._lock:
+            entry = self._entries.pop(identity, None)
+            if entry is not None and entry[0] == version:
+                self._entries[identity] = entry
+                return entry[1]
+        content = source.read(path)
+        if content is None:
+            return None
+        cached = CachedFile(content)
+        with self._lock:
+            self.bytes_read += len(content)
+            self._entries[identity] = (version, cached)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return cached
+
+    def clear(self):
+        """Discard all cached file content"""
+        with self._lock:
+            self._entries.clear()
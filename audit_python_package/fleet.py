@@ -0,0 +1,123 @@
+# encoding: utf-8
+"""
+Support for auditing many repositories from a single command.  The audit of
+each repository is run in a pool of worker processes (one per core by
+default); each worker imports the check modules once and then runs them
+against one repository after another with the native check engine, so the
+startup cost is paid per worker rather than per repository.
+"""
+
+from __future__ import print_function, unicode_literals
+
+from collections import OrderedDict
+import multiprocessing
+import os
+
+from audit_python_package.report import CheckResult, ERROR
+from audit_python_package.timing import RECORDER
+
+
+#: The check engine used by this process; created when first needed, so that
+#: the check modules are only imported once per worker
+_ENGINE = None
+
+
+def _get_engine():
+    global _ENGINE
+    if _ENGINE is None:
+        from audit_python_package.engine import CheckEngine
+        _ENGINE = CheckEngine()
+    return _ENGINE
+
+
+def _initialize_worker():
+    """Import everything needed to run the audit once per worker process"""
+    _get_engine().checks()
+
+
+def audit_repository(target, keyword=None, pins=None, check_ids=None):
+    """Run the audit checks (optionally only those matching a keyword
+    expression, or with identifiers in ``check_ids``) against a repository,
+    returning a list of CheckResults.  ``target`` is the path to the
+    repository's root directory, optionally followed by ``@`` and a git
+    revision to audit instead of the working directory.  The path of a source distribution or wheel may be given
+    instead, to audit the package archive without extracting it.  If
+    ``pins`` is a list, the requirements listed in the repository's
+    requirements files (as from pin_matrix.read_pins()) are added to it."""
+    from audit_python_package.sources import is_archive, source_for
+    path, revision = _parse_target(target)
+    if not os.path.isdir(path) and not (is_archive(path) and not revision):
+        return [CheckResult(target, '', ERROR, 'Not a directory')]
+    engine = _get_engine()
+    source, root = source_for(path, revision)
+    try:
+        checks = engine.checks(keyword)
+        if check_ids is not None:
+            checks = [check for check in checks if check.id in check_ids]
+        if source is not None:
+            source.verify()
+        results = engine.run(root, keyword, checks, repository=target, source=source)
+        if pins is not None:
+            from audit_python_package.pin_matrix import read_pins
+            pins.extend(read_pins(root, source))
+        return results
+    except ValueError as e:
+        return [CheckResult(target, '', ERROR, str(e))]
+    finally:
+        if source is not None:
+            source.close()
+
+
+def _parse_target(target):
+    """Split a ROOT[@REVISION] audit target into its parts"""
+    if '@' not in target or os.path.exists(target):
+        return target, None
+    root, _, revision = target.rpartition('@')
+    return root, revision
+
+
+def _audit_repository_args(args):
+    target, keyword, collect_pins, check_ids, collect_timings = args
+    pins = [] if collect_pins else None
+    if not collect_timings:
+        return target, audit_repository(target, keyword, pins, check_ids), pins, None
+    RECORDER.clear()
+    RECORDER.enabled = True
+    try:
+        results = audit_repository(target, keyword, pins, check_ids)
+        return target, results, pins, OrderedDict(RECORDER.totals)
+    finally:
+        RECORDER.enabled = False
+        RECORDER.clear()
+
+
+def audit_repositories(roots, processes=None, keyword=None, pins=None, check_ids=None, timings=None):
+    """Audit each of the repositories at the given paths (or ROOT@REVISION
+    targets, as for audit_repository()) in a pool of worker processes,
+    yielding the list of CheckResults for each repository as it completes.
+    ``processes`` defaults to the number of CPU cores.  If ``pins`` is a
+    dictionary, the requirements listed by each repository are stored in it
+    keyed by target, for building a PinMatrix.  If ``check_ids`` is a
+    dictionary, only the checks with the identifiers it lists for each
+    target are run (as for one shard of a sharded audit).  If ``timings`` is
+    a TimingRecorder, the timing samples taken in the worker processes are
+    added to it."""
+    if not roots:
+        return
+    processes = min(processes or multiprocessing.cpu_count(), len(roots))
+    pool = multiprocessing.Pool(processes, initializer=_initialize_worker)
+    try:
+        tasks = [(root, keyword, pins is not None, None if check_ids is None else check_ids.get(root, ()),
+                  timings is not None) for root in roots]
+        for target, results, repository_pins, totals in pool.imap_unordered(_audit_repository_args, tasks):
+            if pins is not None:
+                pins[target] = repository_pins
+            if timings is not None:
+                timings.merge(totals)
+            yield results
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
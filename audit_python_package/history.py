@@ -0,0 +1,217 @@
+# encoding: utf-8
+"""
+Auditing the history of a git repository.  Each commit in a range is audited
+by reading its files from the git object store (see sources.GitTreeSource),
+without checking anything out.  Most commits don't touch any of the files
+the checks read, so each module of checks is only run when the fingerprint
+of its inputs (computed from the tree entries' blob IDs, without reading the
+blobs) is one it hasn't seen before; otherwise the results for the earlier
+commit with the same fingerprint are reused.  The results for each
+fingerprint are also saved in the audit cache directory for later runs.
+
+This makes it practical both to scan a long history for changes in which
+checks pass, and to bisect for the commit where a check started failing.
+"""
+
+from __future__ import unicode_literals
+
+import codecs
+import json
+import os
+from subprocess import check_output
+
+from audit_python_package import file_source
+from audit_python_package.engine import CheckEngine
+from audit_python_package.incremental import CHECK_INPUTS, DEFAULT_CACHE_DIRECTORY, Fingerprinter, referenced_paths
+from audit_python_package.report import CheckResult, FAILED, ERROR
+from audit_python_package.sources import GitTreeSource
+from audit_python_package.timing import timed
+
+
+class Commit(object):
+    """A commit in the range being audited"""
+
+    __slots__ = ('id', 'tree_id', 'subject')
+
+    def __init__(self, id, tree_id, subject):
+        self.id = id
+        self.tree_id = tree_id
+        self.subject = subject
+
+    def __repr__(self):
+        return '<Commit {} {}>'.format(self.id[:10], self.subject)
+
+
+def list_commits(revision_range, repository='.'):
+    """List the commits in a revision range (like ``v1.0..master``), oldest
+    first, following only the first parent of merge commits"""
+    with timed('subprocess', 'git log'):
+        output = check_output(['git', 'log', '--first-parent', '--reverse', '--format=%H %T %s',
+                               revision_range, '--'], cwd=repository, universal_newlines=True)
+    commits = []
+    for line in output.splitlines():
+        parts = line.split(' ', 2)
+        commits.append(Commit(parts[0], parts[1], parts[2] if len(parts) > 2 else ''))
+    return commits
+
+
+class HistoryCache(object):
+    """Results of checks keyed by the fingerprint of their module's inputs,
+    optionally saved as a JSON file in the audit cache directory"""
+
+    def __init__(self, directory=None):
+        self.path = os.path.join(directory, 'history.json') if directory else None
+        self.directory = directory
+        self.results = {}
+        if self.path and os.path.exists(self.path):
+            try:
+                with codecs.open(self.path, 'r', 'utf-8') as f:
+                    self.results = json.loads(f.read())
+            except ValueError:
+                # Corrupt or partially written; just start over
+                pass
+        self.changed = False
+
+    def get(self, fingerprint, check_ids):
+        """Get a dictionary of (outcome, message) pairs keyed by check ID for
+        the given checks, or None if they aren't all known"""
+        known = self.results.get(fingerprint)
+        if known is None or not all(check_id in known for check_id in check_ids):
+            return None
+        return {check_id: known[check_id] for check_id in check_ids}
+
+    def add(self, fingerprint, results):
+        """Record the results of running checks with the given fingerprint"""
+        known = self.results.setdefault(fingerprint, {})
+        for result in results:
+            known[result.check] = [result.outcome, result.message]
+        self.changed = True
+
+    def save(self):
+        """Write the results to the cache directory, if there is one"""
+        if not self.path or not self.changed:
+            return
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+            with codecs.open(os.path.join(self.directory, '.gitignore'), 'w', 'utf-8') as f:
+                f.write('*\n')
+        temp_path = self.path + '.tmp'
+        with codecs.open(temp_path, 'w', 'utf-8') as f:
+            f.write(json.dumps(self.results, sort_keys=True))
+        getattr(os, 'replace', os.rename)(temp_path, self.path)
+        self.changed = False
+
+
+class HistoryAudit(object):
+    """Audits commits of the git repository at the given path.  Only the
+    checks matching ``keyword`` are run, if it's given.  Results are saved
+    between runs in ``cache_directory`` (by default, ``.audit_cache`` in the
+    repository), unless it's False."""
+
+    def __init__(self, repository='.', keyword=None, cache_directory=None, engine=None):
+        self.repository = repository
+        self.engine = engine or CheckEngine()
+        self.keyword = keyword
+        self.checks = self.engine.checks(keyword)
+        self.modules = []
+        for check in self.checks:
+            if not self.modules or self.modules[-1][0] != check.module_name:
+                self.modules.append((check.module_name, []))
+            self.modules[-1][1].append(check)
+        if cache_directory is None:
+            cache_directory = os.path.join(repository, DEFAULT_CACHE_DIRECTORY)
+        self.cache = HistoryCache(cache_directory or None)
+        self.source = GitTreeSource('HEAD', repository)
+        self.fingerprinter = Fingerprinter(repository, keyword)
+        self._fingerprints = {}
+        self.audited = 0
+        self.reused = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Save the cached results and stop the git process"""
+        self.cache.save()
+        self.source.close()
+
+    def audit(self, commit):
+        """Audit a single commit, returning a list of CheckResults reported
+        under the commit ID"""
+        self.source.set_revision(commit.id, commit.tree_id)
+        results = []
+        reused = True
+        with file_source(self.source):
+            for module_name, checks in self.modules:
+                fingerprint = self._fingerprint(module_name)
+                known = self.cache.get(fingerprint, [check.id for check in checks])
+                if known is None:
+                    reused = False
+                    module_results = self.engine.run(self.repository, self.keyword, checks, repository=commit.id,
+                                                     source=self.source)
+                    self.cache.add(fingerprint, module_results)
+                    results.extend(module_results)
+                else:
+                    results.extend(CheckResult(commit.id, check.id, known[check.id][0], known[check.id][1])
+                                   for check in checks)
+        self.audited += 1
+        if reused:
+            self.reused += 1
+        return results
+
+    def _fingerprint(self, module_name):
+        """Get the fingerprint of a module's inputs in the current commit.
+        This is only calculated for each distinct combination of the tree
+        entries containing its inputs (the input file itself, or the
+        directory containing the files matching a wildcard pattern, plus
+        any files they reference), so for most commits it's just a few
+        dictionary lookups."""
+        entries = [module_name]
+        for pattern in CHECK_INPUTS[module_name]:
+            if any(character in pattern for character in '*?['):
+                pattern = os.path.dirname(pattern)
+            entries.append(self.source.entry(os.path.join(self.repository, pattern)))
+        for path in referenced_paths(module_name, self.repository):
+            entries.append((path, self.source.entry(os.path.join(self.repository, path))))
+        key = tuple(entries)
+        fingerprint = self._fingerprints.get(key)
+        if fingerprint is None:
+            fingerprint = self._fingerprints[key] = self.fingerprinter.fingerprint(module_name)
+        return fingerprint
+
+    def scan(self, commits):
+        """Audit each of the given commits, yielding a (commit, results) pair
+        for each one"""
+        for commit in commits:
+            yield commit, self.audit(commit)
+
+    def bisect(self, commits):
+        """
+        Find the first of the given commits (oldest first) at which any of
+        the selected checks fails, assuming that once a check starts failing
+        it keeps failing.  Returns a (commit, failed results) pair, or
+        (None, []) if the checks pass at the last commit.  If they already
+        fail at the first commit, that commit is returned.
+        """
+        def failures(index):
+            return [result for result in self.audit(commits[index]) if result.outcome in (FAILED, ERROR)]
+        if not commits:
+            return None, []
+        last_failures = failures(len(commits) - 1)
+        if not last_failures:
+            return None, []
+        first_failures = failures(0)
+        if first_failures:
+            return commits[0], first_failures
+        good, bad = 0, len(commits) - 1
+        while bad - good > 1:
+            middle = (good + bad) // 2
+            middle_failures = failures(middle)
+            if middle_failures:
+                bad, last_failures = middle, middle_failures
+            else:
+                good = middle
+        return commits[bad], last_failures
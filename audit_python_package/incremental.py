@@ -0,0 +1,190 @@
+# encoding: utf-8
+"""
+Support for incremental audits, which only re-run checks whose input files
+have changed since the last run.  Each module of checks reads a small, known
+set of files; a fingerprint of the content of those files (plus the audit
+package's own data, modules, and check code) is recorded along with the result of each
+check that passed.  On the next run, checks which passed last time and whose
+fingerprint is unchanged don't need to be run again.
+"""
+
+from __future__ import unicode_literals
+
+import codecs
+import hashlib
+import json
+import os
+import sys
+
+from audit_python_package import DATA_DIRECTORY_PATH, FILE_CACHE, REQUIREMENTS_GRAPH
+
+#: The files read by each module of checks, as glob patterns relative to the
+#: root of the repository being audited.  Checks in modules not listed here
+#: are always run.
+CHECK_INPUTS = {
+    'test_clean_up_requirements.py': ['requirements/clean_up_requirements.py'],
+    'test_coveragerc.py': ['.coveragerc'],
+    'test_docs.py': ['docs/conf.py', 'docs/index.rst', 'docs/readme.rst', 'docs/CHANGELOG.rst'],
+    'test_git_hooks.py': ['git-hooks/*'],
+    'test_gitignore.py': ['.gitignore'],
+    'test_manifest.py': ['MANIFEST.in'],
+    'test_readme.py': ['README.rst'],
+    'test_requirements.py': ['requirements/*.txt'],
+    'test_setup.py': ['setup.py'],
+    'test_setup_cfg.py': ['setup.cfg'],
+    'test_tox.py': ['tox.ini'],
+}
+
+#: Modules of checks whose input files are requirements files, which can
+#: include or constrain others (with ``-r`` and ``-c``) that don't match the
+#: input patterns and may even be outside the repository; those files are
+#: read by the checks too
+REFERENCING_MODULES = {'test_requirements.py'}
+
+#: Modules of checks whose results also depend on the keyword expression used
+#: to select the checks (the requirements ordering checks leave packages to
+#: their version checks when those are deselected)
+KEYWORD_MODULES = {'test_requirements.py'}
+
+#: Default location of the saved results, relative to the audited repository
+DEFAULT_CACHE_DIRECTORY = '.audit_cache'
+
+PACKAGE_DIRECTORY_PATH = os.path.dirname(os.path.abspath(__file__))
+TESTS_DIRECTORY_PATH = os.path.join(PACKAGE_DIRECTORY_PATH, 'tests')
+
+
+def _file_digest(path):
+    """Get the git blob ID of a file's content, without reading it if the
+    current file source already knows it"""
+    object_id = FILE_CACHE.source.object_id(path)
+    if object_id is not None:
+        return object_id
+    cached = FILE_CACHE.get(path)
+    if cached is None:
+        return 'missing'
+    digest = hashlib.sha1('blob {}\0'.format(len(cached.content)).encode('ascii'))
+    digest.update(cached.content)
+    return digest.hexdigest()
+
+
+def input_paths(module_name, root='.'):
+    """Get the sorted paths (relative to root) of the existing files read by
+    the checks in the named module, or None if they aren't known.  The files
+    are looked for in the current file source."""
+    patterns = CHECK_INPUTS.get(module_name)
+    if patterns is None:
+        return None
+    paths = set()
+    for pattern in patterns:
+        for path in FILE_CACHE.source.glob(os.path.join(root, pattern)):
+            paths.add(os.path.relpath(path, root).replace(os.sep, '/'))
+    return sorted(paths)
+
+
+def referenced_paths(module_name, root='.'):
+    """Get the sorted paths (relative to root, so possibly starting with
+    ``..``) of the files referenced by the input files of the named module
+    which aren't input files themselves.  This is empty for modules not in
+    REFERENCING_MODULES."""
+    if module_name not in REFERENCING_MODULES:
+        return []
+    inputs = input_paths(module_name, root)
+    paths = set()
+    for path in inputs:
+        for referenced in REQUIREMENTS_GRAPH.closure(os.path.join(root, path)):
+            paths.add(os.path.relpath(referenced, root).replace(os.sep, '/'))
+    return sorted(paths.difference(inputs))
+
+
+class Fingerprinter(object):
+    """Calculates the fingerprints of the inputs to each module of checks.
+    The fingerprint of a module changes if any of its input files are added,
+    removed, modified, or change executable status (including any files
+    they reference; see REFERENCING_MODULES), or if the audit package
+    itself (or the Python version running it) changes.  For the modules in
+    KEYWORD_MODULES, it also changes with the keyword expression."""
+
+    def __init__(self, root='.', keyword=None):
+        self.root = root
+        self.keyword = keyword or ''
+        self._audit_digest = None
+
+    def audit_digest(self):
+        """A digest of the audit package's data files, its own modules (which
+        the checks use to parse and evaluate files), and the Python version"""
+        if self._audit_digest is None:
+            digest = hashlib.sha1('{0}.{1}'.format(*sys.version_info[:2]).encode('utf-8'))
+            for name in sorted(os.listdir(DATA_DIRECTORY_PATH)):
+                digest.update(name.encode('utf-8'))
+                digest.update(_file_digest(os.path.join(DATA_DIRECTORY_PATH, name)).encode('utf-8'))
+            for name in sorted(os.listdir(PACKAGE_DIRECTORY_PATH)):
+                if name.endswith('.py'):
+                    digest.update(name.encode('utf-8'))
+                    with open(os.path.join(PACKAGE_DIRECTORY_PATH, name), 'rb') as f:
+                        digest.update(hashlib.sha1(f.read()).hexdigest().encode('utf-8'))
+            self._audit_digest = digest.hexdigest()
+        return self._audit_digest
+
+    def fingerprint(self, module_name):
+        """Get the fingerprint of the named module's inputs, or None if they
+        aren't known (in which case the module's checks must always be run)"""
+        paths = input_paths(module_name, self.root)
+        if paths is None:
+            return None
+        digest = hashlib.sha1(self.audit_digest().encode('utf-8'))
+        digest.update(_file_digest(os.path.join(TESTS_DIRECTORY_PATH, module_name)).encode('utf-8'))
+        if module_name in KEYWORD_MODULES:
+            digest.update('\0{}'.format(self.keyword).encode('utf-8'))
+        for path in paths + referenced_paths(module_name, self.root):
+            full_path = os.path.join(self.root, path)
+            executable = FILE_CACHE.source.is_executable(full_path)
+            digest.update('\0{}\0{}\0{}'.format(path, executable, _file_digest(full_path)).encode('utf-8'))
+        return digest.hexdigest()
+
+
+class ResultStore(object):
+    """The fingerprints of the checks which passed in previous runs, saved in
+    a JSON file in the cache directory"""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIRECTORY):
+        self.directory = directory
+        self.path = os.path.join(directory, 'results.json')
+        self._passed = None
+
+    @property
+    def passed(self):
+        """Dictionary of fingerprints of passed checks, keyed by check name"""
+        if self._passed is None:
+            self._passed = {}
+            if os.path.exists(self.path):
+                try:
+                    with codecs.open(self.path, 'r', 'utf-8') as f:
+                        self._passed = json.loads(f.read())
+                except ValueError:
+                    # Corrupt or partially written; just start over
+                    pass
+        return self._passed
+
+    def is_unchanged(self, check, fingerprint):
+        """True if the check passed last time with the same inputs"""
+        return fingerprint is not None and self.passed.get(check) == fingerprint
+
+    def record(self, check, fingerprint, passed):
+        """Record the result of running a check"""
+        if passed and fingerprint is not None:
+            self.passed[check] = fingerprint
+        else:
+            self.passed.pop(check, None)
+
+    def save(self):
+        """Write the results to the cache directory"""
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+            # Keep the cache out of version control without needing any
+            # changes to the repository's own .gitignore
+            with codecs.open(os.path.join(self.directory, '.gitignore'), 'w', 'utf-8') as f:
+                f.write('*\n')
+        temp_path = self.path + '.tmp'
+        with codecs.open(temp_path, 'w', 'utf-8') as f:
+            f.write(json.dumps(self.passed, indent=1, sort_keys=True))
+        getattr(os, 'replace', os.rename)(temp_path, self.path)
@@ -0,0 +1,229 @@
+# encoding: utf-8
+"""
+A compact matrix of the requirements listed by each repository in a fleet
+audit, for answering questions like "which repositories pin Sphinx below
+1.4?" or "who still has cov-core?" without searching every checkout.
+
+Repository, file, package, and specifier strings are each stored once, and
+the matrix itself is four parallel ``array`` columns of indexes into them
+(one entry per requirement line), sorted by package so that all the entries
+for one package are a contiguous slice.  It's saved to a SQLite database as
+a handful of blobs, so loading it is a single query and doesn't involve
+parsing any requirements files.
+"""
+
+from __future__ import unicode_literals
+
+from array import array
+import bisect
+import json
+import os
+import sqlite3
+import sys
+
+from audit_python_package import FILE_CACHE, file_source, REQUIREMENTS_GRAPH
+from audit_python_package.versions import normalize_name, preferred_value
+
+
+#: Increased whenever the way the matrix is stored changes incompatibly
+FORMAT_VERSION = 1
+
+_STRING_COLUMNS = ('repositories', 'files', 'packages', 'names', 'specifiers')
+_INDEX_COLUMNS = ('repository_column', 'file_column', 'package_column', 'specifier_column', 'package_offsets')
+
+
+def read_pins(root='.', source=None):
+    """List the ``(path, name, specifier)`` of each requirement listed in the
+    repository's requirements files (as given by requirements_file_paths()),
+    where the specifier is an empty string for an unpinned requirement.
+    Editable and URL requirements without a package name are left out.
+    Requirements from included files are listed under the file which
+    actually contains them.  The files are read from ``source`` (like a
+    GitTreeSource), if given."""
+    from audit_python_package.command_line import requirements_file_paths
+    pins = []
+    with file_source(source or FILE_CACHE.source):
+        listdir = None if source is None else source.list_directory
+        for path in sorted(requirements_file_paths(root, listdir)):
+            for kind, value in REQUIREMENTS_GRAPH.get_file(os.path.join(root, path)).entries:
+                if kind == 'requirement' and value.name:
+                    pins.append((path.replace(os.sep, '/'), value.name, value.specifier))
+    return pins
+
+
+def _to_bytes(column):
+    return column.tobytes() if hasattr(column, 'tobytes') else column.tostring()
+
+
+def _from_bytes(data):
+    column = array(str('i'))
+    if hasattr(column, 'frombytes'):
+        column.frombytes(data)
+    else:
+        column.fromstring(data)
+    return column
+
+
+class _Interned(object):
+    """Assigns consecutive indexes to distinct strings"""
+
+    def __init__(self):
+        self.values = []
+        self.indexes = {}
+
+    def __call__(self, value):
+        index = self.indexes.get(value)
+        if index is None:
+            index = self.indexes[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+
+class PinMatrix(object):
+    """The requirements listed in the requirements files of many
+    repositories, stored as parallel columns of indexes into lists of the
+    distinct strings.  Packages are identified by their PEP 503 normalized
+    name, so ``Jinja2`` and ``jinja2`` are the same package."""
+
+    def __init__(self, repositories, files, packages, names, specifiers, repository_column, file_column,
+                 package_column, specifier_column, package_offsets):
+        self.repositories = repositories
+        self.files = files
+        self.packages = packages
+        self.names = names
+        self.specifiers = specifiers
+        self.repository_column = repository_column
+        self.file_column = file_column
+        self.package_column = package_column
+        self.specifier_column = specifier_column
+        self.package_offsets = package_offsets
+
+    @classmethod
+    def build(cls, repository_pins):
+        """Build a matrix from a mapping (or list of pairs) of repository
+        names to lists of pins as returned by read_pins()"""
+        items = repository_pins.items() if hasattr(repository_pins, 'items') else repository_pins
+        repositories, files, specifiers = _Interned(), _Interned(), _Interned()
+        by_package = {}
+        names = {}
+        for repository, pins in sorted(items):
+            repository_index = repositories(repository)
+            for path, name, specifier in pins:
+                key = normalize_name(name)
+                names.setdefault(key, name)
+                by_package.setdefault(key, []).append((repository_index, files(path), specifiers(specifier)))
+        packages = sorted(by_package)
+        columns = [array(str('i')) for _ in range(4)]
+        package_offsets = array(str('i'), [0])
+        for package_index, key in enumerate(packages):
+            for row in by_package[key]:
+                columns[0].append(row[0])
+                columns[1].append(row[1])
+                columns[2].append(package_index)
+                columns[3].append(row[2])
+            package_offsets.append(len(columns[0]))
+        return cls(repositories.values, files.values, packages, [names[key] for key in packages],
+                   specifiers.values, *(columns + [package_offsets]))
+
+    @classmethod
+    def load(cls, path):
+        """Load a matrix saved by save()"""
+        if not os.path.exists(path):
+            raise ValueError('No pin matrix at {}'.format(path))
+        connection = sqlite3.connect(path)
+        try:
+            values = dict(connection.execute('SELECT name, value FROM pin_matrix'))
+        except sqlite3.DatabaseError:
+            raise ValueError('{} is not a pin matrix'.format(path))
+        finally:
+            connection.close()
+        header = json.loads(values.get('header', '{}'))
+        if header.get('format') != FORMAT_VERSION:
+            raise ValueError('{} was saved in an unsupported format'.format(path))
+        columns = {}
+        for name in _INDEX_COLUMNS:
+            columns[name] = _from_bytes(bytes(values[name]))
+            if header['byteorder'] != sys.byteorder:
+                columns[name].byteswap()
+        return cls(*([header[name] for name in _STRING_COLUMNS] + [columns[name] for name in _INDEX_COLUMNS]))
+
+    def save(self, path):
+        """Save the matrix to a SQLite database at the given path, replacing
+        any matrix already saved there"""
+        header = {name: getattr(self, name) for name in _STRING_COLUMNS}
+        header.update(format=FORMAT_VERSION, byteorder=sys.byteorder)
+        rows = [('header', json.dumps(header, sort_keys=True))]
+        rows.extend((name, sqlite3.Binary(_to_bytes(getattr(self, name)))) for name in _INDEX_COLUMNS)
+        connection = sqlite3.connect(path)
+        try:
+            with connection:
+                connection.execute('CREATE TABLE IF NOT EXISTS pin_matrix (name TEXT PRIMARY KEY, value BLOB)')
+                connection.execute('DELETE FROM pin_matrix')
+                connection.executemany('INSERT INTO pin_matrix (name, value) VALUES (?, ?)', rows)
+        finally:
+            connection.close()
+
+    def __len__(self):
+        return len(self.package_column)
+
+    def _rows(self, name=None):
+        """The positions of the entries for the named package (or all of
+        them)"""
+        if name is None:
+            return range(len(self))
+        key = normalize_name(name)
+        package_index = bisect.bisect_left(self.packages, key)
+        if package_index == len(self.packages) or self.packages[package_index] != key:
+            return range(0)
+        return range(self.package_offsets[package_index], self.package_offsets[package_index + 1])
+
+    def _entry(self, row):
+        return (self.repositories[self.repository_column[row]], self.files[self.file_column[row]],
+                self.names[self.package_column[row]], self.specifiers[self.specifier_column[row]])
+
+    def pins(self, name=None):
+        """List the ``(repository, path, name, specifier)`` of each
+        requirement of the named package (or of every package)"""
+        return [self._entry(row) for row in self._rows(name)]
+
+    def repositories_with(self, name):
+        """List the repositories which require the named package"""
+        return sorted({self.repositories[self.repository_column[row]] for row in self._rows(name)})
+
+    def below(self, name, version):
+        """List the requirements of the named package which are pinned to a
+        version lower than the given one (compared by PEP 440 semantics).
+        Raises InvalidVersion if the given version isn't valid."""
+        from packaging.version import InvalidVersion, Version
+        minimum = Version(version)
+        result = []
+        for row in self._rows(name):
+            specifier = self.specifiers[self.specifier_column[row]]
+            version = preferred_value(specifier)
+            if version == specifier:
+                continue
+            try:
+                if Version(version) < minimum:
+                    result.append(self._entry(row))
+            except InvalidVersion:
+                continue
+        return result
+
+    def drift(self, policy, name=None):
+        """List the requirements of the named package (or of every package)
+        which are pinned to a version not matching the given VersionPolicy"""
+        allowed = {}
+        result = []
+        for row in self._rows(name):
+            specifier_index = self.specifier_column[row]
+            specifier = self.specifiers[specifier_index]
+            version = preferred_value(specifier)
+            if version == specifier:
+                continue
+            package_index = self.package_column[row]
+            key = (package_index, specifier_index)
+            if key not in allowed:
+                allowed[key] = policy.allows(self.names[package_index], version)
+            if not allowed[key]:
+                result.append(self._entry(row))
+        return result
@@ -0,0 +1,108 @@
+# encoding: utf-8
+"""
+Evaluation of pinned requirements against the policy of preferred package
+versions in ``VERSIONS``.  Each policy entry (an exact version or any other
+PEP 440 version specifier) is compiled into a ``packaging`` SpecifierSet only
+once, and a whole parsed requirements file is evaluated against the policy
+in one pass the first time any of its versions is checked; the version checks
+for individual packages then just look up the result.  Package names are
+compared after PEP 503 normalization, and versions by PEP 440 semantics, so
+``jinja2==2.8.0`` satisfies a policy of ``Jinja2==2.8``.
+"""
+
+from __future__ import unicode_literals
+
+import weakref
+
+from audit_python_package.versions import normalize_name
+
+
+class VersionPolicy(object):
+    """The preferred versions of packages, from a mapping (like
+    ``VERSIONS``) of package names to either a version or a version
+    specifier.  The mapping isn't read until the policy is first used."""
+
+    def __init__(self, versions):
+        self.versions = versions
+        self._specifiers = None
+        self._compiled = {}
+        self._matches = {}
+        self._evaluations = weakref.WeakKeyDictionary()
+
+    def specifier(self, name):
+        """The preferred version specifier for the named package (like
+        ``==2.8`` or ``>=1.3,<1.4``), or None if there is no preference"""
+        if self._specifiers is None:
+            specifiers = {}
+            for package, value in self.versions.items():
+                specifiers[normalize_name(package)] = value if value[:1] in '<>=!~' else '==' + value
+            self._specifiers = specifiers
+        return self._specifiers.get(normalize_name(name))
+
+    def allows(self, name, version):
+        """True if the given version of the named package matches the
+        policy (or there is no policy for it)"""
+        specifier = self.specifier(name)
+        if specifier is None:
+            return True
+        key = (specifier, version)
+        result = self._matches.get(key)
+        if result is None:
+            result = self._matches[key] = self._match(specifier, version)
+        return result
+
+    def _match(self, specifier, version):
+        compiled = self._compiled.get(specifier)
+        if compiled is None:
+            from packaging.specifiers import SpecifierSet
+            try:
+                compiled = SpecifierSet(specifier)
+            except ValueError:
+                compiled = False
+            self._compiled[specifier] = compiled
+        if compiled is not False:
+            try:
+                return compiled.contains(version, prereleases=True)
+            except ValueError:
+                pass
+        # Not valid under PEP 440; only an identical pin can match
+        return specifier == '==' + version
+
+    def evaluate(self, requirements):
+        """Evaluate every package pinned in a RequirementsIndex against the
+        policy, returning a dictionary of ``(requirement, allowed)`` pairs
+        keyed by normalized package name.  The result is cached for as long
+        as the index is in use."""
+        result = self._evaluations.get(requirements)
+        if result is None:
+            result = {}
+            for requirement in requirements.requirements:
+                if requirement.key not in result:
+                    result[requirement.key] = (requirement, self.allows(requirement.name, requirement.version))
+            self._evaluations[requirements] = result
+        return result
+
+    def check(self, requirements, name):
+        """Get a description of the problem if the named package isn't
+        pinned in a RequirementsIndex at a version matching the policy, or
+        None if it is"""
+        evaluated = self.evaluate(requirements).get(normalize_name(name))
+        if evaluated is None:
+            return '{} is not pinned to a version'.format(name)
+        requirement, allowed = evaluated
+        if allowed:
+            return None
+        return '{} does not match the preferred version {}{}'.format(requirement.line, name, self.specifier(name))
+
+    def violations(self, requirements, exclude=()):
+        """Describe each package pinned in a RequirementsIndex at a version
+        which doesn't match the policy, except for the named packages"""
+        excluded = {normalize_name(name) for name in exclude}
+        evaluated = self.evaluate(requirements)
+        result = []
+        for requirement in requirements.requirements:
+            if requirement.key in excluded or evaluated[requirement.key] != (requirement, False):
+                continue
+            result.append('{} does not match the preferred version {}{}'.format(
+                requirement.line, requirement.name, self.specifier(requirement.name)))
+        return result
@@ -0,0 +1,119 @@
+# encoding: utf-8
+"""
+Optional pytest plugin providing extra options for running the audit.
+Enable it with ``-p audit_python_package.pytest_plugin``, for example::
+
+    py.test --pyargs audit_python_package -p audit_python_package.pytest_plugin --incremental
+"""
+
+from __future__ import unicode_literals
+
+import io
+import os
+
+import pytest
+
+from audit_python_package.incremental import DEFAULT_CACHE_DIRECTORY, Fingerprinter, ResultStore
+from audit_python_package.report import check_name
+from audit_python_package.timing import RECORDER
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('audit', 'audit-python-package')
+    group.addoption('--incremental', action='store_true', default=False,
+                    help='only run checks whose input files changed since they last passed')
+    group.addoption('--audit-cache-dir', default=DEFAULT_CACHE_DIRECTORY,
+                    help='directory for saving results between incremental runs (default: %(default)s)')
+    group.addoption('--audit-timings', type=int, metavar='N', default=None,
+                    help='show the N slowest checks, fixtures, and other audit operations')
+    group.addoption('--audit-timings-json', metavar='PATH', default=None,
+                    help='save timing data for all audit operations to a JSON file')
+
+
+def pytest_configure(config):
+    if config.getoption('incremental'):
+        config.pluginmanager.register(IncrementalAudit(config), 'audit_incremental')
+    if config.getoption('audit_timings') is not None or config.getoption('audit_timings_json'):
+        config.pluginmanager.register(AuditTimings(config), 'audit_timings')
+
+
+class IncrementalAudit(object):
+    """Deselects checks which passed last time and whose inputs haven't
+    changed since, and records the results of the checks which are run"""
+
+    def __init__(self, config):
+        self.store = ResultStore(config.getoption('audit_cache_dir'))
+        self.fingerprinter = Fingerprinter(keyword=config.getoption('keyword'))
+        self.fingerprints = {}
+        self.unchanged = 0
+
+    def _fingerprint(self, nodeid):
+        module_name = check_name(nodeid).partition('::')[0]
+        if module_name not in self.fingerprints:
+            self.fingerprints[module_name] = self.fingerprinter.fingerprint(module_name)
+        return self.fingerprints[module_name]
+
+    def pytest_collection_modifyitems(self, config, items):
+        selected = []
+        deselected = []
+        for item in items:
+            if self.store.is_unchanged(check_name(item.nodeid), self._fingerprint(item.nodeid)):
+                deselected.append(item)
+            else:
+                selected.append(item)
+        if deselected:
+            self.unchanged = len(deselected)
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = selected
+
+    def pytest_runtest_logreport(self, report):
+        if report.when == 'call' or not report.passed:
+            passed = report.passed and report.when == 'call'
+            self.store.record(check_name(report.nodeid), self._fingerprint(report.nodeid), passed)
+
+    def pytest_sessionfinish(self, session):
+        self.store.save()
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if self.unchanged:
+            terminalreporter.write_line('{} checks skipped: unchanged since they last passed (cache in {})'.format(
+                self.unchanged, os.path.abspath(self.store.directory)))
+
+
+class AuditTimings(object):
+    """Records the wall clock time, CPU time, and bytes read for each check,
+    fixture, and other instrumented operation"""
+
+    def __init__(self, config):
+        self.count = config.getoption('audit_timings')
+        self.json_path = config.getoption('audit_timings_json')
+        RECORDER.clear()
+        RECORDER.enabled = True
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_collection(self, session):
+        with RECORDER.measure('collection', 'pytest'):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        with RECORDER.measure('fixture', fixturedef.argname):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        with RECORDER.measure('check', check_name(item.nodeid)):
+            yield
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if self.count:
+            stream = io.StringIO()
+            RECORDER.format_table(self.count, stream)
+            terminalreporter.write_sep('=', 'slowest {} audit operations'.format(self.count))
+            for line in stream.getvalue().splitlines():
+                terminalreporter.write_line(line)
+
+    def pytest_unconfigure(self, config):
+        if self.json_path:
+            RECORDER.dump(self.json_path)
+        RECORDER.enabled = False
@@ -0,0 +1,120 @@
+# encoding: utf-8
+"""
+Validation of ``README.rst`` the way PyPI renders it (as ``python setup.py
+check --restructuredtext --strict`` does), without a subprocess.  Importing
+docutils and rendering the whole README is slow, and the README rarely
+changes, so each verdict is saved in a cache directory under a hash of the
+README's content and the versions of the renderer and docutils.  Checking
+an unchanged README then only costs hashing it and reading a small file.
+The cache is content-addressed, so it's safely shared by every repository
+audited by the same user.
+"""
+
+from __future__ import unicode_literals
+
+import codecs
+import hashlib
+import io
+import json
+import os
+
+#: The environment variable which can be set to use a different directory
+#: for cached README validation results
+CACHE_DIRECTORY_VARIABLE = 'AUDIT_README_CACHE'
+
+
+def default_cache_directory():
+    """The directory in which README validation results are saved: the
+    ``AUDIT_README_CACHE`` environment variable if set, otherwise a
+    subdirectory of the user's cache directory"""
+    directory = os.environ.get(CACHE_DIRECTORY_VARIABLE)
+    if directory:
+        return directory
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'audit-python-package', 'readme')
+
+
+def _distribution_version(name):
+    """Get the installed version of the named distribution from its
+    metadata, without importing it"""
+    try:
+        from importlib.metadata import version
+    except ImportError:
+        # Python < 3.8
+        from pkg_resources import get_distribution
+        return get_distribution(name).version
+    return version(name)
+
+
+def renderer_version():
+    """Identify the versions of readme_renderer and docutils in use, without
+    importing them (their modules which do the rendering are slow to load,
+    and readme_renderer no longer has an ``__about__`` module to check)"""
+    return 'readme_renderer {} docutils {}'.format(_distribution_version('readme_renderer'),
+                                                   _distribution_version('docutils'))
+
+
+def render(text):
+    """Render reStructuredText as PyPI would, returning a (valid, warnings)
+    pair; any warning makes the text invalid"""
+    from readme_renderer.rst import render as render_rst
+    stream = io.StringIO()
+    valid = render_rst(text, stream=stream) is not None
+    return valid, stream.getvalue()
+
+
+class ReadmeCache(object):
+    """Saved (valid, warnings) results of rendering README files, keyed by
+    a hash of the content and the renderer version.  ``version`` and
+    ``renderer`` default to renderer_version() and render(); the renderer
+    version is only looked up when first needed."""
+
+    def __init__(self, directory=None, version=None, renderer=None):
+        self.directory = directory or default_cache_directory()
+        self._version = version
+        self.renderer = renderer or render
+
+    @property
+    def version(self):
+        if self._version is None:
+            self._version = renderer_version()
+        return self._version
+
+    def key(self, content):
+        """The hex digest identifying the result for the given README
+        content (as bytes)"""
+        digest = hashlib.sha1(self.version.encode('utf-8') + b'\0')
+        digest.update(content)
+        return digest.hexdigest()
+
+    def validate(self, content):
+        """Get the (valid, warnings) result of rendering the given README
+        content (as bytes), rendering it only if it hasn't been before"""
+        path = os.path.join(self.directory, '{}.json'.format(self.key(content)))
+        try:
+            with codecs.open(path, 'r', 'utf-8') as f:
+                saved = json.loads(f.read())
+            return saved['valid'], saved['warnings']
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+        try:
+            text = content.decode('utf-8')
+        except UnicodeDecodeError as e:
+            # Not worth caching; this is found without rendering anything
+            return False, 'README is not valid UTF-8: {}'.format(e)
+        valid, warnings = self.renderer(text)
+        self._save(path, {'valid': valid, 'warnings': warnings})
+        return valid, warnings
+
+    def _save(self, path, result):
+        """Save a result, unless the cache directory isn't writable (in
+        which case the README will just be rendered again next time)"""
+        temp_path = '{}.{}.tmp'.format(path, os.getpid())
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            with codecs.open(temp_path, 'w', 'utf-8') as f:
+                f.write(json.dumps(result, sort_keys=True))
+            getattr(os, 'replace', os.rename)(temp_path, path)
+        except (IOError, OSError):
+            pass
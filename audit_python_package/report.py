@@ -0,0 +1,116 @@
+# encoding: utf-8
+"""
+Audit results shared by the different ways of running the checks (fleet
+mode, sharded runs, etc.), and utilities for merging them into a single
+report.
+"""
+
+from __future__ import print_function, unicode_literals
+
+from collections import namedtuple, OrderedDict
+import codecs
+import json
+import sys
+
+#: The outcome of running one check against one repository.  ``check`` is
+#: the check's identifier relative to the test module directory, like
+#: ``test_tox.py::TestTox::test_python_35``.
+CheckResult = namedtuple('CheckResult', ['repository', 'check', 'outcome', 'message'])
+
+PASSED = 'passed'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+ERROR = 'error'
+
+
+def check_name(nodeid):
+    """Get the check identifier for a pytest node ID, independent of the
+    directory the audit_python_package tests were collected from"""
+    path, separator, rest = nodeid.partition('::')
+    return path.replace('\\', '/').split('/')[-1] + separator + rest
+
+
+def group_by_repository(results):
+    """Group a sequence of CheckResults into an ordered dictionary of lists
+    keyed by repository"""
+    grouped = OrderedDict()
+    for result in results:
+        grouped.setdefault(result.repository, []).append(result)
+    return grouped
+
+
+def count_outcomes(results):
+    """Count how many of the given results had each possible outcome"""
+    counts = OrderedDict((outcome, 0) for outcome in (PASSED, FAILED, ERROR, SKIPPED))
+    for result in results:
+        counts[result.outcome] = counts.get(result.outcome, 0) + 1
+    return counts
+
+
+def is_success(results):
+    """True if none of the given results is a failure or error"""
+    return not any(result.outcome in (FAILED, ERROR) for result in results)
+
+
+def format_report(results, stream=None):
+    """Print a human-readable merged report of the given results, listing the
+    failed checks for each repository followed by overall totals"""
+    stream = stream or sys.stdout
+    grouped = group_by_repository(results)
+    for repository, repository_results in grouped.items():
+        counts = count_outcomes(repository_results)
+        status = 'OK' if is_success(repository_results) else 'FAILED'
+        print('{} {} ({})'.format(status, repository, _format_counts(counts)), file=stream)
+        for result in repository_results:
+            if result.outcome in (FAILED, ERROR):
+                print('    {} {}'.format(result.outcome.upper(), result.check), file=stream)
+                if result.message:
+                    print('        {}'.format(result.message), file=stream)
+    if not grouped:
+        # Every check was deselected or skipped as unchanged
+        print('no checks run', file=stream)
+        return
+    failing = sum(1 for repository_results in grouped.values() if not is_success(repository_results))
+    print('{} repositories audited, {} with failures: {}'.format(
+        len(grouped), failing, _format_counts(count_outcomes(results))), file=stream)
+
+
+def _format_counts(counts):
+    return ', '.join('{} {}'.format(count, outcome) for outcome, count in counts.items() if count)
+
+
+def merge_results(result_lists, order=()):
+    """Merge the lists of results from separate runs (like the shards of a
+    sharded audit) into one, grouped by repository in order of first
+    appearance.  Each repository's results are sorted by the position of the
+    check in ``order`` (a sequence of check identifiers), then by
+    identifier.  A result given by several runs (like the error for a
+    missing repository) is only included once, but ValueError is raised if
+    runs disagree about the outcome of a check."""
+    positions = {check: index for index, check in enumerate(order)}
+    merged = OrderedDict()
+    for results in result_lists:
+        for result in results:
+            existing = merged.setdefault((result.repository, result.check), result)
+            if existing.outcome != result.outcome:
+                raise ValueError('Conflicting results for {} in {}: {} and {}'.format(
+                    result.check or 'the audit', result.repository, existing.outcome, result.outcome))
+    merged_results = []
+    for repository_results in group_by_repository(merged.values()).values():
+        repository_results.sort(key=lambda result: (positions.get(result.check, len(positions)), result.check))
+        merged_results.extend(repository_results)
+    return merged_results
+
+
+def write_results(results, path):
+    """Save results to a JSON file for later merging or analysis"""
+    data = [result._asdict() for result in results]
+    with codecs.open(path, 'w', 'utf-8') as f:
+        f.write(json.dumps(data, indent=1, sort_keys=True))
+
+
+def read_results(path):
+    """Load results previously saved with write_results()"""
+    with codecs.open(path, 'r', 'utf-8') as f:
+        data = json.loads(f.read())
+    return [CheckResult(**entry) for entry in data]
@@ -0,0 +1,449 @@
+# encoding: utf-8
+"""
+Parsing of pip requirements files, including any other requirements files
+they include via ``-r`` or ``--requirement``.  Each file is parsed only once
+(until it changes), and the include graph between files is kept so that
+flattening the requirements of several files which include the same common
+file (like ``base.txt``) doesn't re-read or re-parse it each time.
+
+Files are parsed a line at a time into compact Requirement records, with the
+same syntax pip supports: comments, backslash line continuations,
+environment markers, ``--hash`` options, editable (``-e``) requirements,
+constraints files (``-c``), and global options like ``--index-url`` (which
+are ignored).
+"""
+
+from __future__ import unicode_literals
+
+import hashlib
+import os
+import re
+
+from audit_python_package.versions import normalize_name
+
+_COMMENT = re.compile(r'(^|\s+)#.*$')
+_NAME = re.compile(r'([A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?)\s*(?:\[([^\]]*)\])?\s*')
+_EGG_NAME = re.compile(r'[#&]egg=([A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?)')
+_REQUIREMENT_OPTION = re.compile(r'(^|\s)--[a-z]')
+_HASH = re.compile(r'--hash[=\s]\s*(\S+)')
+_WHITESPACE = re.compile(r'\s+')
+
+#: Options whose value is the path of another requirements file, and the kind
+#: of entry to record for it
+_FILE_OPTIONS = {
+    '-r': 'include',
+    '--requirement': 'include',
+    '-c': 'constraint',
+    '--constraint': 'constraint',
+}
+
+_NO_HASHES = ()
+
+
+class Requirement(object):
+    """
+    A single requirement from a requirements file.  ``name`` is the project
+    name as written (None for an editable or URL requirement which doesn't
+    specify one) and ``key`` is its normalized form; ``specifier`` is the
+    version specifier with whitespace removed (like ``==1.10.0`` or
+    ``>=1.0,<2.0``, or an empty string); ``markers`` is the environment marker
+    expression (or None); and ``hashes`` is a tuple of the ``--hash`` values.
+    ``path`` and ``lineno`` identify where the requirement was read from.
+    """
+
+    __slots__ = ('name', 'key', 'extras', 'specifier', 'markers', 'hashes', 'url', 'editable', 'path', 'lineno')
+
+    def __init__(self, name, specifier='', markers=None, hashes=_NO_HASHES, extras=None, url=None, editable=False,
+                 path=None, lineno=None):
+        self.name = name
+        self.key = normalize_name(name) if name else None
+        self.extras = extras
+        self.specifier = specifier
+        self.markers = markers
+        self.hashes = hashes
+        self.url = url
+        self.editable = editable
+        self.path = path
+        self.lineno = lineno
+
+    @property
+    def version(self):
+        """The version the requirement is pinned to with ``==``, or None if
+        it isn't pinned to a single version"""
+        specifier = self.specifier
+        if specifier.startswith('==') and not specifier.startswith('===') and ',' not in specifier:
+            return specifier[2:]
+        return None
+
+    @property
+    def line(self):
+        """The requirement as a ``name==version`` (or other specifier) string"""
+        return (self.name or self.url or '') + self.specifier
+
+    def __repr__(self):
+        return '<Requirement {} ({}:{})>'.format(self.line, self.path, self.lineno)
+
+
+def parse_requirement(text, path=None, lineno=None):
+    """Parse a single (logical) line of a requirements file specifying a
+    requirement into a Requirement"""
+    match = _REQUIREMENT_OPTION.search(text)
+    hashes = _NO_HASHES
+    if match:
+        options = text[match.start():]
+        text = text[:match.start()]
+        hashes = tuple(_HASH.findall(options)) or _NO_HASHES
+    markers = None
+    separator = re.search(r'\s;' if '@' in text or '://' in text else ';', text)
+    if separator:
+        markers = text[separator.end():].strip() or None
+        text = text[:separator.start()]
+    text = text.strip()
+    match = _NAME.match(text)
+    if not match or match.end() < len(text) and text[match.end()] in '+/:\\':
+        # A URL or path instead of a project name
+        egg = _EGG_NAME.search(text)
+        return Requirement(egg.group(1) if egg else None, markers=markers, hashes=hashes, url=text, path=path,
+                           lineno=lineno)
+    rest = text[match.end():]
+    extras = match.group(2)
+    extras = tuple(extra.strip() for extra in extras.split(',') if extra.strip()) if extras else None
+    if rest.startswith('@'):
+        return Requirement(match.group(1), markers=markers, hashes=hashes, extras=extras, url=rest[1:].strip(),
+                           path=path, lineno=lineno)
+    return Requirement(match.group(1), _WHITESPACE.sub('', rest), markers, hashes, extras, path=path, lineno=lineno)
+
+
+def _logical_lines(lines):
+    """Join backslash-continued lines and strip comments, yielding a
+    ``(line number, text)`` pair for each non-empty logical line"""
+    parts = []
+    start = None
+    for lineno, line in enumerate(lines, 1):
+        if line.startswith('#') and parts:
+            # A comment ends any continuation, as with pip
+            line = ''
+        line = _COMMENT.sub('', line).strip()
+        if start is None:
+            start = lineno
+        if line.endswith('\\'):
+            parts.append(line[:-1])
+            continue
+        parts.append(line)
+        text = ' '.join(part.strip() for part in parts).strip()
+        if text:
+            yield start, text
+        parts = []
+        start = None
+    if parts:
+        text = ' '.join(part.strip() for part in parts).strip()
+        if text:
+            yield start, text
+
+
+def parse_requirements(lines, path=None):
+    """
+    Parse the lines of a requirements file, yielding a ``(kind, value)`` pair
+    for each entry: ``('requirement', Requirement)``, or ``('include', path)``
+    or ``('constraint', path)`` for a requirements or constraints file
+    referenced by this one (relative to the directory containing ``path``).
+    Global options like ``--index-url`` are skipped.
+    """
+    base_dir = os.path.dirname(path) if path else ''
+    for lineno, text in _logical_lines(lines):
+        if not text.startswith('-'):
+            yield 'requirement', parse_requirement(text, path, lineno)
+            continue
+        option, _, value = text.partition(' ')
+        if '=' in option:
+            option, _, inline_value = option.partition('=')
+            value = inline_value + ' ' + value
+        elif len(option) > 2 and option[1] != '-':
+            option, value = option[:2], option[2:] + ' ' + value
+        value = value.strip()
+        kind = _FILE_OPTIONS.get(option)
+        if kind is not None:
+            if value:
+                yield kind, os.path.abspath(os.path.join(base_dir, value))
+        elif option in ('-e', '--editable'):
+            requirement = parse_requirement(value, path, lineno)
+            if requirement.url is None:
+                # Like "-e ." or "-e src/package"
+                requirement = Requirement(None, url=value, path=path, lineno=lineno)
+            requirement.editable = True
+            yield 'requirement', requirement
+
+
+class RequirementsFile(object):
+    """The parsed content of a single requirements file: an ordered list of
+    ``(kind, value)`` entries as produced by parse_requirements()"""
+
+    __slots__ = ('path', 'entries')
+
+    def __init__(self, path, lines):
+        self.path = path
+        self.entries = list(parse_requirements(lines, path))
+
+    @property
+    def includes(self):
+        """The absolute paths of the files included by this one"""
+        return [value for kind, value in self.entries if kind == 'include']
+
+    @property
+    def constraints(self):
+        """The absolute paths of the constraints files referenced by this one"""
+        return [value for kind, value in self.entries if kind == 'constraint']
+
+
+class RequirementsIndex(object):
+    """The requirements pinned to a single version in a flattened list of
+    Requirements, indexed by line (``name==version``) and by package name so
+    that pin and ordering checks don't need to scan the list.  Iterating over
+    it yields the lines in order."""
+
+    __slots__ = ('requirements', 'lines', 'pins', '_line_positions', '_key_positions', '__weakref__')
+
+    def __init__(self, requirements):
+        self.requirements = [requirement for requirement in requirements if requirement.version is not None]
+        self.lines = [requirement.line for requirement in self.requirements]
+        self.pins = [(requirement.name, requirement.version) for requirement in self.requirements]
+        self._line_positions = {}
+        self._key_positions = {}
+        for position, requirement in enumerate(self.requirements):
+            self._line_positions.setdefault(self.lines[position], position)
+            self._key_positions.setdefault(requirement.key, position)
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __getitem__(self, index):
+        return self.lines[index]
+
+    def __contains__(self, line):
+        return line in self._line_positions
+
+    def requirement(self, name):
+        """The first Requirement pinning the named package (compared after
+        PEP 503 normalization), or None"""
+        position = self._key_positions.get(normalize_name(name))
+        return None if position is None else self.requirements[position]
+
+
+class DependencyOrder(object):
+    """Constraints on the order of packages in a requirements file: each
+    package must appear after all of the packages it depends on.  Package
+    names are compared after PEP 503 normalization; ``constraints`` maps
+    each normalized name to the set of normalized names of its dependencies,
+    and ``names`` maps normalized names back to the names as given."""
+
+    def __init__(self, constraints):
+        self.names = {}
+        self.constraints = {}
+        for name, dependencies in constraints.items():
+            key = self._key(name)
+            self.constraints.setdefault(key, set()).update(self._key(dependency) for dependency in dependencies)
+        cycle = self._find_cycle()
+        if cycle:
+            raise ValueError('Circular dependency order constraints: {}'.format(
+                ' -> '.join(self.names[key] for key in cycle)))
+
+    def _key(self, name):
+        key = normalize_name(name)
+        self.names.setdefault(key, name)
+        return key
+
+    @classmethod
+    def parse(cls, lines):
+        """Create a DependencyOrder from lines of the form
+        ``package: dependency dependency ...``"""
+        constraints = {}
+        for line in lines:
+            if not line or line.startswith('#'):
+                continue
+            name, _, dependencies = line.partition(':')
+            constraints.setdefault(name.strip(), set()).update(dependencies.split())
+        return cls(constraints)
+
+    def _find_cycle(self):
+        """Topologically sort the constraints, returning a list of packages
+        forming a cycle if that isn't possible"""
+        remaining = {name: set(dependencies) & set(self.constraints) for name, dependencies in self.constraints.items()}
+        ready = [name for name, dependencies in remaining.items() if not dependencies]
+        dependents = {}
+        for name, dependencies in remaining.items():
+            for dependency in dependencies:
+                dependents.setdefault(dependency, []).append(name)
+        while ready:
+            name = ready.pop()
+            del remaining[name]
+            for dependent in dependents.get(name, []):
+                remaining[dependent].discard(name)
+                if not remaining[dependent]:
+                    ready.append(dependent)
+        if not remaining:
+            return None
+        # Walk dependencies within the unsortable remainder until one repeats
+        path = [sorted(remaining)[0]]
+        while path.count(path[-1]) < 2:
+            path.append(sorted(remaining[path[-1]])[0])
+        return path[path.index(path[-1]):]
+
+    def violations(self, requirements, exclude=()):
+        """Check the order of the packages in a RequirementsIndex in a single
+        pass, returning a list of ``(package, missing)`` pairs for each
+        package which appears before any of the packages it depends on (or
+        whose dependencies are missing from the file entirely).  The named
+        packages in ``exclude`` aren't checked."""
+        excluded = {normalize_name(name) for name in exclude}
+        seen = set()
+        result = []
+        for requirement in requirements.requirements:
+            if requirement.key in seen:
+                continue
+            dependencies = self.constraints.get(requirement.key)
+            if dependencies and requirement.key not in excluded:
+                missing = sorted(self.names[key] for key in dependencies - seen)
+                if missing:
+                    result.append((requirement.name, missing))
+            seen.add(requirement.key)
+        return result
+
+
+class RequirementsGraph(object):
+    """The graph of requirements files and the files they include.  Parsed
+    files and the flattened requirements of each file are cached, and are
+    re-parsed only when the content of one of the files involved changes."""
+
+    def __init__(self, file_cache):
+        self.file_cache = file_cache
+        self._files = {}
+        self._flattened = {}
+        self._indexes = {}
+
+    def get_file(self, path):
+        """Get the parsed RequirementsFile for the given path"""
+        path = os.path.abspath(path)
+        cached = self.file_cache.get(path)
+        entry = self._files.get(path)
+        if entry is not None and entry[0] is cached:
+            return entry[1]
+        parsed = RequirementsFile(path, cached.lines if cached is not None else [])
+        self._files[path] = (cached, parsed)
+        return parsed
+
+    def requirements(self, path):
+        """Get the Requirements in a requirements file, with those from any
+        other requirements files it includes in place of the include.  Any
+        include which would create a cycle is skipped."""
+        return list(self._flatten(os.path.abspath(path), []))
+
+    def requirement_lines(self, path):
+        """Get the ``name==version`` lines for the requirements in a
+        requirements file (or any other requirements file it includes) which
+        are pinned to a single version"""
+        return list(self.requirements_index(path).lines)
+
+    def requirements_index(self, path):
+        """Get a RequirementsIndex of the pinned requirements from a
+        requirements file and any others it includes"""
+        path = os.path.abspath(path)
+        requirements = self._flatten(path, [])
+        entry = self._indexes.get(path)
+        if entry is not None and entry[0] is requirements:
+            return entry[1]
+        index = RequirementsIndex(requirements)
+        self._indexes[path] = (requirements, index)
+        return index
+
+    def closure(self, path):
+        """Get the absolute paths of a requirements file and every
+        requirements or constraints file it references (directly or
+        indirectly), in the order they're first reached.  Referenced files
+        which don't exist are included, but not followed."""
+        pending = [os.path.abspath(path)]
+        seen = []
+        while pending:
+            current = pending.pop(0)
+            if current in seen:
+                continue
+            seen.append(current)
+            if self.file_cache.get(current) is not None:
+                parsed = self.get_file(current)
+                pending.extend(parsed.includes + parsed.constraints)
+        return seen
+
+    def digest(self, path):
+        """Get a hex digest of the content of a requirements file and every
+        requirements or constraints file it references (see closure()),
+        which changes if any of them do.  Included files are identified by
+        their path relative to the given file, so the digest doesn't depend
+        on where the files are."""
+        base_dir = os.path.dirname(os.path.abspath(path))
+        digest = hashlib.sha1()
+        for current in self.closure(path):
+            cached = self.file_cache.get(current)
+            size = -1 if cached is None else len(cached.content)
+            name = os.path.relpath(current, base_dir).replace(os.sep, '/')
+            digest.update('{}\0{}\0'.format(name, size).encode('utf-8'))
+            if cached is not None:
+                digest.update(cached.content)
+        return digest.hexdigest()
+
+    def cycles(self, *paths):
+        """Get a list of the include cycles reachable from any of the given
+        requirements files; each is a list of paths starting and ending with
+        the same file"""
+        found = []
+        visited = set()
+        for path in paths:
+            self._find_cycles(os.path.abspath(path), [], visited, found)
+        return found
+
+    def _is_current(self, dependencies):
+        return all(self.file_cache.get(path) is cached for path, cached in dependencies)
+
+    def _flatten(self, path, stack):
+        memo = self._flattened.get(path)
+        if memo is not None and self._is_current(memo[1]):
+            return memo[0]
+        stack.append(path)
+        parsed = self.get_file(path)
+        result = []
+        dependencies = [(path, self._files[path][0])]
+        complete = True
+        for kind, value in parsed.entries:
+            if kind == 'requirement':
+                result.append(value)
+            elif kind == 'constraint':
+                continue
+            elif value in stack:
+                complete = False
+            else:
+                result.extend(self._flatten(value, stack))
+                sub_memo = self._flattened.get(value)
+                if sub_memo is None:
+                    complete = False
+                else:
+                    dependencies.extend(sub_memo[1])
+        stack.pop()
+        # Only memoize results which don't depend on where a cycle was broken
+        if complete:
+            self._flattened[path] = (result, dependencies)
+        else:
+            self._flattened.pop(path, None)
+        return result
+
+    def _find_cycles(self, path, stack, visited, found):
+        if path in stack:
+            found.append(stack[stack.index(path):] + [path])
+            return
+        if path in visited:
+            return
+        visited.add(path)
+        stack.append(path)
+        for sub_path in self.get_file(path).includes:
+            self._find_cycles(sub_path, stack, visited, found)
+        stack.pop()
@@ -0,0 +1,58 @@
+# encoding: utf-8
+"""
+Searching a file's text for many strings and patterns at once.  Checks which
+each look for something in the same file used to search all of its text
+separately; instead, a module of checks declares a RuleSet for the file, the
+text is scanned once by a single regular expression combining all of the
+rules, and each check looks up whether its own rule matched.
+"""
+
+from __future__ import unicode_literals
+
+import re
+
+
+class RuleSet(object):
+    """Named rules to search a text for in a single pass.  Each of the
+    ``literals`` is a string to look for, named by itself; ``patterns`` is a
+    mapping of names to regular expressions (compiled with ``flags``).
+    Patterns may contain groups, but not named groups or backreferences.
+
+    The combined expression only reports one match starting at any given
+    position, so a rule whose matches all start inside a match of another
+    rule can be missed by the single pass; such positions (usually just a
+    few short spans) are checked for each rule not found, so the result is
+    the same as searching for each rule separately."""
+
+    def __init__(self, literals=(), patterns=None, flags=0):
+        rules = [(literal, re.escape(literal)) for literal in literals]
+        rules.extend(sorted((patterns or {}).items()))
+        self.names = [name for name, _ in rules]
+        self._compiled = [(name, re.compile(pattern, flags)) for name, pattern in rules]
+        self._group_names = {}
+        alternatives = []
+        group = 1
+        for name, compiled in self._compiled:
+            self._group_names[group] = name
+            alternatives.append('({})'.format(compiled.pattern))
+            group += compiled.groups + 1
+        self._combined = re.compile('|'.join(alternatives), flags) if alternatives else None
+
+    def scan(self, text):
+        """Get the set of names of the rules which match somewhere in the
+        given text"""
+        found = set()
+        if self._combined is None:
+            return frozenset(found)
+        spans = []
+        for match in self._combined.finditer(text):
+            found.add(self._group_names[match.lastindex])
+            spans.append(match.span())
+        for name, compiled in self._compiled:
+            if name in found:
+                continue
+            for start, end in spans:
+                if any(compiled.match(text, position) for position in range(start, max(end, start + 1))):
+                    found.add(name)
+                    break
+        return frozenset(found)
@@ -0,0 +1,246 @@
+# encoding: utf-8
+"""
+A model of a package's ``setup.py``, built from a single parse of its syntax
+tree without running it.  The keyword arguments of the ``setup()`` call are
+extracted, with names resolved to the values assigned to them at the top
+level of the module where possible (like ``version=version``), along with
+the few facts about the rest of the script that the checks need.  Models
+are cached by a hash of the script's content, so repositories sharing a
+generated ``setup.py`` only parse it once.
+"""
+
+from __future__ import unicode_literals
+
+import ast
+from collections import OrderedDict
+import hashlib
+import threading
+
+#: Maximum number of parsed setup.py models to keep
+CACHE_SIZE = 256
+
+_MODELS = OrderedDict()
+_LOCK = threading.Lock()
+
+_CONSTANT = getattr(ast, 'Constant', None)
+_STR = getattr(ast, 'Str', None) if _CONSTANT is None else None
+
+
+class _Unresolved(object):
+    """Marker for an expression whose value can't be determined statically"""
+
+
+UNRESOLVED = _Unresolved()
+
+
+def _string_value(node):
+    """The value of a string literal node, or None for any other node"""
+    if _CONSTANT is not None and isinstance(node, _CONSTANT) and isinstance(node.value, type('')):
+        return node.value
+    if _STR is not None and isinstance(node, _STR):
+        return node.s
+    return None
+
+
+def _dotted_name(node):
+    """The dotted name (like ``codecs.open``) of a name or attribute node,
+    or None for any other expression"""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return '.'.join(reversed(parts))
+
+
+class SetupModel(object):
+    """
+    The statically determinable content of a ``setup.py`` script:
+
+    * ``keywords``: the names of the keyword arguments given to ``setup()``
+    * ``values``: the values of those keyword arguments which could be
+      resolved, keyed by name (others are left out)
+    * ``variables``: the names of the variables given as the values of those
+      keyword arguments, keyed by keyword (like ``version=version``)
+    * ``imports``: the names of the imported modules
+    * ``calls``: the dotted names of the functions called (like
+      ``codecs.open`` or ``r.match_markers``)
+    * ``call_keywords``: the keyword argument names used in calls, keyed by
+      the last component of each called function's name
+    * ``strings``: every string literal in the script
+    * ``comprehension_elements``: the dotted names (like ``r.req``) produced
+      by the elements of each list comprehension
+    * ``opened_files``: the ``(function, path, encoding)`` of each file opened
+      in a ``with`` statement, keyed by the name the file is bound to
+    * ``assignments``: the top-level names assigned the result of a method
+      call, like ``long_description = f.read()``, mapped to the call's dotted
+      name
+
+    ``syntax_error`` is the error message if the script couldn't be parsed,
+    in which case everything else is empty.
+    """
+
+    def __init__(self, text):
+        self.keywords = []
+        self.values = {}
+        self.variables = {}
+        self.imports = set()
+        self.calls = set()
+        self.call_keywords = {}
+        self.strings = []
+        self.comprehension_elements = set()
+        self.opened_files = {}
+        self.assignments = {}
+        self.syntax_error = None
+        try:
+            tree = ast.parse(text)
+        except (SyntaxError, ValueError) as e:
+            self.syntax_error = str(e)
+            return
+        self._constants = {}
+        setup_call = None
+        for statement in tree.body:
+            self._record_assignment(statement)
+            if isinstance(statement, ast.With):
+                for item in getattr(statement, 'items', None) or [statement]:
+                    self._record_opened_file(item.context_expr, item.optional_vars)
+                for inner in statement.body:
+                    self._record_assignment(inner)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Call):
+                name = _dotted_name(node.func)
+                if name is not None:
+                    self.calls.add(name)
+                    keywords = self.call_keywords.setdefault(name.rsplit('.', 1)[-1], set())
+                    keywords.update(keyword.arg for keyword in node.keywords if keyword.arg)
+                    if setup_call is None and name.rsplit('.', 1)[-1] == 'setup':
+                        setup_call = node
+            elif isinstance(node, ast.Import):
+                self.imports.update(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module:
+                self.imports.add(node.module)
+            elif isinstance(node, ast.ListComp):
+                element = _dotted_name(node.elt)
+                if element is not None:
+                    self.comprehension_elements.add(element)
+            else:
+                value = _string_value(node)
+                if value is not None:
+                    self.strings.append(value)
+        if setup_call is not None:
+            for keyword in setup_call.keywords:
+                if keyword.arg is None:
+                    continue
+                self.keywords.append(keyword.arg)
+                if isinstance(keyword.value, ast.Name):
+                    self.variables[keyword.arg] = keyword.value.id
+                value = self._resolve(keyword.value, ())
+                if value is not UNRESOLVED:
+                    self.values[keyword.arg] = value
+        del self._constants
+
+    def _record_assignment(self, statement):
+        if not isinstance(statement, ast.Assign) or len(statement.targets) != 1:
+            return
+        target = statement.targets[0]
+        if not isinstance(target, ast.Name):
+            return
+        self._constants[target.id] = statement.value
+        if isinstance(statement.value, ast.Call):
+            self.assignments[target.id] = _dotted_name(statement.value.func)
+
+    def _record_opened_file(self, expression, variable):
+        if not isinstance(expression, ast.Call) or not isinstance(variable, ast.Name):
+            return
+        arguments = [_string_value(argument) for argument in expression.args]
+        keywords = {keyword.arg: _string_value(keyword.value) for keyword in expression.keywords}
+        path = arguments[0] if arguments else keywords.get('filename', keywords.get('file'))
+        encoding = arguments[2] if len(arguments) > 2 else keywords.get('encoding')
+        self.opened_files[variable.id] = (_dotted_name(expression.func), path, encoding)
+
+    def _resolve(self, node, seen):
+        """Get the value of an expression built from literals and names
+        assigned them at the top level of the script, or UNRESOLVED"""
+        if isinstance(node, ast.Name) and node.id not in ('True', 'False', 'None'):
+            if node.id in seen or node.id not in self._constants:
+                return UNRESOLVED
+            return self._resolve(self._constants[node.id], seen + (node.id,))
+        if isinstance(node, (ast.List, ast.Tuple)):
+            items = [self._resolve(item, seen) for item in node.elts]
+            if any(item is UNRESOLVED for item in items):
+                return UNRESOLVED
+            return items if isinstance(node, ast.List) else tuple(items)
+        if isinstance(node, ast.Dict):
+            keys = [self._resolve(key, seen) for key in node.keys if key is not None]
+            values = [self._resolve(value, seen) for value in node.values]
+            if len(keys) != len(values) or any(item is UNRESOLVED for item in keys + values):
+                return UNRESOLVED
+            return dict(zip(keys, values))
+        try:
+            return ast.literal_eval(node)
+        except (SyntaxError, TypeError, ValueError):
+            return UNRESOLVED
+
+    @property
+    def name(self):
+        """The distribution name, or None if it couldn't be determined"""
+        return self.values.get('name')
+
+    @property
+    def version(self):
+        """The package version, or None if it couldn't be determined"""
+        return self.values.get('version')
+
+    @property
+    def classifiers(self):
+        """The list of trove classifiers (empty if they couldn't be
+        determined)"""
+        return list(self.values.get('classifiers', []))
+
+    @property
+    def entry_points(self):
+        """The entry points, as given to setup(); usually a dictionary of
+        lists keyed by group name.  None if they couldn't be determined."""
+        return self.values.get('entry_points')
+
+    @property
+    def install_requires(self):
+        """The list of requirements for installing the package, or None if it
+        couldn't be determined (for example, if it's built from a
+        requirements file)"""
+        value = self.values.get('install_requires')
+        return None if value is None else list(value)
+
+    def calls_function(self, name):
+        """True if the script calls a function or method with the given name
+        (like ``parse_requirements``, whatever it was imported from)"""
+        return any(call == name or call.endswith('.' + name) for call in self.calls)
+
+    def keyword_source(self, keyword):
+        """If the named setup() keyword argument is given a variable assigned
+        the contents of a file opened in a ``with`` statement (like
+        ``long_description = f.read()``), the ``(function, path, encoding)``
+        used to open that file; otherwise None"""
+        assigned = self.assignments.get(self.variables.get(keyword))
+        if assigned is None or not assigned.endswith('.read'):
+            return None
+        return self.opened_files.get(assigned[:-len('.read')])
+
+
+def parse_setup(text):
+    """Get the SetupModel for the given ``setup.py`` content, parsing it only
+    if the same content hasn't already been parsed"""
+    key = hashlib.sha1(text.encode('utf-8')).hexdigest()
+    with _LOCK:
+        model = _MODELS.pop(key, None)
+        if model is not None:
+            _MODELS[key] = model
+            return model
+    model = SetupModel(text)
+    with _LOCK:
+        _MODELS[key] = model
+        while len(_MODELS) > CACHE_SIZE:
+            _MODELS.popitem(last=False)
+    return model
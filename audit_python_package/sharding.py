@@ -0,0 +1,63 @@
+# encoding: utf-8
+"""
+Splitting a fleet audit across several machines.  The work is divided into
+(repository, check) units, which are assigned to shards by a deterministic
+greedy balancing of their expected costs: units are taken from the most to
+the least expensive, each going to the shard with the least total cost so
+far.  The cost of each check is its average time in a previous run's timing
+data (as saved by ``--audit-timings-json``), so every machine computes the
+same assignment from the same repository list, keyword expression, and
+timing file, without needing to coordinate.  Checks without timing data are
+assumed to take the average time of those with it.
+"""
+
+from __future__ import unicode_literals
+
+import codecs
+import heapq
+import json
+
+
+def parse_shard(text):
+    """Parse an ``I/N`` shard specification into a (1-based index, count)
+    pair, raising ValueError if it's invalid"""
+    index, separator, count = text.partition('/')
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        index = count = 0
+    if not separator or count < 1 or not 1 <= index <= count:
+        raise ValueError('Invalid shard "{}"; expected I/N with 1 <= I <= N'.format(text))
+    return index, count
+
+
+def load_check_costs(path):
+    """Get the average wall clock time of each check in a timing data file
+    saved by TimingRecorder.dump(), keyed by check identifier"""
+    with codecs.open(path, 'r', 'utf-8') as f:
+        data = json.loads(f.read())
+    return {sample['name']: sample['wall'] / max(sample['calls'], 1)
+            for sample in data['samples'] if sample['kind'] == 'check'}
+
+
+def assign_shards(units, count, costs=None):
+    """Split a list of (repository, check identifier) units into ``count``
+    lists of roughly equal total cost, given a dictionary of costs keyed by
+    check identifier (all units cost the same if it's empty or None).  The
+    result depends only on the arguments, not on the order of ``units``."""
+    costs = costs or {}
+    default = sum(costs.values()) / len(costs) if costs else 1.0
+    ordered = sorted(set(units), key=lambda unit: (-costs.get(unit[1], default), unit))
+    shards = [[] for _ in range(count)]
+    loads = [(0.0, index) for index in range(count)]
+    for unit in ordered:
+        load, index = heapq.heappop(loads)
+        shards[index].append(unit)
+        heapq.heappush(loads, (load + costs.get(unit[1], default), index))
+    return shards
+
+
+def shard_units(units, index, count, costs=None):
+    """Get the units assigned to the given shard (a 1-based index, as in
+    ``--shard I/N``) by assign_shards()"""
+    return assign_shards(units, count, costs)[index - 1]
@@ -0,0 +1,516 @@
+# encoding: utf-8
+"""
+The places the files being audited can be read from.  By default that's the
+filesystem, but a repository can also be audited as of any commit, branch,
+or tag by reading its files straight from the git object store, and a built
+source distribution or wheel can be audited without extracting it.  The
+package's file helper functions read from whichever source is current (see
+``audit_python_package.file_source()``).
+"""
+
+from __future__ import unicode_literals
+
+import binascii
+from fnmatch import fnmatch
+import io
+import os
+import subprocess
+import tarfile
+import threading
+import zipfile
+
+from audit_python_package.timing import timed
+
+
+class FileSource(object):
+    """Base class for sources of the files being audited.  Paths may be
+    absolute or relative to the current directory."""
+
+    def cache_key(self, path):
+        """Get an (identity, version) pair for the file at the given path, for
+        use in caching its content; returns None if there is no such file"""
+        raise NotImplementedError
+
+    def read(self, path):
+        """Get the content of the file at the given path as bytes, or None if
+        there is no such file"""
+        raise NotImplementedError
+
+    def is_file(self, path):
+        """True if there is a regular file at the given path"""
+        raise NotImplementedError
+
+    def is_directory(self, path):
+        """True if there is a directory at the given path"""
+        raise NotImplementedError
+
+    def is_executable(self, path):
+        """True if there is a file at the given path with execute permission"""
+        raise NotImplementedError
+
+    def list_directory(self, path):
+        """Get the sorted names of the entries in the directory at the given
+        path, or an empty list if there is no such directory"""
+        raise NotImplementedError
+
+    def object_id(self, path):
+        """Get the git blob ID of the file at the given path if the source
+        already knows it without reading the file, or None otherwise"""
+        return None
+
+    def exists(self, path):
+        """True if there is a file or directory at the given path"""
+        return self.is_file(path) or self.is_directory(path)
+
+    def glob(self, pattern):
+        """Get the sorted paths of the files matching a glob pattern; like
+        glob.glob(), except that wildcards are only supported in the last
+        component of the pattern"""
+        directory, name_pattern = os.path.split(pattern)
+        if not any(character in name_pattern for character in '*?['):
+            return [pattern] if self.is_file(pattern) else []
+        paths = []
+        for name in self.list_directory(directory or os.curdir):
+            if name.startswith('.') and not name_pattern.startswith('.'):
+                continue
+            path = os.path.join(directory, name)
+            if fnmatch(name, name_pattern) and self.is_file(path):
+                paths.append(path)
+        return paths
+
+
+class WorkingTreeSource(FileSource):
+    """Reads files from the filesystem"""
+
+    def cache_key(self, path):
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return None
+        return os.path.abspath(path), (getattr(stat_result, 'st_mtime_ns', stat_result.st_mtime),
+                                       stat_result.st_size)
+
+    def read(self, path):
+        try:
+            with io.open(path, 'rb') as f:
+                return f.read()
+        except IOError:
+            return None
+
+    def is_file(self, path):
+        return os.path.isfile(path)
+
+    def is_directory(self, path):
+        return os.path.isdir(path)
+
+    def is_executable(self, path):
+        return os.path.isfile(path) and os.access(path, os.X_OK)
+
+    def list_directory(self, path):
+        try:
+            return sorted(os.listdir(path))
+        except OSError:
+            return []
+
+
+class OverlaySource(FileSource):
+    """
+    Base class for sources which provide the files under a root directory
+    from somewhere other than the filesystem (like a git tree or a built
+    package archive).  Paths outside of the root directory (like the audit
+    package's own data files) are still read from the filesystem.
+    Subclasses implement the versions of the FileSource methods whose names
+    start with an underscore, which are passed the components of a path
+    relative to the root.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._prefix = os.path.join(self.root, '')
+        self._filesystem = WorkingTreeSource()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Release any resources used to read the files"""
+
+    def verify(self):
+        """Make sure that the files can be read, raising a ValueError with a
+        description of the problem if they can't"""
+
+    def _relative_parts(self, path):
+        """Get the components of the path relative to the root directory, or
+        None if it's outside of the root directory"""
+        path = os.path.abspath(path)
+        if path == self.root:
+            return []
+        if not path.startswith(self._prefix):
+            return None
+        return path[len(self._prefix):].split(os.sep)
+
+    def cache_key(self, path):
+        parts = self._relative_parts(path)
+        return self._filesystem.cache_key(path) if parts is None else self._cache_key(parts)
+
+    def read(self, path):
+        parts = self._relative_parts(path)
+        return self._filesystem.read(path) if parts is None else self._read(parts)
+
+    def object_id(self, path):
+        parts = self._relative_parts(path)
+        return None if parts is None else self._object_id(parts)
+
+    def is_file(self, path):
+        parts = self._relative_parts(path)
+        return self._filesystem.is_file(path) if parts is None else self._is_file(parts)
+
+    def is_directory(self, path):
+        parts = self._relative_parts(path)
+        return self._filesystem.is_directory(path) if parts is None else self._is_directory(parts)
+
+    def is_executable(self, path):
+        parts = self._relative_parts(path)
+        return self._filesystem.is_executable(path) if parts is None else self._is_executable(parts)
+
+    def list_directory(self, path):
+        parts = self._relative_parts(path)
+        return self._filesystem.list_directory(path) if parts is None else self._list_directory(parts)
+
+    def _object_id(self, parts):
+        return None
+
+
+#: Tree entry modes in git
+_DIRECTORY_MODE = '40000'
+_EXECUTABLE_MODE = '100755'
+_FILE_MODES = ('100644', _EXECUTABLE_MODE)
+
+
+class GitTreeSource(OverlaySource):
+    """
+    Reads the files of a git repository as of a given revision (any tree-ish,
+    like a commit ID, branch, or tag) from the repository's object store,
+    without needing a checkout.  Paths inside the root directory are looked
+    up in the tree; any others are read from the filesystem.  The root
+    directory may be a subdirectory of the git repository (like a package in
+    a repository containing several), in which case paths are looked up in
+    the revision's tree for that subdirectory.
+
+    All objects are read through a single ``git cat-file --batch`` process,
+    which is started when first needed and stopped by close().
+    """
+
+    def __init__(self, revision='HEAD', repository='.'):
+        super(GitTreeSource, self).__init__(repository)
+        self.revision = revision
+        self._process = None
+        self._lock = threading.Lock()
+        self._trees = {}
+        self._tree_id = None
+        self._root_trees = {}
+
+    def set_revision(self, revision, tree_id=None):
+        """Switch to reading the files of a different revision (whose root
+        tree ID may be given if it's already known), reusing the same git
+        process and any trees already read"""
+        self.revision = revision
+        self._tree_id = tree_id
+
+    def verify(self):
+        if self._root_entry() is None:
+            raise ValueError('{} does not exist in git revision {}'.format(self.root, self.revision))
+
+    @property
+    def tree_id(self):
+        """The ID of the root tree of the revision being read (of the whole
+        repository, even if the root directory is a subdirectory of it)"""
+        if self._tree_id is None:
+            object_type, self._tree_id, _ = self._read_object('{}^{{tree}}'.format(self.revision))
+            if object_type != 'tree':
+                raise ValueError('Unknown git revision {} in {}'.format(self.revision, self.root))
+        return self._tree_id
+
+    def _root_entry(self):
+        """Get the (mode, object ID) pair for the tree of the root directory
+        in the revision being read, or None if it doesn't exist there"""
+        tree_id = self.tree_id
+        if tree_id not in self._root_trees:
+            # "<tree>:./" is resolved relative to the directory git runs in,
+            # giving the subdirectory's own tree if the root is one
+            object_type, object_id, _ = self._read_object('{}:./'.format(tree_id))
+            self._root_trees[tree_id] = object_id if object_type == 'tree' else None
+        root_tree_id = self._root_trees[tree_id]
+        return None if root_tree_id is None else (_DIRECTORY_MODE, root_tree_id)
+
+    def close(self):
+        """Stop the git process used to read objects, if it's running"""
+        with self._lock:
+            if self._process is not None:
+                self._process.stdin.close()
+                self._process.wait()
+                self._process.stdout.close()
+                self._process = None
+
+    def _read_object(self, name):
+        """Get the type, ID, and content of the named object; the type is
+        None if there is no such object"""
+        with self._lock:
+            if self._process is None:
+                try:
+                    self._process = subprocess.Popen(['git', 'cat-file', '--batch'], cwd=self.root,
+                                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+                except OSError as e:
+                    raise ValueError('Unable to run git in {}: {}'.format(self.root, e))
+            process = self._process
+            with timed('git', 'cat-file'):
+                process.stdin.write(name.encode('utf-8') + b'\n')
+                process.stdin.flush()
+                header = process.stdout.readline().decode('utf-8').split()
+                if not header:
+                    raise ValueError('Not a git repository: {}'.format(self.root))
+                if len(header) != 3:
+                    return None, None, None
+                content = process.stdout.read(int(header[2]))
+                process.stdout.read(1)
+        return header[1], header[0], content
+
+    def _tree(self, tree_id):
+        """Get the entries of a tree object as a dictionary of (mode, object
+        ID) pairs keyed by name"""
+        entries = self._trees.get(tree_id)
+        if entries is None:
+            _, _, data = self._read_object(tree_id)
+            id_length = len(tree_id) // 2
+            entries = {}
+            index = 0
+            while index < len(data):
+                space = data.index(b' ', index)
+                nul = data.index(b'\0', space)
+                mode = data[index:space].decode('ascii')
+                name = data[space + 1:nul].decode('utf-8', 'replace')
+                entries[name] = (mode, binascii.hexlify(data[nul + 1:nul + 1 + id_length]).decode('ascii'))
+                index = nul + 1 + id_length
+            self._trees[tree_id] = entries
+        return entries
+
+    def entry(self, path):
+        """Get the (mode, object ID) pair for the tree entry (file or
+        directory) at the given path in the repository, or None if there
+        isn't one"""
+        parts = self._relative_parts(path)
+        return None if parts is None else self._entry(parts)
+
+    def _entry(self, parts):
+        """Get the (mode, object ID) pair for the tree entry at the given path
+        components, or None if there isn't one"""
+        entry = self._root_entry()
+        if entry is None:
+            return None
+        for part in parts:
+            if entry[0] != _DIRECTORY_MODE:
+                return None
+            entry = self._tree(entry[1]).get(part)
+            if entry is None:
+                return None
+        return entry
+
+    def _file_entry(self, parts):
+        entry = self._entry(parts)
+        return entry if entry is not None and entry[0] in _FILE_MODES else None
+
+    def _cache_key(self, parts):
+        entry = self._file_entry(parts)
+        # Blobs are immutable, so the object ID alone identifies the content
+        return None if entry is None else (('git', entry[1]), None)
+
+    def _read(self, parts):
+        entry = self._file_entry(parts)
+        return None if entry is None else self._read_object(entry[1])[2]
+
+    def _object_id(self, parts):
+        entry = self._file_entry(parts)
+        return None if entry is None else entry[1]
+
+    def _is_file(self, parts):
+        return self._file_entry(parts) is not None
+
+    def _is_directory(self, parts):
+        entry = self._entry(parts)
+        return entry is not None and entry[0] == _DIRECTORY_MODE
+
+    def _is_executable(self, parts):
+        entry = self._entry(parts)
+        return entry is not None and entry[0] == _EXECUTABLE_MODE
+
+    def _list_directory(self, parts):
+        entry = self._entry(parts)
+        if entry is None or entry[0] != _DIRECTORY_MODE:
+            return []
+        return sorted(self._tree(entry[1]))
+
+
+#: File name extensions of the package archives which can be audited
+ARCHIVE_EXTENSIONS = ('.tar.gz', '.tgz', '.tar.bz2', '.tar', '.whl', '.zip')
+
+
+def is_archive(path):
+    """True if the path is that of a package archive which can be audited"""
+    return path.endswith(ARCHIVE_EXTENSIONS) and os.path.isfile(path)
+
+
+class ArchiveSource(OverlaySource):
+    """
+    Reads the files in a built package archive, like a source distribution
+    (``.tar.gz``) or wheel (``.whl``), without extracting it to disk.  The
+    files are served as though the archive had been extracted into ``root``
+    (by default, the directory containing it), without the top-level
+    directory that source distributions have.
+
+    Zip files (including wheels) are indexed via their central directory, and
+    only the members which are actually read get decompressed.  Compressed
+    tar files can only be read sequentially, so they're read in one streaming
+    pass which keeps just the members matching ``patterns`` (by default, the
+    input files of all the checks) in memory; any other member is only found
+    by another pass if it's requested.
+    """
+
+    def __init__(self, path, root=None, patterns=None):
+        self.path = os.path.abspath(path)
+        super(ArchiveSource, self).__init__(root or os.path.dirname(self.path))
+        if patterns is None:
+            from audit_python_package.incremental import CHECK_INPUTS
+            patterns = sorted({pattern for module_patterns in CHECK_INPUTS.values() for pattern in module_patterns})
+        self.patterns = patterns
+        self._lock = threading.Lock()
+        self._files = None
+        self._directories = None
+        self._version = None
+        self._zip = None
+
+    def close(self):
+        """Close the archive, if it's a zip file"""
+        with self._lock:
+            if self._zip is not None:
+                self._zip.close()
+                self._zip = None
+
+    def verify(self):
+        self._index()
+
+    def _wanted(self, name):
+        return any(fnmatch(name, pattern) for pattern in self.patterns)
+
+    def _index(self):
+        """Get the dictionary of [executable, content, member] lists for the
+        files in the archive keyed by relative path, reading the archive's
+        index (or all of it, for a tar file) if it hasn't been yet.  The
+        content is None if it hasn't been read yet."""
+        with self._lock:
+            if self._files is None:
+                try:
+                    stat_result = os.stat(self.path)
+                    self._version = (stat_result.st_mtime, stat_result.st_size)
+                    with timed('archive', os.path.basename(self.path)):
+                        if zipfile.is_zipfile(self.path):
+                            members = self._index_zip()
+                        else:
+                            members = self._index_tar()
+                except (IOError, OSError, tarfile.TarError, zipfile.BadZipfile) as e:
+                    raise ValueError('Unable to read {}: {}'.format(self.path, e))
+                self._build_index(members)
+        return self._files
+
+    def _index_zip(self):
+        self._zip = zipfile.ZipFile(self.path)
+        return [(info.filename, bool((info.external_attr >> 16) & 0o111), None, info)
+                for info in self._zip.infolist() if not info.filename.endswith('/')]
+
+    def _index_tar(self):
+        members = []
+        with tarfile.open(self.path, 'r|*') as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                name = member.name
+                relative = name.split('/', 1)[-1]
+                content = None
+                if self._wanted(name) or self._wanted(relative):
+                    content = archive.extractfile(member).read()
+                members.append((name, bool(member.mode & 0o111), content, name))
+        return members
+
+    def _build_index(self, members):
+        """Index the archive's files by path, stripping the top-level
+        directory if they all have the same one"""
+        names = [name[2:] if name.startswith('./') else name for name, _, _, _ in members]
+        top_levels = {name.split('/', 1)[0] for name in names}
+        strip = len(top_levels) == 1 and all('/' in name for name in names)
+        self._files = {}
+        self._directories = {'': set()}
+        for name, (_, executable, content, member) in zip(names, members):
+            if strip:
+                name = name.split('/', 1)[1]
+            self._files[name] = [executable, content, member]
+            parts = name.split('/')
+            for index in range(len(parts)):
+                directory = '/'.join(parts[:index])
+                self._directories.setdefault(directory, set()).add(parts[index])
+
+    def _cache_key(self, parts):
+        name = '/'.join(parts)
+        if name not in self._index():
+            return None
+        return ('archive', self.path, name), self._version
+
+    def _read(self, parts):
+        entry = self._index().get('/'.join(parts))
+        if entry is None:
+            return None
+        if entry[1] is None:
+            with self._lock:
+                if self._zip is not None:
+                    entry[1] = self._zip.read(entry[2])
+                else:
+                    entry[1] = self._extract_tar_member(entry[2])
+        return entry[1]
+
+    def _extract_tar_member(self, name):
+        """Read a member of the tar file which wasn't kept in memory by the
+        initial pass"""
+        with timed('archive', os.path.basename(self.path)):
+            with tarfile.open(self.path, 'r|*') as archive:
+                for member in archive:
+                    if member.name == name:
+                        return archive.extractfile(member).read()
+        return None
+
+    def _is_file(self, parts):
+        return '/'.join(parts) in self._index()
+
+    def _is_directory(self, parts):
+        self._index()
+        return '/'.join(parts) in self._directories
+
+    def _is_executable(self, parts):
+        entry = self._index().get('/'.join(parts))
+        return entry is not None and entry[0]
+
+    def _list_directory(self, parts):
+        self._index()
+        return sorted(self._directories.get('/'.join(parts), ()))
+
+
+def source_for(path, revision=None):
+    """Get a (source, root directory) pair for auditing the repository or
+    package archive at the given path, optionally as of the given git
+    revision.  The source is None for an ordinary working directory."""
+    if revision:
+        return GitTreeSource(revision, path), path
+    if is_archive(path):
+        source = ArchiveSource(path)
+        return source, source.root
+    return None, path
@@ -17,20 +17,23 @@ example, PIL -> Pillow or py-bcrypt -> bcrypt).  We can't just use
 ``pip uninstall -r requirements/uninstall.txt`` for this because it aborts
 after finding one package in the list which has already been uninstalled,
 ignoring the rest of the list.
+
+Because the script runs in every tox environment and after every merge, it
+should find out what's already installed with a single scan of the
+installed distributions' metadata and only run pip if something actually
+needs to change.
 """
 
 from __future__ import unicode_literals
 
 import os
 
-import pytest
-
-from audit_python_package import get_file_content
+from audit_python_package import file_exists, fixture, get_file_content
 
 SCRIPT_PATH = os.path.join('requirements', 'clean_up_requirements.py')
 
 
-@pytest.fixture(scope='module')
+@fixture(scope='module')
 def clean_up_requirements():
     """Fixture containing the text content of requirements/clean_up_requirements.py"""
     return get_file_content(SCRIPT_PATH)
@@ -38,7 +41,7 @@ def clean_up_requirements():
 
 def test_script_exists():
     """There should be a requirements/clean_up_requirements.py script"""
-    assert os.path.exists(SCRIPT_PATH)
+    assert file_exists(SCRIPT_PATH)
 
 
 def test_only_runs_if_top_level(clean_up_requirements):
@@ -50,19 +53,28 @@ def test_uninstalls_previous_dependencies(clean_up_requirements):
     """requirements/clean_up_requirements.py should uninstall any former dependencies"""
     assert "requirements_path = os.path.join(requirements_dir, 'uninstall.txt')" in clean_up_requirements
     assert 'Uninstalling former requirements...' in clean_up_requirements
-    assert 'req.uninstall(auto_confirm=True)' in clean_up_requirements
+    assert "[sys.executable, '-m', 'pip', 'uninstall', '-y'] + former" in clean_up_requirements
 
 
 def test_setuptools_installation(clean_up_requirements):
     """requirements/clean_up_requirements.py should install the correct setuptools version"""
     assert "match = re.search(r'^setuptools==([\d\.]+)$', requirements, re.MULTILINE)" in clean_up_requirements
-    assert "os.system('pip install setuptools=={}'.format(match.group(1)))" in clean_up_requirements
+    assert "install.append('setuptools=={}'.format(match.group(1)))" in clean_up_requirements
 
 
 def test_pip_installation(clean_up_requirements):
     """requirements/clean_up_requirements.py should install the correct pip version"""
     assert "match = re.search(r'^pip==([\d\.]+)$', requirements, re.MULTILINE)" in clean_up_requirements
-    assert "os.system('pip install pip=={}'.format(match.group(1)))" in clean_up_requirements
+    assert "install.append('pip=={}'.format(match.group(1)))" in clean_up_requirements
+
+
+def test_skips_installed_requirements(clean_up_requirements):
+    """requirements/clean_up_requirements.py should only run pip if something needs to change"""
+    assert 'installed = installed_distributions()' in clean_up_requirements
+    assert "if installed.get('setuptools') != match.group(1):" in clean_up_requirements
+    assert "if installed.get('pip') != match.group(1):" in clean_up_requirements
+    # Importing pip is slow, and its internal API changes between versions
+    assert 'from pip' not in clean_up_requirements
 
 
 def test_python_3_support(clean_up_requirements):
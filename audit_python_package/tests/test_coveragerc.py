@@ -4,14 +4,10 @@
 
 from __future__ import unicode_literals
 
-import os
+from audit_python_package import file_exists, fixture, parse_config_file
 
-import pytest
 
-from audit_python_package import parse_config_file
-
-
-@pytest.fixture(scope='module')
+@fixture(scope='module')
 def coveragerc():
     """Fixture for the parsed content of .coveragerc"""
     return parse_config_file('.coveragerc')
@@ -28,7 +24,7 @@ class TestCoveragerc(object):
 
     def test_exists(self):
         """There should be a .coveragerc file in the root directory"""
-        assert os.path.exists('.coveragerc')
+        assert file_exists('.coveragerc')
 
     def test_run_section_exists(self, coveragerc):
         """There should be a [run] section in .coveragerc"""
@@ -0,0 +1,99 @@
+# encoding: utf-8
+"""
+Tests of finding and auditing every package in a repository containing
+several of them.  Not packaged for use in other repositories.
+"""
+
+from __future__ import unicode_literals
+
+import os
+
+import pytest
+
+from audit_python_package.command_line import audit_package
+from audit_python_package.discovery import find_package_roots
+from audit_python_package.sources import WorkingTreeSource
+
+
+@pytest.fixture
+def monorepo(tmpdir):
+    """A repository containing two packages which share a requirements file,
+    plus directories which shouldn't be searched"""
+    tmpdir.mkdir('requirements').join('base.txt').write('six==1.10.0\n')
+    for name in ('alpha', 'beta'):
+        package = tmpdir.mkdir(name)
+        package.join('setup.py').write('')
+        package.mkdir('requirements').join('base.txt').write('-r ../../requirements/base.txt\n')
+    tmpdir.join('beta').mkdir('plugins').mkdir('gamma').join('setup.py').write('')
+    for name in ('.tox', 'docs', 've'):
+        tmpdir.mkdir(name).join('setup.py').write('')
+    tmpdir.join('requirements').mkdir('nested').join('setup.py').write('')
+    return tmpdir
+
+
+def test_find_package_roots(monorepo):
+    """Every directory containing a setup.py should be found, except in pruned directories"""
+    assert find_package_roots(str(monorepo)) == ['alpha', 'beta', os.path.join('beta', 'plugins', 'gamma')]
+    monorepo.join('setup.py').write('')
+    assert find_package_roots(str(monorepo))[0] == '.'
+
+
+def test_find_no_package_roots(tmpdir):
+    """A tree without any packages (or no tree at all) should have no package roots"""
+    assert find_package_roots(str(tmpdir)) == []
+    assert find_package_roots(str(tmpdir.join('missing'))) == []
+
+
+def test_audit_all_packages(monorepo, monkeypatch, capsys):
+    """Each package should be audited, with shared files only read once"""
+    shared = str(monorepo.join('requirements', 'base.txt'))
+    reads = []
+    read = WorkingTreeSource.read
+
+    def counting_read(self, path):
+        reads.append(os.path.abspath(path))
+        return read(self, path)
+    monkeypatch.setattr(WorkingTreeSource, 'read', counting_read)
+    keyword = 'test_no_include_cycles or (TestBaseRequirements and test_exists)'
+    with pytest.raises(SystemExit) as exc_info:
+        audit_package([str(monorepo), '--all-packages', '-k', keyword])
+    assert exc_info.value.code == 1
+    out, err = capsys.readouterr()
+    assert 'OK {} (2 passed)'.format(os.path.join(str(monorepo), 'alpha')) in out
+    assert 'FAILED {} (1 passed, 1 failed)'.format(os.path.join(str(monorepo), 'beta', 'plugins', 'gamma')) in out
+    assert '3 repositories audited, 1 with failures' in out
+    assert reads.count(shared) == 1
+
+
+def test_all_packages_options(monorepo, capsys):
+    """--all-packages should only be used on a working directory, and needs a package to audit"""
+    with pytest.raises(SystemExit) as exc_info:
+        audit_package([str(monorepo.join('docs')), '--all-packages', '--watch'])
+    assert exc_info.value.code == 2
+    with pytest.raises(SystemExit) as exc_info:
+        audit_package([str(monorepo.mkdir('empty')), '--all-packages'])
+    assert exc_info.value.code == 2
+    out, err = capsys.readouterr()
+    assert '--watch can only be used to audit a single package' in out
+    assert 'No packages found in' in out
+
+
+def test_all_packages_incremental(monorepo, capsys):
+    """Incremental audits of every package should re-run the checks which read a changed shared file"""
+    keyword = 'TestBaseRequirements and test_other_base_requirement_versions'
+    audit_package([str(monorepo), '--all-packages', '--incremental', '-k', keyword])
+    out, err = capsys.readouterr()
+    assert '3 repositories audited, 0 with failures: 3 passed' in out
+    audit_package([str(monorepo), '--all-packages', '--incremental', '-k', keyword])
+    out, err = capsys.readouterr()
+    assert out.splitlines()[0] == 'no checks run'
+    assert out.splitlines()[1].startswith('3 checks skipped: unchanged since they last passed')
+    monorepo.join('requirements', 'base.txt').write('six==1.9.0\n')
+    with pytest.raises(SystemExit) as exc_info:
+        audit_package([str(monorepo), '--all-packages', '--incremental', '-k', keyword])
+    assert exc_info.value.code == 1
+    out, err = capsys.readouterr()
+    assert 'FAILED {} (1 failed)'.format(os.path.join(str(monorepo), 'alpha')) in out
+    assert 'FAILED {} (1 failed)'.format(os.path.join(str(monorepo), 'beta')) in out
+    assert '2 repositories audited, 2 with failures: 2 failed' in out
+    assert '1 checks skipped' in out
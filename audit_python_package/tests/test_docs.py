@@ -6,21 +6,34 @@ from __future__ import unicode_literals
 
 import os
 
-import pytest
+from audit_python_package import file_exists, fixture, get_file_content, RuleSet
 
-from audit_python_package import get_file_content
 
+#: What the checks look for in docs/conf.py, all found in one pass
+CONF_RULES = RuleSet(literals=['from sbo_sphinx.conf import *', 'project = ', 'apidoc_exclude = ['])
 
-@pytest.fixture(scope='module')
+#: What the checks look for in docs/index.rst, all found in one pass
+INDEX_RULES = RuleSet(literals=[
+    '.. toctree::',
+    '<python/modules>',
+    ':ref:`genindex`',
+    ':ref:`modindex`',
+    ':ref:`search`',
+    'readme',
+    'CHANGELOG',
+])
+
+
+@fixture(scope='module')
 def conf():
-    """Fixture for the text content of docs/conf.py"""
-    return get_file_content(os.path.join('docs', 'conf.py'))
+    """Fixture for the names of the CONF_RULES found in docs/conf.py"""
+    return CONF_RULES.scan(get_file_content(os.path.join('docs', 'conf.py')))
 
 
-@pytest.fixture(scope='module')
+@fixture(scope='module')
 def index():
-    """Fixture for the text content of docs/index.rst"""
-    return get_file_content(os.path.join('docs', 'index.rst'))
+    """Fixture for the names of the INDEX_RULES found in docs/index.rst"""
+    return INDEX_RULES.scan(get_file_content(os.path.join('docs', 'index.rst')))
 
 
 class TestDocs(object):
@@ -39,7 +52,7 @@ class TestDocs(object):
 
     def test_conf_exists(self):
         """There should be a docs/conf.py file with basic configuration info for the docs"""
-        assert os.path.exists(os.path.join('docs', 'conf.py'))
+        assert file_exists(os.path.join('docs', 'conf.py'))
 
     def test_sbo_sphinx_imports(self, conf):
         """The default configuration from sbo-sphinx should be imported in docs/conf.py"""
@@ -55,7 +68,7 @@ class TestDocs(object):
 
     def test_index_exists(self):
         """There should be a docs/index.rst file for the documentation main page"""
-        assert os.path.exists(os.path.join('docs', 'index.rst'))
+        assert file_exists(os.path.join('docs', 'index.rst'))
 
     def test_index_has_toctree(self, index):
         """docs/index.rst should include a "toctree" directive"""
@@ -80,9 +93,8 @@ class TestDocs(object):
     def test_readme_exists(self):
         """There should be a docs/readme.rst referencing the root directory's README.rst"""
         path = os.path.join('docs', 'readme.rst')
-        assert os.path.exists(path)
-        with open(path, 'rU') as f:
-            assert '.. include:: ../README.rst' in f.read()
+        assert file_exists(path)
+        assert '.. include:: ../README.rst' in get_file_content(path)
 
     def test_readme_in_index(self, index):
         """There should be an entry in docs/index.rst for docs/readme.rst"""
@@ -90,7 +102,7 @@ class TestDocs(object):
 
     def test_changelog_exists(self):
         """There should be a docs/CHANGELOG.rst file for the change history"""
-        assert os.path.exists(os.path.join('docs', 'CHANGELOG.rst'))
+        assert file_exists(os.path.join('docs', 'CHANGELOG.rst'))
 
     def test_changelog_in_index(self, index):
         """There should be an entry in docs/index.rst for docs/CHANGELOG.rst"""
@@ -0,0 +1,156 @@
+# encoding: utf-8
+"""
+Tests of the native check engine and the audit_package script which uses it.
+Not packaged for use in other repositories.
+"""
+
+from __future__ import unicode_literals
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import audit_python_package
+from audit_python_package.command_line import audit_package
+from audit_python_package.engine import CheckEngine, keyword_matcher
+
+PACKAGE_PARENT = os.path.dirname(os.path.dirname(os.path.abspath(audit_python_package.__file__)))
+
+SAMPLE_CHECKS = '''
+from audit_python_package import fixture
+
+CALLS = []
+
+
+@fixture(scope='module')
+def shared():
+    CALLS.append('shared')
+    return 'shared'
+
+
+@fixture()
+def fresh(shared):
+    CALLS.append('fresh')
+    return shared + ' fresh'
+
+
+@fixture(scope='module')
+def broken():
+    raise IOError('no such file')
+
+
+def test_function(fresh):
+    assert fresh == 'shared fresh'
+
+
+class TestSample(object):
+
+    def test_method(self, shared, fresh):
+        assert shared == 'shared'
+
+    def test_failure(self):
+        value = 1
+        assert value == 2
+
+    def test_broken_fixture(self, broken):
+        pass
+
+    def test_unknown_fixture(self, missing):
+        pass
+
+
+def test_calls():
+    assert CALLS == ['shared', 'fresh', 'fresh']
+'''
+
+
+@pytest.fixture
+def sample_engine(tmpdir):
+    """An engine for a module of sample checks exercising fixture handling"""
+    tmpdir.join('test_sample.py').write(SAMPLE_CHECKS)
+    return CheckEngine(['test_sample.py'], directory=str(tmpdir))
+
+
+@pytest.fixture
+def repository(tmpdir):
+    """A minimal repository with a tox.ini"""
+    repository = tmpdir.mkdir('repository')
+    repository.join('tox.ini').write('[tox]\nenvlist = py35\n')
+    return repository
+
+
+def test_find_checks():
+    """Checks should be found with the same IDs pytest uses, excluding fixtures"""
+    ids = [check.id for check in CheckEngine().checks()]
+    assert 'test_tox.py::TestTox::test_python_35' in ids
+    assert 'test_requirements.py::test_no_include_cycles' in ids
+    assert 'test_tox.py::testenv_commands' not in ids
+    assert 'test_engine.py::test_find_checks' not in ids
+    assert ids.index('test_tox.py::TestTox::test_tox_ini_exists') < ids.index('test_tox.py::TestTox::test_python_35')
+
+
+def test_keyword_matcher(sample_engine):
+    """Keyword expressions should select checks like pytest's -k option"""
+    checks = sample_engine.checks()
+    select = keyword_matcher('Sample and not (failure or fixture)')
+    assert [check.id for check in checks if select(check)] == [
+        'test_sample.py::test_function', 'test_sample.py::TestSample::test_method', 'test_sample.py::test_calls']
+    with pytest.raises(ValueError):
+        keyword_matcher('tox and')(checks[0])
+
+
+def test_run(sample_engine, tmpdir):
+    """Fixtures should be cached per scope, and failures reported per check"""
+    results = {result.check: result for result in sample_engine.run(str(tmpdir))}
+    assert results['test_sample.py::test_function'].outcome == 'passed'
+    assert results['test_sample.py::TestSample::test_method'].outcome == 'passed'
+    assert results['test_sample.py::test_calls'].outcome == 'passed'
+    failure = results['test_sample.py::TestSample::test_failure']
+    assert failure.outcome == 'failed'
+    assert failure.message == 'AssertionError (test_sample.py:35: assert value == 2)'
+    broken = results['test_sample.py::TestSample::test_broken_fixture']
+    assert broken.outcome == 'error'
+    assert 'no such file' in broken.message
+    assert broken.message.endswith('in fixture broken')
+    assert results['test_sample.py::TestSample::test_unknown_fixture'].message == 'Unknown fixture missing'
+
+
+def test_audit_package(repository, tmpdir, capsys):
+    """audit_package should report failures and exit with an error status"""
+    keyword = 'test_tox_ini_exists or test_python_35 or (TestSetup and test_exists)'
+    with pytest.raises(SystemExit) as exc_info:
+        audit_package([str(repository), '-k', keyword])
+    assert exc_info.value.code == 1
+    out, err = capsys.readouterr()
+    assert 'FAILED test_setup.py::TestSetup::test_exists' in out
+    assert '2 passed, 1 failed' in out
+
+
+def test_audit_package_incremental(repository, capsys):
+    """The incremental option should skip checks with unchanged inputs"""
+    keyword = 'test_tox_ini_exists or test_python_35'
+    audit_package([str(repository), '-k', keyword, '--incremental'])
+    audit_package([str(repository), '-k', keyword, '--incremental'])
+    out, err = capsys.readouterr()
+    assert '2 checks skipped: unchanged since they last passed' in out
+    assert repository.join('.audit_cache', 'results.json').check()
+
+
+def test_keyword_opt_out(tmpdir):
+    """Deselecting a package's version check should also skip its ordering, under pytest or the engine"""
+    tmpdir.mkdir('requirements').join('documentation.txt').write('sbo-sphinx==1.0\n')
+    keyword = 'TestDocumentationRequirements and test_dependency_order'
+    engine = CheckEngine(['test_requirements.py'])
+    assert [result.outcome for result in engine.run(str(tmpdir), keyword)] == ['failed']
+    opt_out = keyword + ' and not test_sbo_sphinx_version'
+    assert [result.outcome for result in engine.run(str(tmpdir), opt_out)] == ['passed']
+    env = dict(os.environ, PYTHONPATH=PACKAGE_PARENT)
+    command = [sys.executable, '-m', 'pytest', '--pyargs', 'audit_python_package', '-c', os.devnull,
+               '-p', 'no:cacheprovider', '-k', opt_out]
+    process = subprocess.Popen(command, cwd=str(tmpdir), env=env, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, universal_newlines=True)
+    output = process.communicate()[0]
+    assert process.returncode == 0, output
+    assert '1 passed' in output
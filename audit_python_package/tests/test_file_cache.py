@@ -0,0 +1,79 @@
+# encoding: utf-8
+"""
+Tests of the file content cache used by the file helper functions.  Not
+packaged for use in other repositories.
+"""
+
+from __future__ import unicode_literals
+
+from audit_python_package.file_cache import FileCache
+
+
+def test_reads_once(tmpdir):
+    """A file should only be read from disk once while it is unchanged"""
+    path = tmpdir.join('tox.ini')
+    path.write('[tox]\nenvlist = py35\n')
+    cache = FileCache()
+    first = cache.get(str(path))
+    second = cache.get(str(path))
+    assert first is second
+    assert cache.bytes_read == len('[tox]\nenvlist = py35\n')
+
+
+def test_relative_and_absolute_paths_shared(tmpdir):
+    """Relative and absolute paths to the same file should share an entry"""
+    path = tmpdir.join('setup.py')
+    path.write('from setuptools import setup\n')
+    cache = FileCache()
+    with tmpdir.as_cwd():
+        relative = cache.get('setup.py')
+    assert cache.get(str(path)) is relative
+
+
+def test_invalidated_on_change(tmpdir):
+    """A cached file should be re-read after it is modified"""
+    path = tmpdir.join('MANIFEST.in')
+    path.write('include README.rst\n')
+    cache = FileCache()
+    assert cache.get(str(path)).lines == ['include README.rst']
+    path.write('include README.rst\nrecursive-include requirements *.txt\n')
+    assert cache.get(str(path)).lines == ['include README.rst', 'recursive-include requirements *.txt']
+
+
+def test_missing_file(tmpdir):
+    """None should be returned for a file which doesn't exist"""
+    path = tmpdir.join('setup.cfg')
+    cache = FileCache()
+    assert cache.get(str(path)) is None
+    path.write('[metadata]\n')
+    assert cache.get(str(path)) is not None
+    path.remove()
+    assert cache.get(str(path)) is None
+
+
+def test_lru_eviction(tmpdir):
+    """The least recently used entry should be evicted when the cache is full"""
+    paths = []
+    for name in ('a.txt', 'b.txt', 'c.txt'):
+        path = tmpdir.join(name)
+        path.write(name)
+        paths.append(str(path))
+    cache = FileCache(maxsize=2)
+    a = cache.get(paths[0])
+    cache.get(paths[1])
+    assert cache.get(paths[0]) is a
+    cache.get(paths[2])
+    assert cache.get(paths[0]) is a
+    assert cache.bytes_read == 15
+    cache.get(paths[1])
+    assert cache.bytes_read == 20
+
+
+def test_decoding(tmpdir):
+    """Content should be decoded as UTF-8 and parsed on demand"""
+    path = tmpdir.join('tox.ini')
+    path.write_binary(b'# caf\xc3\xa9\n[pytest]\naddopts = --cov x\n')
+    cached = FileCache().get(str(path))
+    assert cached.text.startswith('# caf\xe9')
+    assert cached.lines[1] == '[pytest]'
+    assert cached.config.get('pytest', 'addopts') == '--cov x'
@@ -0,0 +1,82 @@
+# encoding: utf-8
+"""
+Tests of the audit_fleet script for auditing many repositories at once.
+Like test_upload_requirements, this is not packaged for use in other
+repositories.
+"""
+
+from __future__ import unicode_literals
+
+import io
+
+import pytest
+
+from audit_python_package.command_line import audit_fleet
+from audit_python_package.fleet import audit_repositories, audit_repository
+from audit_python_package.report import CheckResult, check_name, format_report, read_results
+
+
+@pytest.fixture
+def repositories(tmpdir):
+    """A pair of minimal repositories, only one of which has a tox.ini"""
+    good = tmpdir.mkdir('good')
+    good.join('tox.ini').write('[tox]\nenvlist = py35\n')
+    bad = tmpdir.mkdir('bad')
+    return [str(good), str(bad)]
+
+
+def test_check_name():
+    """check_name() should strip the directory from a pytest node ID"""
+    assert check_name('tests/test_tox.py::TestTox::test_python_35') == 'test_tox.py::TestTox::test_python_35'
+    assert check_name('test_readme.py') == 'test_readme.py'
+
+
+def test_audit_repository(repositories):
+    """audit_repository() should report the outcome of each selected check"""
+    results = audit_repository(repositories[0], 'test_tox_ini_exists or test_python_35')
+    outcomes = {result.check: result.outcome for result in results}
+    assert outcomes == {
+        'test_tox.py::TestTox::test_tox_ini_exists': 'passed',
+        'test_tox.py::TestTox::test_python_35': 'passed',
+    }
+
+
+def test_audit_missing_repository(tmpdir):
+    """audit_repository() should report an error for a nonexistent directory"""
+    path = str(tmpdir.join('missing'))
+    assert audit_repository(path) == [CheckResult(path, '', 'error', 'Not a directory')]
+
+
+def test_audit_repositories(repositories):
+    """audit_repositories() should audit every repository in the worker pool"""
+    results = []
+    for repository_results in audit_repositories(repositories, 2, 'test_tox_ini_exists'):
+        results.extend(repository_results)
+    outcomes = {result.repository: result.outcome for result in results}
+    assert outcomes == {repositories[0]: 'passed', repositories[1]: 'failed'}
+
+
+def test_format_report():
+    """The merged report should list failures per repository and overall totals"""
+    results = [
+        CheckResult('good', 'test_tox.py::TestTox::test_tox_ini_exists', 'passed', ''),
+        CheckResult('bad', 'test_tox.py::TestTox::test_tox_ini_exists', 'failed', 'AssertionError'),
+    ]
+    stream = io.StringIO()
+    format_report(results, stream)
+    output = stream.getvalue()
+    assert 'OK good (1 passed)' in output
+    assert 'FAILED bad (1 failed)' in output
+    assert 'FAILED test_tox.py::TestTox::test_tox_ini_exists' in output
+    assert '2 repositories audited, 1 with failures: 1 passed, 1 failed' in output
+
+
+def test_audit_fleet(repositories, tmpdir, capsys):
+    """audit_fleet should print a merged report, save it as JSON if requested, and exit with an error on failure"""
+    json_path = str(tmpdir.join('results.json'))
+    with pytest.raises(SystemExit) as exc_info:
+        audit_fleet(repositories + ['-j', '2', '-k', 'test_tox_ini_exists', '--json', json_path])
+    assert exc_info.value.code == 1
+    out, err = capsys.readouterr()
+    assert out.index(repositories[0]) < out.index(repositories[1])
+    assert [result.outcome for result in read_results(json_path)] == ['passed', 'failed']
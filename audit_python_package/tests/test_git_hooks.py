@@ -5,25 +5,48 @@
 from __future__ import unicode_literals
 
 import os
-import re
 
-import pytest
-
-from audit_python_package import DATA_DIRECTORY_PATH, get_file_content
-
-
-@pytest.fixture(scope='module')
+from audit_python_package import DATA_DIRECTORY_PATH, fixture, get_file_content, is_executable, RuleSet
+
+
+#: What the checks look for in git-hooks/post-merge, all found in one pass
+POST_MERGE_RULES = RuleSet(
+    literals=[
+        'print_function',
+        'unicode_literals',
+        'universal_newlines=True',
+        'print ',
+        'delete_pyc_files(changed_files)',
+        'digest = requirements_digest(paths)',
+        'if env_stamps.get(command) == digest:',
+        "os.system('requirements/clean_up_requirements.py')",
+    ],
+    patterns={
+        'install base': r'pip [^"\']*install [^"\']*--requirement requirements/base.txt',
+        'install tests': r'pip [^"\']*install [^"\']*--requirement requirements/tests.txt',
+        'install tox': r'pip [^"\']*install [^"\']*--requirement requirements/tox.txt',
+        'install package': r'pip [^"\']*install [^"\']*--editable ./',
+    })
+
+
+@fixture(scope='module')
 def install_hooks():
     """Fixture for the text content of git-hooks/install-hooks"""
     return get_file_content(os.path.join('git-hooks', 'install-hooks'))
 
 
-@pytest.fixture(scope='module')
+@fixture(scope='module')
 def post_merge():
     """Fixture for the text content of git-hooks/post-merge"""
     return get_file_content(os.path.join('git-hooks', 'post-merge'))
 
 
+@fixture(scope='module')
+def post_merge_rules(post_merge):
+    """Fixture for the names of the POST_MERGE_RULES found in git-hooks/post-merge"""
+    return POST_MERGE_RULES.scan(post_merge)
+
+
 class TestGitHooks(object):
     """Tests for git hooks to update the local virtualenv after each git
     pull/checkout/merge.  This may become obsolete after transitioning to
@@ -32,7 +55,7 @@ class TestGitHooks(object):
 
     def test_install_hooks_exists(self):
         """There should be an executable git-hooks/install-hooks script"""
-        assert os.access(os.path.join('git-hooks', 'install-hooks'), os.X_OK)
+        assert is_executable(os.path.join('git-hooks', 'install-hooks'))
 
     def test_install_hooks_content(self, install_hooks):
         """git-hooks/install-hooks should be a Python 2/3-compatible script for installing the post-merge script"""
@@ -42,39 +65,44 @@ class TestGitHooks(object):
 
     def test_post_merge_exists(self):
         """There should be an executable git-hooks/post-merge script"""
-        assert os.access(os.path.join('git-hooks', 'post-merge'), os.X_OK)
+        assert is_executable(os.path.join('git-hooks', 'post-merge'))
 
     def test_post_merge_uses_python(self, post_merge):
         """git-hooks/post-merge should be a directly executable Python script"""
         assert post_merge.startswith('#!/usr/bin/env python')
 
-    def test_post_merge_python_3_compatible(self, post_merge):
+    def test_post_merge_python_3_compatible(self, post_merge_rules):
         """git-hooks/post-merge should work with either Python 2 or 3"""
-        assert 'print_function' in post_merge
-        assert 'unicode_literals' in post_merge
-        assert 'universal_newlines=True' in post_merge
-        assert 'print ' not in post_merge
+        assert 'print_function' in post_merge_rules
+        assert 'unicode_literals' in post_merge_rules
+        assert 'universal_newlines=True' in post_merge_rules
+        assert 'print ' not in post_merge_rules
+
+    def test_post_merge_deletes_pyc_files(self, post_merge_rules):
+        """git-hooks/post-merge should delete any *.pyc files in the directories changed by the merge"""
+        assert 'delete_pyc_files(changed_files)' in post_merge_rules
 
-    def test_post_merge_deletes_pyc_files(self, post_merge):
-        """git-hooks/post-merge should delete any *.pyc files under the root directory"""
-        assert 'os.system("find . -name \'*pyc\' -delete")' in post_merge
+    def test_post_merge_skips_unchanged_requirements(self, post_merge_rules):
+        """git-hooks/post-merge should only install requirements which changed since they were last installed"""
+        assert 'digest = requirements_digest(paths)' in post_merge_rules
+        assert 'if env_stamps.get(command) == digest:' in post_merge_rules
 
-    def test_post_merge_clean_up_requirements(self, post_merge):
+    def test_post_merge_clean_up_requirements(self, post_merge_rules):
         """git-hooks/post-merge should run requirements/clean_up_requirements.py"""
-        assert "os.system('requirements/clean_up_requirements.py')" in post_merge
+        assert "os.system('requirements/clean_up_requirements.py')" in post_merge_rules
 
-    def test_post_merge_base_dependencies(self, post_merge):
+    def test_post_merge_base_dependencies(self, post_merge_rules):
         """git-hooks/post-merge should install the package's core dependencies"""
-        assert re.search(r'pip [^"\']*install [^"\']*--requirement requirements/base.txt', post_merge)
+        assert 'install base' in post_merge_rules
 
-    def test_post_merge_test_dependencies(self, post_merge):
+    def test_post_merge_test_dependencies(self, post_merge_rules):
         """git-hooks/post-merge should install the additional dependencies needed to run tests"""
-        assert re.search(r'pip [^"\']*install [^"\']*--requirement requirements/tests.txt', post_merge)
+        assert 'install tests' in post_merge_rules
 
-    def test_post_merge_tox_dependencies(self, post_merge):
+    def test_post_merge_tox_dependencies(self, post_merge_rules):
         """git-hooks/post-merge should install the additional dependencies needed to run tox"""
-        assert re.search(r'pip [^"\']*install [^"\']*--requirement requirements/tox.txt', post_merge)
+        assert 'install tox' in post_merge_rules
 
-    def test_post_merge_installs_package(self, post_merge):
+    def test_post_merge_installs_package(self, post_merge_rules):
         """git-hooks/post-merge should install the package contained in the git repository"""
-        assert re.search(r'pip [^"\']*install [^"\']*--editable ./', post_merge)
+        assert 'install package' in post_merge_rules
@@ -6,14 +6,12 @@ from __future__ import unicode_literals
 
 import os
 
-import pytest
-
-from audit_python_package import DATA_DIRECTORY_PATH, get_file_lines
+from audit_python_package import DATA_DIRECTORY_PATH, file_exists, fixture, get_file_lines
 
 TEMPLATE_PATH = os.path.join(DATA_DIRECTORY_PATH, '.gitignore')
 
 
-@pytest.fixture(scope='module')
+@fixture(scope='module')
 def gitignore():
     """Fixture for the lines in the .gitignore file"""
     return get_file_lines('.gitignore')
@@ -24,11 +22,9 @@ class TestGitignore(object):
 
     def test_exists(self):
         """There should be a .gitignore file in the root directory"""
-        assert os.path.exists('.gitignore')
+        assert file_exists('.gitignore')
 
     def test_content(self, gitignore):
         """All of the usual entries should be present in .gitignore"""
-        with open(TEMPLATE_PATH, 'rU') as f:
-            lines = [line.strip() for line in f.readlines()]
-        for line in lines:
+        for line in get_file_lines(TEMPLATE_PATH):
             assert line in gitignore
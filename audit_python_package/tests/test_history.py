@@ -0,0 +1,113 @@
+# encoding: utf-8
+"""
+Tests of auditing a range of git history.  Not packaged for use in other
+repositories.
+"""
+
+from __future__ import unicode_literals
+
+import subprocess
+
+import pytest
+
+from audit_python_package.command_line import audit_history
+from audit_python_package.history import HistoryAudit, list_commits
+
+KEYWORD = 'test_tox_ini_exists or test_pypy_does_not_exist'
+
+
+def commit(repository, message):
+    """Commit all changes in the given repository"""
+    for args in (['add', '-A', '.'], ['commit', '-q', '-m', message]):
+        subprocess.check_call(['git', '-c', 'user.name=Audit', '-c', 'user.email=audit@example.com'] + args,
+                              cwd=str(repository), stdout=subprocess.PIPE)
+
+
+@pytest.fixture
+def repository(tmpdir):
+    """A git repository in which requirements/pypy.txt is added by the third
+    of five commits"""
+    subprocess.check_call(['git', 'init', '-q'], cwd=str(tmpdir))
+    tmpdir.join('tox.ini').write('[tox]\nenvlist = py35\n')
+    tmpdir.mkdir('requirements').join('base.txt').write('six==1.10.0\n')
+    commit(tmpdir, 'Initial commit')
+    tmpdir.join('notes.txt').write('Not audited\n')
+    commit(tmpdir, 'Add notes')
+    tmpdir.join('requirements', 'pypy.txt').write('-r base.txt\n')
+    commit(tmpdir, 'Add PyPy requirements')
+    tmpdir.join('notes.txt').write('Still not audited\n')
+    commit(tmpdir, 'Update notes')
+    tmpdir.join('tox.ini').write('[tox]\nenvlist = py35,pypy\n')
+    commit(tmpdir, 'Test on PyPy')
+    return tmpdir
+
+
+def test_list_commits(repository):
+    """Commits should be listed oldest first"""
+    commits = list_commits('HEAD', str(repository))
+    assert [c.subject for c in commits] == [
+        'Initial commit', 'Add notes', 'Add PyPy requirements', 'Update notes', 'Test on PyPy']
+    assert [c.subject for c in list_commits('HEAD~2..HEAD', str(repository))] == ['Update notes', 'Test on PyPy']
+
+
+def test_scan(repository):
+    """Results should be reused for commits which didn't change any inputs"""
+    commits = list_commits('HEAD', str(repository))
+    with HistoryAudit(str(repository), KEYWORD, cache_directory=False) as audit:
+        outcomes = [[result.outcome for result in results] for _, results in audit.scan(commits)]
+    assert outcomes == [['passed', 'passed'], ['passed', 'passed'], ['failed', 'passed'], ['failed', 'passed'],
+                        ['failed', 'passed']]
+    assert audit.audited == 5
+    assert audit.reused == 2
+
+
+def test_saved_results(repository):
+    """Results saved in the cache directory should be reused by later runs"""
+    commits = list_commits('HEAD', str(repository))
+    cache_directory = str(repository.join('.audit_cache'))
+    with HistoryAudit(str(repository), KEYWORD, cache_directory) as audit:
+        list(audit.scan(commits))
+    with HistoryAudit(str(repository), KEYWORD, cache_directory) as audit:
+        list(audit.scan(commits))
+    assert audit.reused == 5
+
+
+def test_referenced_files(tmpdir):
+    """Changes to requirements files included from outside the requirements directory shouldn't reuse results"""
+    subprocess.check_call(['git', 'init', '-q'], cwd=str(tmpdir))
+    tmpdir.join('shared.txt').write('six==1.9.0\n')
+    tmpdir.mkdir('requirements').join('base.txt').write('-r ../shared.txt\n')
+    commit(tmpdir, 'Initial commit')
+    tmpdir.join('shared.txt').write('six==1.10.0\n')
+    commit(tmpdir, 'Upgrade six')
+    commits = list_commits('HEAD', str(tmpdir))
+    with HistoryAudit(str(tmpdir), 'test_other_base_requirement_versions', cache_directory=False) as audit:
+        outcomes = [[result.outcome for result in results] for _, results in audit.scan(commits)]
+    assert outcomes == [['failed'], ['passed']]
+    assert audit.reused == 0
+
+
+def test_bisect(repository):
+    """Bisection should find the first commit at which a check fails"""
+    commits = list_commits('HEAD', str(repository))
+    with HistoryAudit(str(repository), 'test_pypy_does_not_exist', cache_directory=False) as audit:
+        first, failures = audit.bisect(commits)
+    assert first.subject == 'Add PyPy requirements'
+    assert [result.check for result in failures] == ['test_requirements.py::test_pypy_does_not_exist']
+    with HistoryAudit(str(repository), 'test_tox_ini_exists', cache_directory=False) as audit:
+        assert audit.bisect(commits) == (None, [])
+
+
+def test_audit_history(repository, capsys):
+    """audit_history should print the commits at which checks start or stop failing"""
+    audit_history(['HEAD', '-C', str(repository), '-k', KEYWORD, '--no-cache'])
+    out, err = capsys.readouterr()
+    lines = out.splitlines()
+    assert lines[0].endswith(' Initial commit')
+    assert lines[1] == '    2 passed'
+    assert lines[2].endswith(' Add PyPy requirements')
+    assert lines[3].startswith('    FAILED test_requirements.py::test_pypy_does_not_exist: AssertionError')
+    assert lines[4] == '5 commits audited, 2 of them using only earlier results'
+    audit_history(['HEAD', '-C', str(repository), '-k', 'pypy', '--bisect', '--no-cache'])
+    out, err = capsys.readouterr()
+    assert out.splitlines()[1].endswith(' Add PyPy requirements')
@@ -0,0 +1,122 @@
+# encoding: utf-8
+"""
+Tests of incremental audits.  Not packaged for use in other repositories.
+"""
+
+from __future__ import unicode_literals
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import audit_python_package
+from audit_python_package import incremental
+from audit_python_package.incremental import Fingerprinter, ResultStore, input_paths, referenced_paths
+
+PACKAGE_PARENT = os.path.dirname(os.path.dirname(os.path.abspath(audit_python_package.__file__)))
+
+
+@pytest.fixture
+def repository(tmpdir):
+    """A minimal repository with a tox.ini and a couple of requirements files"""
+    tmpdir.join('tox.ini').write('[tox]\nenvlist = py35\n')
+    requirements = tmpdir.mkdir('requirements')
+    requirements.join('base.txt').write('six==1.10.0\n')
+    requirements.join('tests.txt').write('-r base.txt\npytest==2.9.1\n')
+    return tmpdir
+
+
+def run_audit(repository, *args):
+    """Run the audit in a separate process and return its output"""
+    env = dict(os.environ, PYTHONPATH=PACKAGE_PARENT)
+    command = [sys.executable, '-m', 'pytest', '--pyargs', 'audit_python_package', '-c', os.devnull,
+               '-p', 'no:cacheprovider', '-p', 'audit_python_package.pytest_plugin', '--incremental']
+    command.extend(args)
+    process = subprocess.Popen(command, cwd=str(repository), env=env, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, universal_newlines=True)
+    return process.communicate()[0]
+
+
+def test_input_paths(repository):
+    """input_paths() should list the existing files matching a module's input patterns"""
+    root = str(repository)
+    assert input_paths('test_requirements.py', root) == ['requirements/base.txt', 'requirements/tests.txt']
+    assert input_paths('test_setup_cfg.py', root) == []
+    assert input_paths('test_something_new.py', root) is None
+
+
+def test_fingerprint_changes(repository):
+    """A module's fingerprint should change only when one of its inputs does"""
+    root = str(repository)
+    before = Fingerprinter(root)
+    requirements = before.fingerprint('test_requirements.py')
+    tox = before.fingerprint('test_tox.py')
+    repository.join('requirements', 'tests.txt').write('-r base.txt\npytest==2.9.2\n')
+    fingerprinter = Fingerprinter(root)
+    modified = fingerprinter.fingerprint('test_requirements.py')
+    assert modified != requirements
+    assert fingerprinter.fingerprint('test_tox.py') == tox
+    repository.join('requirements', 'pypy.txt').write('\n')
+    assert fingerprinter.fingerprint('test_requirements.py') != modified
+    assert fingerprinter.fingerprint('test_something_new.py') is None
+    # The ordering checks depend on which version checks were deselected
+    deselected = Fingerprinter(root, 'not test_sphinx_version')
+    assert deselected.fingerprint('test_requirements.py') != fingerprinter.fingerprint('test_requirements.py')
+    assert deselected.fingerprint('test_tox.py') == tox
+
+
+def test_fingerprint_referenced_files(tmpdir):
+    """Requirements files included from outside the input patterns should be part of the fingerprint"""
+    shared = tmpdir.mkdir('common').join('doc.txt')
+    shared.write('Sphinx==1.4.1\n')
+    repository = tmpdir.mkdir('package')
+    repository.mkdir('requirements').join('documentation.txt').write('-r ../../common/doc.txt\n')
+    root = str(repository)
+    assert referenced_paths('test_requirements.py', root) == ['../common/doc.txt']
+    assert referenced_paths('test_tox.py', root) == []
+    before = Fingerprinter(root).fingerprint('test_requirements.py')
+    shared.write('Sphinx==1.4.1\nalabaster==0.7.8\n')
+    assert Fingerprinter(root).fingerprint('test_requirements.py') != before
+
+
+def test_fingerprint_package_code(repository, tmpdir, monkeypatch):
+    """Every fingerprint should change when the audit package's own code does"""
+    package = tmpdir.mkdir('package')
+    package.join('policy.py').write('RULES = 1\n')
+    monkeypatch.setattr(incremental, 'PACKAGE_DIRECTORY_PATH', str(package))
+    before = Fingerprinter(str(repository)).fingerprint('test_tox.py')
+    package.join('policy.py').write('RULES = 2\n')
+    assert Fingerprinter(str(repository)).fingerprint('test_tox.py') != before
+
+
+def test_result_store(tmpdir):
+    """Only passing results should be remembered between runs"""
+    directory = str(tmpdir.join('.audit_cache'))
+    store = ResultStore(directory)
+    store.record('test_tox.py::TestTox::test_tox_ini_exists', 'abc', True)
+    store.record('test_tox.py::TestTox::test_python_35', 'abc', False)
+    store.record('test_fleet.py::test_check_name', None, True)
+    store.save()
+    assert tmpdir.join('.audit_cache', '.gitignore').read() == '*\n'
+    store = ResultStore(directory)
+    assert store.is_unchanged('test_tox.py::TestTox::test_tox_ini_exists', 'abc')
+    assert not store.is_unchanged('test_tox.py::TestTox::test_tox_ini_exists', 'def')
+    assert not store.is_unchanged('test_tox.py::TestTox::test_python_35', 'abc')
+    assert not store.is_unchanged('test_fleet.py::test_check_name', None)
+
+
+def test_incremental_run(repository):
+    """Checks should only be re-run when their inputs change"""
+    keyword = 'test_tox_ini_exists or test_python_35 or test_cpython2_does_not_exist or test_pypy_does_not_exist'
+    output = run_audit(repository, '-k', keyword)
+    assert '4 passed' in output
+    output = run_audit(repository, '-k', keyword)
+    assert '4 checks skipped: unchanged since they last passed' in output
+    repository.join('requirements', 'pypy.txt').write('\n')
+    output = run_audit(repository, '-k', keyword)
+    assert '1 passed, 1 failed' in output or '1 failed, 1 passed' in output
+    output = run_audit(repository, '-k', keyword)
+    assert '1 failed' in output
+    assert '3 checks skipped' in output
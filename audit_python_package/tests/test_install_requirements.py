@@ -0,0 +1,76 @@
+# encoding: utf-8
+"""
+Tests of the install_requirements script, which skips installing requirements
+files that haven't changed.  Not packaged for use in other repositories.
+"""
+
+from __future__ import unicode_literals
+
+import json
+import os
+
+import pytest
+
+from audit_python_package import command_line
+from audit_python_package.command_line import audit_package, install_requirements
+
+
+@pytest.fixture
+def repository(tmpdir):
+    """A repository with a couple of requirements files"""
+    requirements = tmpdir.mkdir('requirements')
+    requirements.join('base.txt').write('six==1.10.0\n')
+    requirements.join('tests.txt').write('-r base.txt\npytest==2.9.1\n')
+    return tmpdir
+
+
+@pytest.fixture
+def pip_calls(monkeypatch):
+    """The pip commands run, which all succeed without doing anything"""
+    calls = []
+
+    def call(command):
+        calls.append(command[command.index('--requirement') + 1:])
+        return 0
+    monkeypatch.setattr(command_line, 'call', call)
+    return calls
+
+
+def test_skip_unchanged(repository, pip_calls, capsys):
+    """Requirements files should only be installed if they or their includes changed"""
+    stamp = str(repository.join('stamp.json'))
+    with repository.as_cwd():
+        paths = [os.path.join('requirements', 'base.txt'), os.path.join('requirements', 'tests.txt')]
+        install_requirements(paths + ['--quiet', '--stamp', stamp])
+        assert pip_calls == [[paths[0], '--quiet'], [paths[1], '--quiet']]
+        install_requirements(paths + ['--stamp', stamp])
+        assert len(pip_calls) == 2
+        out, err = capsys.readouterr()
+        assert out.splitlines() == ['{} is unchanged since it was installed'.format(path) for path in paths]
+        repository.join('requirements', 'base.txt').write('six==1.9.0\n')
+        install_requirements([paths[1], '--stamp', stamp])
+        assert pip_calls[2:] == [[paths[1]]]
+    with open(stamp) as f:
+        assert sorted(json.load(f)) == sorted(str(repository.join(path)) for path in paths)
+
+
+def test_failed_install(repository, monkeypatch):
+    """A failed installation should stop the script and be retried next time"""
+    monkeypatch.setattr(command_line, 'call', lambda command: 1)
+    stamp = str(repository.join('stamp.json'))
+    with repository.as_cwd():
+        with pytest.raises(SystemExit) as exc_info:
+            install_requirements(['requirements/base.txt', '--stamp', stamp])
+    assert exc_info.value.code == 1
+    with open(stamp) as f:
+        assert json.load(f) == {}
+
+
+def test_tox_checks_accept_install_requirements(repository, capsys):
+    """The tox checks should accept install_requirements in place of pip install"""
+    repository.join('tox.ini').write('[testenv]\ncommands =\n'
+                                     '    pip install --requirement requirements/base.txt\n'
+                                     '    install_requirements requirements/tests.txt --quiet\n')
+    audit_package([str(repository), '-k', 'test_testenv_installs'])
+    out, err = capsys.readouterr()
+    assert out == '2 passed\n'
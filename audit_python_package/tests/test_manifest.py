@@ -4,14 +4,10 @@
 
 from __future__ import unicode_literals
 
-import os
+from audit_python_package import file_exists, fixture, get_file_lines
 
-import pytest
 
-from audit_python_package import get_file_lines
-
-
-@pytest.fixture(scope='module')
+@fixture(scope='module')
 def manifest():
     """Fixture that provides a list of the entries in MANIFEST.in"""
     return get_file_lines('MANIFEST.in')
@@ -26,7 +22,7 @@ class TestManifest(object):
 
     def test_exists(self):
         """There should be a MANIFEST.in file in the project's root directory"""
-        assert os.path.exists('MANIFEST.in')
+        assert file_exists('MANIFEST.in')
 
     def test_readme(self, manifest):
         """There should be an entry for README.rst in MANIFEST.in"""
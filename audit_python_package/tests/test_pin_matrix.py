@@ -0,0 +1,140 @@
+# encoding: utf-8
+"""
+Tests of the matrix of requirements saved by ``audit_fleet --pin-matrix``
+and queried by ``audit_pins``.  Not packaged for use in other repositories.
+"""
+
+from __future__ import unicode_literals
+
+import subprocess
+
+import pytest
+
+from audit_python_package.command_line import audit_fleet, audit_pins
+from audit_python_package.pin_matrix import PinMatrix, read_pins
+from audit_python_package.policy import VersionPolicy
+from audit_python_package.sources import GitTreeSource
+from audit_python_package.versions import LazyVersions
+
+
+PINS = {
+    'alpha': [('requirements/base.txt', 'Sphinx', '==1.3.1'), ('requirements/tests.txt', 'cov-core', '==1.15.0')],
+    'beta': [('requirements/base.txt', 'sphinx', '==1.4.1'), ('requirements/base.txt', 'six', '')],
+    'gamma': [('requirements/documentation.txt', 'Sphinx', '==1.2b3')],
+}
+
+
+def git(repository, *args):
+    """Run a git command in the given repository"""
+    command = ['git', '-c', 'user.name=Audit', '-c', 'user.email=audit@example.com'] + list(args)
+    subprocess.check_call(command, cwd=str(repository), stdout=subprocess.PIPE)
+
+
+@pytest.fixture
+def matrix():
+    """A matrix of the requirements of three repositories"""
+    return PinMatrix.build(PINS)
+
+
+@pytest.fixture
+def repository(tmpdir):
+    """A repository with a couple of requirements files, one including the other"""
+    requirements = tmpdir.mkdir('requirements')
+    requirements.join('base.txt').write('-e .\nsix==1.10.0\nJinja2>=2.8\ngit+https://github.com/example/example.git\n')
+    requirements.join('tests.txt').write('-r base.txt\npytest==2.9.1  # comment\n')
+    requirements.join('uninstall.txt').write('cov-core\n')
+    return tmpdir
+
+
+def test_read_pins(repository):
+    """Each named requirement should be listed once, under the file containing it"""
+    assert read_pins(str(repository)) == [
+        ('requirements/base.txt', 'six', '==1.10.0'),
+        ('requirements/base.txt', 'Jinja2', '>=2.8'),
+        ('requirements/tests.txt', 'pytest', '==2.9.1'),
+    ]
+
+
+def test_read_pins_revision(repository):
+    """Requirements should be read from the given file source"""
+    git(repository, 'init', '-q')
+    git(repository, 'add', '.')
+    git(repository, 'commit', '-q', '-m', 'Initial commit')
+    repository.join('requirements', 'base.txt').write('six==1.9.0\n')
+    repository.join('requirements', 'analyze.txt').write('pylint==1.5.5\n')
+    with GitTreeSource('HEAD', str(repository)) as source:
+        pins = read_pins(str(repository), source)
+    assert [pin[1:] for pin in pins] == [('six', '==1.10.0'), ('Jinja2', '>=2.8'), ('pytest', '==2.9.1')]
+
+
+def test_queries(matrix):
+    """Package names should be normalized, and each package's entries found without a scan"""
+    assert len(matrix) == 5
+    assert matrix.packages == ['cov-core', 'six', 'sphinx']
+    assert matrix.pins('SPHINX') == [
+        ('alpha', 'requirements/base.txt', 'Sphinx', '==1.3.1'),
+        ('beta', 'requirements/base.txt', 'Sphinx', '==1.4.1'),
+        ('gamma', 'requirements/documentation.txt', 'Sphinx', '==1.2b3'),
+    ]
+    assert matrix.repositories_with('cov_core') == ['alpha']
+    assert matrix.repositories_with('pytest') == []
+    assert matrix.below('Sphinx', '1.4') == [
+        ('alpha', 'requirements/base.txt', 'Sphinx', '==1.3.1'),
+        ('gamma', 'requirements/documentation.txt', 'Sphinx', '==1.2b3'),
+    ]
+
+
+def test_drift(matrix):
+    """Only pins to versions which don't match the policy should be listed"""
+    policy = VersionPolicy(LazyVersions(lambda: {'Sphinx': '>=1.3,<1.4', 'six': '1.10.0'}))
+    assert matrix.drift(policy) == [
+        ('beta', 'requirements/base.txt', 'Sphinx', '==1.4.1'),
+        ('gamma', 'requirements/documentation.txt', 'Sphinx', '==1.2b3'),
+    ]
+    assert matrix.drift(policy, 'cov-core') == []
+
+
+def test_save_and_load(matrix, tmpdir):
+    """A saved matrix should load with the same content, and replace any previously saved one"""
+    path = str(tmpdir.join('pins.db'))
+    PinMatrix.build({'old': [('requirements/base.txt', 'nose', '==1.3.7')]}).save(path)
+    matrix.save(path)
+    loaded = PinMatrix.load(path)
+    assert loaded.pins() == matrix.pins()
+    assert loaded.repositories == ['alpha', 'beta', 'gamma']
+    assert loaded.below('sphinx', '1.3') == matrix.below('sphinx', '1.3')
+
+
+def test_load_errors(tmpdir):
+    """A missing or unrecognized file should be reported as such"""
+    with pytest.raises(ValueError) as exc_info:
+        PinMatrix.load(str(tmpdir.join('missing.db')))
+    assert 'No pin matrix' in str(exc_info.value)
+    path = tmpdir.join('results.json')
+    path.write('[]')
+    with pytest.raises(ValueError) as exc_info:
+        PinMatrix.load(str(path))
+    assert 'is not a pin matrix' in str(exc_info.value)
+
+
+def test_audit_fleet_pin_matrix(repository, tmpdir, capsys):
+    """audit_fleet --pin-matrix should save a matrix which audit_pins can query"""
+    path = str(tmpdir.join('pins.db'))
+    audit_fleet([str(repository), '-j', '1', '-k', 'test_no_include_cycles', '--pin-matrix', path])
+    capsys.readouterr()
+    audit_pins([path])
+    audit_pins([path, 'PyTest'])
+    audit_pins([path, 'six', '--below', '2.0'])
+    out, err = capsys.readouterr()
+    assert out.splitlines() == [
+        '3 requirements of 3 packages in 1 repositories',
+        '{} requirements/tests.txt pytest==2.9.1'.format(repository),
+        '{} requirements/base.txt six==1.10.0'.format(repository),
+    ]
+    with pytest.raises(SystemExit) as exc_info:
+        audit_pins([str(tmpdir.join('missing.db'))])
+    assert exc_info.value.code == 2
+    with pytest.raises(SystemExit) as exc_info:
+        audit_pins([path, 'six', '--below', 'not a version'])
+    assert exc_info.value.code == 2
+    assert 'Invalid version for --below' in capsys.readouterr()[1]
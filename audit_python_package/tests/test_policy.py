@@ -0,0 +1,75 @@
+# encoding: utf-8
+"""
+Tests of evaluating pinned requirements against the preferred versions
+policy.  Not packaged for use in other repositories.
+"""
+
+from __future__ import unicode_literals
+
+import pytest
+
+from audit_python_package.policy import VersionPolicy
+from audit_python_package.requirements import RequirementsIndex, parse_requirement
+from audit_python_package.versions import LazyVersions
+
+
+@pytest.fixture
+def policy():
+    """A policy with both exact versions and a version range"""
+    return VersionPolicy(LazyVersions(lambda: {'Jinja2': '2.8', 'Sphinx': '>=1.3,<1.4', 'sphinx_rtd_theme': '0.1.9'}))
+
+
+def index(*lines):
+    """A RequirementsIndex of the given requirement lines"""
+    return RequirementsIndex(parse_requirement(line) for line in lines)
+
+
+def test_allows(policy):
+    """Versions should be compared by PEP 440 rules, and names after normalization"""
+    assert policy.specifier('jinja2') == '==2.8'
+    assert policy.specifier('Sphinx-RTD-Theme') == '==0.1.9'
+    assert policy.specifier('pytest') is None
+    assert policy.allows('jinja2', '2.8.0')
+    assert not policy.allows('Jinja2', '2.7.3')
+    assert policy.allows('Sphinx', '1.3.6')
+    assert not policy.allows('Sphinx', '1.4.1')
+    assert policy.allows('pytest', '2.9.1')
+
+
+def test_compiled_once(policy, monkeypatch):
+    """Each policy entry should only be compiled once, and each version only matched once"""
+    matched = []
+    match = policy._match
+
+    def counting_match(specifier, version):
+        matched.append((specifier, version))
+        return match(specifier, version)
+    monkeypatch.setattr(policy, '_match', counting_match)
+    for _ in range(3):
+        assert policy.allows('Sphinx', '1.3.6')
+        assert policy.allows('sphinx', '1.3.6')
+    assert matched == [('>=1.3,<1.4', '1.3.6')]
+    assert list(policy._compiled) == ['>=1.3,<1.4']
+
+
+def test_evaluate(policy):
+    """A whole requirements file should be evaluated at once, and the result reused"""
+    requirements = index('jinja2==2.8', 'Sphinx==1.4.1', 'pytest==2.9.1', 'sphinx-rtd-theme==0.1.9')
+    evaluated = policy.evaluate(requirements)
+    assert {key: allowed for key, (requirement, allowed) in evaluated.items()} == {
+        'jinja2': True, 'sphinx': False, 'pytest': True, 'sphinx-rtd-theme': True}
+    assert policy.evaluate(requirements) is evaluated
+    assert policy.check(requirements, 'Jinja2') is None
+    assert policy.check(requirements, 'Sphinx') == 'Sphinx==1.4.1 does not match the preferred version Sphinx>=1.3,<1.4'
+    assert policy.check(requirements, 'MarkupSafe') == 'MarkupSafe is not pinned to a version'
+    assert policy.violations(requirements) == [
+        'Sphinx==1.4.1 does not match the preferred version Sphinx>=1.3,<1.4']
+    assert policy.violations(requirements, exclude=['sphinx']) == []
+
+
+def test_invalid_version(policy):
+    """A version which isn't valid under PEP 440 should only match an identical pin"""
+    invalid = VersionPolicy({'legacy': 'r1234', 'ranged': '>=1.0'})
+    assert invalid.allows('legacy', 'r1234')
+    assert not invalid.allows('legacy', 'r1235')
+    assert not invalid.allows('ranged', 'r1235')
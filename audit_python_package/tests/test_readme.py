@@ -4,7 +4,13 @@
 
 from __future__ import unicode_literals
 
-import os
+from audit_python_package import file_exists, fixture, validate_readme
+
+
+@fixture(scope='module')
+def readme_validation():
+    """Fixture containing the (valid, warnings) result of rendering README.rst as PyPI would"""
+    return validate_readme('README.rst')
 
 
 class TestReadme(object):
@@ -16,4 +22,9 @@ class TestReadme(object):
 
     def test_exists(self):
         """There should be a README.rst in the root directory"""
-        assert os.path.exists('README.rst')
+        assert file_exists('README.rst')
+
+    def test_renders_on_pypi(self, readme_validation):
+        """README.rst should be valid reStructuredText which renders on PyPI without warnings (as checked by "python setup.py check --restructuredtext --strict")"""
+        valid, warnings = readme_validation
+        assert valid, warnings
@@ -0,0 +1,99 @@
+# encoding: utf-8
+"""
+Tests of validating README.rst with results cached by content.  Not packaged
+for use in other repositories.
+"""
+
+from __future__ import unicode_literals
+
+import os
+
+import pytest
+
+from audit_python_package import readme, validate_readme
+from audit_python_package.readme import ReadmeCache
+
+README = 'Title\n=====\n\nSome text\n'.encode('utf-8')
+
+
+class Renderer(object):
+    """Stands in for readme_renderer, recording the text it was asked to render"""
+
+    def __init__(self):
+        self.rendered = []
+
+    def __call__(self, text):
+        self.rendered.append(text)
+        if '`broken' in text:
+            return False, '<string>:1: (WARNING/2) Inline interpreted text start-string without end-string.\n'
+        return True, ''
+
+
+@pytest.fixture
+def renderer():
+    """A fake README renderer"""
+    return Renderer()
+
+
+def test_cached_result(tmpdir, renderer):
+    """An unchanged README should only be rendered once"""
+    cache = ReadmeCache(str(tmpdir), version='1.0', renderer=renderer)
+    assert cache.validate(README) == (True, '')
+    assert ReadmeCache(str(tmpdir), version='1.0', renderer=renderer).validate(README) == (True, '')
+    assert renderer.rendered == [README.decode('utf-8')]
+    broken = b'`broken\n'
+    valid, warnings = cache.validate(broken)
+    assert not valid
+    assert 'WARNING' in warnings
+    assert cache.validate(broken) == (valid, warnings)
+    assert len(renderer.rendered) == 2
+
+
+def test_renderer_version(tmpdir, renderer):
+    """A different renderer version shouldn't reuse an old result"""
+    ReadmeCache(str(tmpdir), version='1.0', renderer=renderer).validate(README)
+    ReadmeCache(str(tmpdir), version='2.0', renderer=renderer).validate(README)
+    assert len(renderer.rendered) == 2
+
+
+def test_invalid_encoding(tmpdir, renderer):
+    """A README which isn't UTF-8 should be invalid, without trying to render it"""
+    valid, warnings = ReadmeCache(str(tmpdir), version='1.0', renderer=renderer).validate(b'Caf\xe9\n')
+    assert not valid
+    assert 'not valid UTF-8' in warnings
+    assert renderer.rendered == []
+
+
+def test_distribution_versions(monkeypatch):
+    """The renderer version should come from the installed distributions' metadata"""
+    assert readme._distribution_version('pytest') == pytest.__version__
+    versions = {'readme_renderer': '44.0', 'docutils': '0.21.2'}
+    monkeypatch.setattr(readme, '_distribution_version', versions.get)
+    assert readme.renderer_version() == 'readme_renderer 44.0 docutils 0.21.2'
+
+
+def test_unusable_cache(tmpdir, renderer):
+    """A corrupt result or unwritable cache directory should just mean rendering again"""
+    cache = ReadmeCache(str(tmpdir), version='1.0', renderer=renderer)
+    tmpdir.join('{}.json'.format(cache.key(README))).write('{"valid": tr')
+    assert cache.validate(README) == (True, '')
+    blocked = tmpdir.join('file')
+    blocked.write('')
+    cache = ReadmeCache(str(blocked.join('readme')), version='1.0', renderer=renderer)
+    assert cache.validate(README) == (True, '')
+    assert cache.validate(README) == (True, '')
+    assert len(renderer.rendered) == 3
+
+
+def test_validate_readme(tmpdir, renderer, monkeypatch):
+    """validate_readme() should use the cache directory from the environment"""
+    monkeypatch.setenv(readme.CACHE_DIRECTORY_VARIABLE, str(tmpdir.join('cache')))
+    monkeypatch.setattr(readme, 'render', renderer)
+    monkeypatch.setattr(readme, 'renderer_version', lambda: '1.0')
+    tmpdir.join('README.rst').write_binary(README)
+    path = str(tmpdir.join('README.rst'))
+    assert validate_readme(path) == (True, '')
+    assert validate_readme(path) == (True, '')
+    assert len(renderer.rendered) == 1
+    assert len(os.listdir(str(tmpdir.join('cache')))) == 1
+    assert validate_readme(str(tmpdir.join('missing.rst')))[0] is False
@@ -11,55 +11,98 @@ each file.
 
 from __future__ import unicode_literals
 
+from collections import namedtuple
 import os
 
-import pytest
+from audit_python_package import (
+    REQUIREMENTS_GRAPH,
+    VERSION_POLICY,
+    file_exists,
+    fixture,
+    get_dependency_order,
+    get_file_lines,
+    get_requirements_index,
+    list_directory
+)
+from audit_python_package.engine import Check, keyword_matcher
 
-from audit_python_package import VERSIONS, get_file_lines, get_requirement_lines
+#: The names a keyword expression is matched against
+_Keywords = namedtuple('_Keywords', ['keywords'])
 
 
-@pytest.fixture(scope='class')
+@fixture(scope='class')
 def base():
-    """Parsed lines from requirements/base.txt"""
-    return get_requirement_lines(os.path.join('requirements', 'base.txt'))
+    """Index of the parsed lines from requirements/base.txt"""
+    return get_requirements_index(os.path.join('requirements', 'base.txt'))
 
 
-@pytest.fixture(scope='class')
+@fixture(scope='class')
 def documentation():
-    """Parsed lines from requirements/documentation.txt"""
+    """Index of the parsed lines from requirements/documentation.txt"""
     path = os.path.join('requirements', 'documentation.txt')
-    if not os.path.exists(path):
+    if not file_exists(path):
         # Don't punish sbo-sphinx too much for having doc dependencies in base.txt
         path = os.path.join('requirements', 'base.txt')
-    return get_requirement_lines(path)
+    return get_requirements_index(path)
 
 
-@pytest.fixture(scope='class')
+@fixture(scope='class')
 def tests():
-    """Parsed lines from requirements/tests.txt"""
-    return get_requirement_lines(os.path.join('requirements', 'tests.txt'))
+    """Index of the parsed lines from requirements/tests.txt"""
+    return get_requirements_index(os.path.join('requirements', 'tests.txt'))
 
 
-@pytest.fixture(scope='class')
+@fixture(scope='class')
 def tox():
-    """Parsed lines from requirements/tox.txt"""
-    return get_requirement_lines(os.path.join('requirements', 'tox.txt'))
+    """Index of the parsed lines from requirements/tox.txt"""
+    return get_requirements_index(os.path.join('requirements', 'tox.txt'))
 
 
-@pytest.fixture(scope='class')
+@fixture(scope='class')
 def uninstall():
     """Parsed lines from requirements/uninstall.txt"""
     return get_file_lines(os.path.join('requirements', 'uninstall.txt'))
 
 
-def check_version(requirements, package_name, dependencies_set=None):
-    """Verify that the named package is pinned at the desired version and appears after its dependencies"""
-    requirement = '{}=={}'.format(package_name, VERSIONS[package_name])
-    assert requirement in requirements
-    if dependencies_set:
-        index = requirements.index(requirement)
-        for dependency in dependencies_set:
-            assert any([entry.startswith('{}=='.format(dependency)) for entry in requirements[:index]])
+@fixture(scope='module')
+def dependency_order():
+    """The package ordering constraints from data/dependency_order.txt"""
+    return get_dependency_order()
+
+
+def check_version(requirements, package_name):
+    """Verify that the named package is pinned at a version matching our preference"""
+    problem = VERSION_POLICY.check(requirements, package_name)
+    assert not problem, problem
+
+
+def deselected_version_checks(check_class, dependency_order, keyword):
+    """List the packages with ordering constraints whose version checks in the given class the keyword expression
+    deselects by name, so that an expression like "not test_sbo_sphinx_version" skips checking the package's order
+    along with its version: a package is left out if the ordering check wouldn't be selected if it also had the name
+    of the package's version check"""
+    if not keyword:
+        return []
+    matches = keyword_matcher(keyword)
+    ordering = Check('test_requirements.py', check_class, vars(check_class)['test_dependency_order'])
+    deselected = []
+    for key, name in sorted(dependency_order.names.items()):
+        slug = key.replace('-', '_')
+        for method_name in ('test_{}_version'.format(slug), 'test_{}'.format(slug)):
+            if method_name in vars(check_class):
+                if not matches(_Keywords(ordering.keywords + [method_name])):
+                    deselected.append(name)
+                break
+    return deselected
+
+
+def check_dependency_order(requirements, dependency_order, check_class, pytestconfig):
+    """Verify that every package appears after the packages it depends on, except for packages whose version checks
+    were deselected"""
+    exclude = deselected_version_checks(check_class, dependency_order, pytestconfig.getoption('keyword'))
+    violations = dependency_order.violations(requirements, exclude)
+    messages = ['{} should appear after {}'.format(name, ', '.join(missing)) for name, missing in violations]
+    assert not violations, '\n'.join(messages)
 
 
 class TestBaseRequirements(object):
@@ -71,7 +114,7 @@ class TestBaseRequirements(object):
 
     def test_exists(self):
         """There should be a requirements/base.txt file for core dependencies"""
-        assert os.path.exists(os.path.join('requirements', 'base.txt'))
+        assert file_exists(os.path.join('requirements', 'base.txt'))
 
     def test_setuptools_version(self, base):
         """setuptools should be pinned to our currently preferred version"""
@@ -83,12 +126,8 @@ class TestBaseRequirements(object):
 
     def test_other_base_requirement_versions(self, base):
         """All other dependencies declared in base.txt should match any versions we're explicitly trying to standardize on"""
-        for line in base:
-            package_name, version = (part.strip() for part in line.split('=='))
-            if package_name in {'pip', 'setuptools'}:
-                continue
-            if package_name in VERSIONS:
-                assert version == VERSIONS[package_name]
+        violations = VERSION_POLICY.violations(base, exclude=['pip', 'setuptools'])
+        assert not violations, '\n'.join(violations)
 
 
 class TestDocumentationRequirements(object):
@@ -100,19 +139,23 @@ class TestDocumentationRequirements(object):
 
     def test_exists(self):
         """There should be a requirements/documentation.txt file for doc building dependencies"""
-        assert os.path.exists(os.path.join('requirements', 'documentation.txt'))
+        assert file_exists(os.path.join('requirements', 'documentation.txt'))
+
+    def test_dependency_order(self, documentation, dependency_order, pytestconfig):
+        """Packages should appear after the packages they depend on (as listed in data/dependency_order.txt)"""
+        check_dependency_order(documentation, dependency_order, type(self), pytestconfig)
 
     def test_alabaster_version(self, documentation):
-        """alabaster should be pinned to our currently preferred version and appear after Sphinx"""
-        check_version(documentation, 'alabaster', {'Sphinx'})
+        """alabaster should be pinned to our currently preferred version"""
+        check_version(documentation, 'alabaster')
 
     def test_babel_version(self, documentation):
-        """Babel should be pinned to our currently preferred version and appear after pytz"""
-        check_version(documentation, 'Babel', {'pytz'})
+        """Babel should be pinned to our currently preferred version"""
+        check_version(documentation, 'Babel')
 
     def test_bleach_version(self, documentation):
-        """bleach should be pinned to our currently preferred version and appear after html5lib and six"""
-        check_version(documentation, 'bleach', {'html5lib', 'six'})
+        """bleach should be pinned to our currently preferred version"""
+        check_version(documentation, 'bleach')
 
     def test_commonmark_version(self, documentation):
         """CommonMark should be pinned to our currently preferred version"""
@@ -123,12 +166,12 @@ class TestDocumentationRequirements(object):
         check_version(documentation, 'docutils')
 
     def test_html5lib_version(self, documentation):
-        """html5lib should be pinned to our currently preferred version and appear after six"""
-        check_version(documentation, 'html5lib', {'six'})
+        """html5lib should be pinned to our currently preferred version"""
+        check_version(documentation, 'html5lib')
 
     def test_jinja2_version(self, documentation):
-        """Jinja2 should be pinned to our currently preferred version and appear after MarkupSafe"""
-        check_version(documentation, 'Jinja2', {'MarkupSafe'})
+        """Jinja2 should be pinned to our currently preferred version"""
+        check_version(documentation, 'Jinja2')
 
     def test_markupsafe_version(self, documentation):
         """MarkupSafe should be pinned to our currently preferred version"""
@@ -147,16 +190,16 @@ class TestDocumentationRequirements(object):
         check_version(documentation, 'pytz')
 
     def test_readme_renderer_version(self, documentation):
-        """readme_renderer should be pinned to our currently preferred version and appear after bleach, docutils, Pygments, and six"""
-        check_version(documentation, 'readme_renderer', {'bleach', 'docutils', 'Pygments', 'six'})
+        """readme_renderer should be pinned to our currently preferred version"""
+        check_version(documentation, 'readme_renderer')
 
     def test_recommonmark_version(self, documentation):
-        """recommonmark should be pinned to our currently preferred version and appear after CommonMark and docutils"""
-        check_version(documentation, 'recommonmark', {'docutils', 'CommonMark'})
+        """recommonmark should be pinned to our currently preferred version"""
+        check_version(documentation, 'recommonmark')
 
     def test_sbo_sphinx_version(self, documentation):
-        """sbo-sphinx should be pinned to our currently preferred version and appear after recommonmark and Sphinx"""
-        check_version(documentation, 'sbo-sphinx', {'recommonmark', 'Sphinx'})
+        """sbo-sphinx should be pinned to our currently preferred version"""
+        check_version(documentation, 'sbo-sphinx')
 
     def test_six_version(self, documentation):
         """six should be pinned to our currently preferred version"""
@@ -167,12 +210,12 @@ class TestDocumentationRequirements(object):
         check_version(documentation, 'snowballstemmer')
 
     def test_sphinx_rtd_theme(self, documentation):
-        """sphinx_rtd_theme should be pinned to our currently preferred version and appear after Sphinx"""
-        check_version(documentation, 'sphinx_rtd_theme', {'Sphinx'})
+        """sphinx_rtd_theme should be pinned to our currently preferred version"""
+        check_version(documentation, 'sphinx_rtd_theme')
 
     def test_sphinx_version(self, documentation):
-        """Sphinx should be pinned to our currently preferred version and appear after Babel, docutils, Jinja2, Pygments, six, and snowballstemmer"""
-        check_version(documentation, 'Sphinx', {'Babel', 'docutils', 'Jinja2', 'Pygments', 'six', 'snowballstemmer'})
+        """Sphinx should be pinned to our currently preferred version"""
+        check_version(documentation, 'Sphinx')
 
 
 class TestTestingRequirements(object):
@@ -183,7 +226,11 @@ class TestTestingRequirements(object):
 
     def test_exists(self):
         """There should be a requirements/tests.txt file for testing dependencies"""
-        assert os.path.exists(os.path.join('requirements', 'tests.txt'))
+        assert file_exists(os.path.join('requirements', 'tests.txt'))
+
+    def test_dependency_order(self, tests, dependency_order, pytestconfig):
+        """Packages should appear after the packages they depend on (as listed in data/dependency_order.txt)"""
+        check_dependency_order(tests, dependency_order, type(self), pytestconfig)
 
     def test_appnope_version(self, tests):
         """appnope should be pinned to our currently preferred version"""
@@ -198,12 +245,12 @@ class TestTestingRequirements(object):
         check_version(tests, 'gnureadline')
 
     def test_ipdb_version(self, tests):
-        """ipdb should be pinned to our currently preferred version and appear after ipython"""
-        check_version(tests, 'ipdb', {'ipython'})
+        """ipdb should be pinned to our currently preferred version"""
+        check_version(tests, 'ipdb')
 
     def test_ipython_version(self, tests):
-        """ipython should be pinned to our currently preferred version and appear after gnureadline"""
-        check_version(tests, 'ipython', {'appnope', 'gnureadline', 'pexpect', 'pickleshare', 'simplegeneric', 'traitlets'})
+        """ipython should be pinned to our currently preferred version"""
+        check_version(tests, 'ipython')
 
     def test_ipython_genutils_version(self, tests):
         """ipython-genutils should be pinned to our currently preferred version"""
@@ -218,40 +265,40 @@ class TestTestingRequirements(object):
         check_version(tests, 'pexpect')
 
     def test_pickleshare_version(self, tests):
-        """pickleshare should be pinned to our currently preferred version and appear after path.py"""
-        check_version(tests, 'pickleshare', {'path.py'})
+        """pickleshare should be pinned to our currently preferred version"""
+        check_version(tests, 'pickleshare')
 
     def test_py_version(self, tests):
         """py should be pinned to our currently preferred version"""
         check_version(tests, 'py')
 
     def test_pytest_version(self, tests):
-        """pytest should be pinned to our currently preferred version and appear after py"""
-        check_version(tests, 'pytest', {'py'})
+        """pytest should be pinned to our currently preferred version"""
+        check_version(tests, 'pytest')
 
     def test_coverage_version(self, tests):
         """coverage should be pinned to our currently preferred version"""
         check_version(tests, 'coverage')
 
     def test_cov_core_version(self, tests):
-        """cov-core should be pinned to our currently preferred version and appear after coverage"""
-        check_version(tests, 'cov-core', {'coverage'})
+        """cov-core should be pinned to our currently preferred version"""
+        check_version(tests, 'cov-core')
 
     def test_pytest_cov_version(self, tests):
-        """pytest-cov should be pinned to our currently preferred version and appear after cov-core and pytest"""
-        check_version(tests, 'pytest-cov', {'pytest', 'cov-core'})
+        """pytest-cov should be pinned to our currently preferred version"""
+        check_version(tests, 'pytest-cov')
 
     def test_pytest_catchlog_version(self, tests):
-        """pytest-catchlog should be pinned to our currently preferred version and appear after pytest"""
-        check_version(tests, 'pytest-catchlog', {'pytest'})
+        """pytest-catchlog should be pinned to our currently preferred version"""
+        check_version(tests, 'pytest-catchlog')
 
     def test_simplegeneric_version(self, tests):
         """simplegeneric should be pinned to our currently preferred version"""
         check_version(tests, 'simplegeneric')
 
     def test_traitlets_version(self, tests):
-        """traitlets should be pinned to our currently preferred version and appear after decorator and ipython-genutils"""
-        check_version(tests, 'traitlets', {'decorator', 'ipython-genutils'})
+        """traitlets should be pinned to our currently preferred version"""
+        check_version(tests, 'traitlets')
 
 
 class TestToxRequirements(object):
@@ -264,7 +311,11 @@ class TestToxRequirements(object):
 
     def test_exists(self):
         """There should be a requirements/tox.txt file for tox dependencies"""
-        assert os.path.exists(os.path.join('requirements', 'tox.txt'))
+        assert file_exists(os.path.join('requirements', 'tox.txt'))
+
+    def test_dependency_order(self, tox, dependency_order, pytestconfig):
+        """Packages should appear after the packages they depend on (as listed in data/dependency_order.txt)"""
+        check_dependency_order(tox, dependency_order, type(self), pytestconfig)
 
     def test_py_version(self, tox):
         """py should be pinned to our currently preferred version"""
@@ -275,8 +326,8 @@ class TestToxRequirements(object):
         check_version(tox, 'pluggy')
 
     def test_tox_version(self, tox):
-        """tox should be pinned to our currently preferred version and appear after pluggy, py, and virtualenv"""
-        check_version(tox, 'tox', {'pluggy', 'py', 'virtualenv'})
+        """tox should be pinned to our currently preferred version"""
+        check_version(tox, 'tox')
 
     def test_virtualenv_version(self, tox):
         """virtualenv should be pinned to our currently preferred version"""
@@ -293,23 +344,32 @@ class TestUninstallRequirements(object):
 
     def test_exists(self):
         """There should be a requirements/uninstall.txt file for listing previous dependencies to uninstall"""
-        assert os.path.exists(os.path.join('requirements', 'uninstall.txt'))
+        assert file_exists(os.path.join('requirements', 'uninstall.txt'))
 
     def test_explanation(self, uninstall):
         """requirements/uninstall.txt should include a comment explaining its usage"""
         assert uninstall[0] == '# Packages which were once dependencies, but should now be removed if present.'
 
 
+def test_no_include_cycles():
+    """Requirements files should not include each other in a cycle"""
+    paths = [os.path.join('requirements', filename) for filename in list_directory('requirements')
+             if filename.endswith('.txt')]
+    cycles = REQUIREMENTS_GRAPH.cycles(*paths)
+    assert not cycles, 'Include cycles: {}'.format(
+        '; '.join(' -> '.join(os.path.relpath(path) for path in cycle) for cycle in cycles))
+
+
 def test_cpython2_does_not_exist():
     """There should not be a requirements/cpython2.txt file, use environment markers instead"""
-    assert not os.path.exists(os.path.join('requirements', 'cpython2.txt'))
+    assert not file_exists(os.path.join('requirements', 'cpython2.txt'))
 
 
 def test_cpython3_does_not_exist():
     """There should not be a requirements/cpython3.txt file, use environment markers instead"""
-    assert not os.path.exists(os.path.join('requirements', 'cpython3.txt'))
+    assert not file_exists(os.path.join('requirements', 'cpython3.txt'))
 
 
 def test_pypy_does_not_exist():
     """There should not be a requirements/pypy.txt file, use environment markers instead"""
-    assert not os.path.exists(os.path.join('requirements', 'pypy.txt'))
+    assert not file_exists(os.path.join('requirements', 'pypy.txt'))
@@ -0,0 +1,195 @@
+# encoding: utf-8
+"""
+Tests of the parsing and flattening of requirements files and their includes.
+Not packaged for use in other repositories.
+"""
+
+from __future__ import unicode_literals
+
+import os
+
+import pytest
+
+from audit_python_package import get_dependency_order
+from audit_python_package.file_cache import FileCache
+from audit_python_package.requirements import (DependencyOrder, RequirementsGraph, RequirementsIndex, parse_requirement,
+                                               parse_requirements)
+
+
+@pytest.fixture
+def requirements_dir(tmpdir):
+    """A requirements directory in which several files include base.txt"""
+    directory = tmpdir.mkdir('requirements')
+    directory.join('base.txt').write('# Core\nsix==1.10.0\npip==8.1.1; python_version < "3"\nrequests\n')
+    directory.join('tests.txt').write('-r base.txt\npytest==2.9.1\n')
+    directory.join('tox.txt').write('--requirement base.txt\ntox==2.3.1\n')
+    directory.join('all.txt').write('-r tests.txt\n-r tox.txt\n')
+    return directory
+
+
+def test_flattened_order(requirements_dir):
+    """Included requirements should appear in place of the include line"""
+    graph = RequirementsGraph(FileCache())
+    assert graph.requirement_lines(str(requirements_dir.join('all.txt'))) == [
+        'six==1.10.0', 'pip==8.1.1', 'pytest==2.9.1', 'six==1.10.0', 'pip==8.1.1', 'tox==2.3.1']
+
+
+def test_shared_include_parsed_once(requirements_dir, monkeypatch):
+    """A file included by several others should only be parsed once"""
+    graph = RequirementsGraph(FileCache())
+    parsed = []
+    get_file = graph.get_file
+
+    def counting_get_file(path):
+        result = get_file(path)
+        parsed.append(path)
+        return result
+    monkeypatch.setattr(graph, 'get_file', counting_get_file)
+    for name in ('tests.txt', 'tox.txt', 'all.txt'):
+        graph.requirement_lines(str(requirements_dir.join(name)))
+    assert len([path for path in parsed if path.endswith('base.txt')]) == 1
+
+
+def test_change_invalidates(requirements_dir):
+    """Editing an included file should be reflected in the flattened result"""
+    graph = RequirementsGraph(FileCache())
+    path = str(requirements_dir.join('tests.txt'))
+    assert 'requests==2.9.1' not in graph.requirement_lines(path)
+    requirements_dir.join('base.txt').write('six==1.10.0\nrequests==2.9.1\n')
+    assert graph.requirement_lines(path) == ['six==1.10.0', 'requests==2.9.1', 'pytest==2.9.1']
+
+
+def test_missing_include(requirements_dir):
+    """An include of a nonexistent file should contribute no requirements"""
+    requirements_dir.join('docs.txt').write('-r missing.txt\nSphinx==1.3.6\n')
+    graph = RequirementsGraph(FileCache())
+    assert graph.requirement_lines(str(requirements_dir.join('docs.txt'))) == ['Sphinx==1.3.6']
+
+
+def test_cycle(requirements_dir):
+    """An include cycle should be reported instead of recursing forever"""
+    requirements_dir.join('a.txt').write('-r b.txt\nalabaster==0.7.7\n')
+    requirements_dir.join('b.txt').write('-r a.txt\nSphinx==1.3.6\n')
+    graph = RequirementsGraph(FileCache())
+    a = str(requirements_dir.join('a.txt'))
+    b = str(requirements_dir.join('b.txt'))
+    assert graph.requirement_lines(a) == ['Sphinx==1.3.6', 'alabaster==0.7.7']
+    assert graph.requirement_lines(b) == ['alabaster==0.7.7', 'Sphinx==1.3.6']
+    assert graph.cycles(a, b) == [[a, b, a]]
+    assert graph.cycles(str(requirements_dir.join('all.txt'))) == []
+
+
+def test_requirements_index(requirements_dir):
+    """The index should answer pin and ordering questions without scanning"""
+    graph = RequirementsGraph(FileCache())
+    index = graph.requirements_index(str(requirements_dir.join('tests.txt')))
+    assert list(index) == ['six==1.10.0', 'pip==8.1.1', 'pytest==2.9.1']
+    assert index.pins == [('six', '1.10.0'), ('pip', '8.1.1'), ('pytest', '2.9.1')]
+    assert 'pytest==2.9.1' in index
+    assert 'pytest==2.9.2' not in index
+    assert index.requirement('PyTest').line == 'pytest==2.9.1'
+    assert index.requirement('py') is None
+
+
+def test_requirements_index_reused(requirements_dir):
+    """The index should only be rebuilt when the requirements change"""
+    graph = RequirementsGraph(FileCache())
+    path = str(requirements_dir.join('tests.txt'))
+    index = graph.requirements_index(path)
+    assert graph.requirements_index(path) is index
+    requirements_dir.join('tests.txt').write('-r base.txt\npytest==2.9.2\n')
+    assert 'pytest==2.9.2' in graph.requirements_index(path)
+
+
+def test_dependency_order_violations():
+    """Every ordering violation in a file should be reported at once, except for excluded packages"""
+    order = DependencyOrder.parse(['# Comment', '', 'Sphinx: Babel docutils', 'Babel: pytz', 'alabaster: Sphinx'])
+    index = RequirementsIndex(parse_requirement(line) for line in [
+        'docutils==0.12', 'Sphinx==1.3.6', 'pytz==2016.2', 'Babel==2.2.0', 'alabaster==0.7.7', 'Sphinx==1.3.6'])
+    assert order.violations(index) == [('Sphinx', ['Babel'])]
+    index = RequirementsIndex(parse_requirement(line) for line in ['alabaster==0.7.7', 'Babel==2.2.0'])
+    assert order.violations(index) == [('alabaster', ['Sphinx']), ('Babel', ['pytz'])]
+    assert order.violations(index, exclude=['ALABASTER']) == [('Babel', ['pytz'])]
+
+
+def test_dependency_order_mixed_case():
+    """Package names should be compared after normalization, whatever case they're written in"""
+    order = DependencyOrder.parse(['Jinja2: MarkupSafe', 'Sphinx: Jinja2 six'])
+    index = RequirementsIndex(parse_requirement(line) for line in [
+        'markupsafe==0.23', 'jinja2==2.8', 'SIX==1.10.0', 'Sphinx==1.3.6'])
+    assert order.violations(index) == []
+    index = RequirementsIndex(parse_requirement(line) for line in ['sphinx==1.3.6', 'six==1.10.0'])
+    assert order.violations(index) == [('sphinx', ['Jinja2', 'six'])]
+
+
+def test_dependency_order_cycle():
+    """Circular ordering constraints should be rejected when loaded"""
+    with pytest.raises(ValueError) as exc_info:
+        DependencyOrder.parse(['a: b', 'b: c', 'c: a', 'd: a'])
+    assert 'a -> b -> c -> a' in str(exc_info.value)
+
+
+def test_packaged_dependency_order():
+    """The constraints in data/dependency_order.txt should be loadable"""
+    assert get_dependency_order().constraints['tox'] == {'pluggy', 'py', 'virtualenv'}
+
+
+def test_digest(requirements_dir, tmpdir):
+    """The digest should change if any included file does, but not depend on
+    where the files are"""
+    graph = RequirementsGraph(FileCache())
+    digest = graph.digest(str(requirements_dir.join('all.txt')))
+    assert graph.digest(str(requirements_dir.join('all.txt'))) == digest
+    requirements_dir.copy(tmpdir.join('copy'))
+    assert graph.digest(str(tmpdir.join('copy', 'all.txt'))) == digest
+    requirements_dir.join('base.txt').write('six==1.9.0\n')
+    changed = graph.digest(str(requirements_dir.join('all.txt')))
+    assert changed != digest
+    requirements_dir.join('base.txt').remove()
+    assert graph.digest(str(requirements_dir.join('all.txt'))) not in (digest, changed)
+
+
+FULL_SYNTAX = '''# Options which don't specify requirements are skipped
+--index-url https://pypi.example.com/simple
+-c constraints.txt
+-rbase.txt
+six==1.10.0 \\
+    --hash=sha256:aaaa \\
+    --hash=sha256:bbbb
+pip == 8.1.1 ; python_version < "3"  # Inline comment
+requests[security, socks]>=2.9,<3
+-e git+https://github.com/example/Foo_Bar.git#egg=Foo_Bar
+--editable .
+wheel @ https://example.com/wheel-0.29.0.whl ; python_version > "3"
+'''
+
+
+def test_parse_requirements():
+    """The full requirements file syntax supported by pip should be parsed"""
+    entries = list(parse_requirements(FULL_SYNTAX.splitlines(), '/repo/requirements/all.txt'))
+    assert [kind for kind, value in entries] == ['constraint', 'include'] + ['requirement'] * 6
+    assert entries[0][1] == os.path.abspath('/repo/requirements/constraints.txt')
+    assert entries[1][1] == os.path.abspath('/repo/requirements/base.txt')
+    six, pip, requests, foo_bar, local, wheel = [value for kind, value in entries[2:]]
+    assert (six.name, six.specifier, six.version, six.hashes, six.lineno) == (
+        'six', '==1.10.0', '1.10.0', ('sha256:aaaa', 'sha256:bbbb'), 5)
+    assert (pip.line, pip.markers, pip.lineno) == ('pip==8.1.1', 'python_version < "3"', 8)
+    assert (requests.extras, requests.specifier, requests.version) == (('security', 'socks'), '>=2.9,<3', None)
+    assert (foo_bar.name, foo_bar.key, foo_bar.editable) == ('Foo_Bar', 'foo-bar', True)
+    assert (local.name, local.url, local.editable) == (None, '.', True)
+    assert (wheel.name, wheel.url, wheel.markers) == ('wheel', 'https://example.com/wheel-0.29.0.whl',
+                                                      'python_version > "3"')
+    assert all(requirement.path == '/repo/requirements/all.txt' for requirement in (six, wheel))
+
+
+def test_constraints_not_flattened(requirements_dir):
+    """Constraints files should count toward the digest, but not contribute requirements"""
+    requirements_dir.join('constraints.txt').write('pytz==2016.2\n')
+    requirements_dir.join('docs.txt').write('-c constraints.txt\n-r base.txt\nSphinx==1.3.6 --hash=sha256:aaaa\n')
+    graph = RequirementsGraph(FileCache())
+    path = str(requirements_dir.join('docs.txt'))
+    assert graph.requirement_lines(path) == ['six==1.10.0', 'pip==8.1.1', 'Sphinx==1.3.6']
+    assert [requirement.name for requirement in graph.requirements(path)] == ['six', 'pip', 'requests', 'Sphinx']
+    digest = graph.digest(path)
+    requirements_dir.join('constraints.txt').write('pytz==2016.3\n')
+    assert graph.digest(path) != digest
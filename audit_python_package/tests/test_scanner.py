@@ -0,0 +1,58 @@
+# encoding: utf-8
+"""
+Tests of searching a file's text for many rules in a single pass.  Not
+packaged for use in other repositories.
+"""
+
+from __future__ import unicode_literals
+
+import re
+
+from audit_python_package import RuleSet
+
+
+def test_literals_and_patterns():
+    """Literals should be matched exactly, and patterns as regular expressions"""
+    rules = RuleSet(literals=['a.b', 'print '], patterns={'digits': r'\d+', 'groups': r'(x)(y)?z'})
+    assert rules.names == ['a.b', 'print ', 'digits', 'groups']
+    assert rules.scan('axb 42 xz') == {'digits', 'groups'}
+    assert rules.scan('a.b print_function') == {'a.b'}
+    assert rules.scan('') == frozenset()
+
+
+def test_overlapping_matches():
+    """A rule should be found even if all its matches start inside a match of another rule"""
+    rules = RuleSet(literals=['unicode_literals', 'literals', 'code'])
+    assert rules.scan('from __future__ import unicode_literals') == {'unicode_literals', 'literals', 'code'}
+    rules = RuleSet(patterns={'line': r'^pip .*$', 'tests': r'tests\.txt'}, flags=re.MULTILINE)
+    assert rules.scan('pip install -r tests.txt\nsomething else') == {'line', 'tests'}
+    assert rules.scan('no pip here\ntests.txt') == {'tests'}
+
+
+def test_single_pass(monkeypatch):
+    """Rules found by the combined expression shouldn't be searched for again"""
+    rules = RuleSet(literals=['one', 'two', 'three'])
+    searched = []
+    monkeypatch.setattr(rules, '_compiled', [(name, _Recording(compiled, searched))
+                                             for name, compiled in rules._compiled])
+    assert rules.scan('one two') == {'one', 'two'}
+    # Only checked where it could have been hidden by the other matches
+    assert set(searched) == {'three'}
+    assert len(searched) == 6
+
+
+def test_empty():
+    """A rule set with no rules shouldn't find anything"""
+    assert RuleSet().scan('anything') == frozenset()
+
+
+class _Recording(object):
+    """Wraps a compiled pattern, recording each use of it"""
+
+    def __init__(self, compiled, searched):
+        self.compiled = compiled
+        self.searched = searched
+
+    def match(self, *args):
+        self.searched.append(self.compiled.pattern)
+        return self.compiled.match(*args)
@@ -4,63 +4,96 @@
 
 from __future__ import unicode_literals
 
-import os
 import re
 
-import pytest
+from audit_python_package import file_exists, fixture, get_file_content, get_setup_model
 
-from audit_python_package import get_file_content
 
-
-@pytest.fixture(scope='module')
+@fixture(scope='module')
 def setup():
     """Fixture containing the text content of setup.py"""
     return get_file_content('setup.py')
 
 
+@fixture(scope='module')
+def setup_model():
+    """Fixture containing the SetupModel parsed from setup.py"""
+    return get_setup_model('setup.py')
+
+
+def _strings(setup, setup_model):
+    """The string literals in setup.py, or its whole text as a single string
+    if it couldn't be parsed"""
+    return [setup] if setup_model.syntax_error else setup_model.strings
+
+
 class TestSetup(object):
     """Checks related to setup.py"""
 
     def test_exists(self):
         """There should be a setup.py in the project's root directory"""
-        assert os.path.exists('setup.py')
+        assert file_exists('setup.py')
 
     def test_changelog_reminder(self, setup):
         """There should be a reminder in setup.py to update docs/CHANGELOG.rst when the version changes"""
         assert 'docs/CHANGELOG.rst' in setup
 
-    def test_environment_markers(self, setup):
+    def test_environment_markers(self, setup, setup_model):
         """If install_requires is derived from a requirements file, it should respect environment markers"""
-        if 'parse_requirements' in setup:
-            assert '.match_markers()' in setup
+        if setup_model.syntax_error:
+            if 'parse_requirements' in setup:
+                assert '.match_markers()' in setup
+        elif setup_model.calls_function('parse_requirements'):
+            assert setup_model.calls_function('match_markers')
 
-    def test_include_package_data(self, setup):
+    def test_include_package_data(self, setup, setup_model):
         """include_package_data should be set to True in setup.py (to let MANIFEST.in define the data to include)"""
-        assert 'include_package_data=True' in setup
+        if setup_model.syntax_error:
+            assert re.search(r'include_package_data\s*=\s*True', setup)
+        else:
+            assert setup_model.values.get('include_package_data') is True
 
-    def test_long_description(self, setup):
+    def test_long_description(self, setup, setup_model):
         """The package's long_description should be set to the content of README.rst"""
-        assert 'import codecs' in setup
-        assert "with codecs.open('README.rst', 'r', 'utf-8') as f:" in setup
-        assert 'long_description = f.read()' in setup
-        assert 'long_description=long_description,' in setup
-
-    def test_no_package_data(self, setup):
+        if setup_model.syntax_error:
+            assert 'import codecs' in setup
+            assert "with codecs.open('README.rst', 'r', 'utf-8') as f:" in setup
+            assert 'long_description = f.read()' in setup
+            assert 'long_description=long_description,' in setup
+            return
+        assert 'codecs' in setup_model.imports
+        assert setup_model.keyword_source('long_description') == ('codecs.open', 'README.rst', 'utf-8')
+
+    def test_no_package_data(self, setup, setup_model):
         """package_data should not be set in setup.py (use MANIFEST.in instead)"""
-        assert not re.search(r'\spackage_data', setup)
+        if setup_model.syntax_error:
+            assert not re.search(r'\spackage_data', setup)
+        else:
+            assert 'package_data' not in setup_model.keywords
 
-    def test_prevent_pypi_upload(self, setup):
+    def test_prevent_pypi_upload(self, setup, setup_model):
         """There should be an invalid "Private :: Do Not Upload" classifier in private packages to prevent accidental uploads to PyPI"""
-        assert 'Private :: Do Not Upload' in setup
+        if 'classifiers' in setup_model.values:
+            assert 'Private :: Do Not Upload' in setup_model.classifiers
+        else:
+            # Built from something other than literals (like CLASSIFIERS + [...]), or unparseable
+            assert any('Private :: Do Not Upload' in string for string in _strings(setup, setup_model))
 
-    def test_no_read_the_docs_section(self, setup):
+    def test_no_read_the_docs_section(self, setup, setup_model):
         """There should not be explicit support for Read the Docs builds in setup.py (specify a requirements file for the virtualenv in the Read the Docs configuration instead)"""
-        assert 'READTHEDOCS' not in setup
-        assert 'documentation.txt' not in setup
+        strings = _strings(setup, setup_model)
+        assert not any('READTHEDOCS' in string for string in strings)
+        assert not any('documentation.txt' in string for string in strings)
 
-    def test_multiple_pip_versions(self, setup):
+    def test_multiple_pip_versions(self, setup, setup_model):
         """setup.py should work with a good variety of pip versions"""
-        if 'parse_requirements' in setup:
-            assert 'PipSession()' in setup
-            assert ', session=session)' in setup
-        assert '[r.req' not in setup
+        if setup_model.syntax_error:
+            if 'parse_requirements' in setup:
+                assert 'PipSession()' in setup
+                assert ', session=session)' in setup
+            assert '[r.req' not in setup
+            return
+        if setup_model.calls_function('parse_requirements'):
+            assert setup_model.calls_function('PipSession')
+            assert 'session' in setup_model.call_keywords.get('parse_requirements', ())
+        assert not any(element.endswith('.req') for element in setup_model.comprehension_elements)
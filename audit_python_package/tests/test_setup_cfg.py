@@ -4,14 +4,10 @@
 
 from __future__ import unicode_literals
 
-import os
+from audit_python_package import file_exists, fixture, parse_config_file
 
-import pytest
 
-from audit_python_package import parse_config_file
-
-
-@pytest.fixture(scope='module')
+@fixture(scope='module')
 def setup_cfg():
     """Fixture containing the parsed content of setup.cfg"""
     return parse_config_file('setup.cfg')
@@ -25,4 +21,4 @@ class TestSetupCfg(object):
         # We used to use this to set the package's long description, but now
         # prefer to set long_description in setup.py to the README.rst file
         # content directly; most validation tools only work this way
-        assert not os.path.exists('setup.cfg')
+        assert not file_exists('setup.cfg')
@@ -0,0 +1,123 @@
+# encoding: utf-8
+"""
+Tests of the model of setup.py built from its syntax tree.  Not packaged for
+use in other repositories.
+"""
+
+from __future__ import unicode_literals
+
+import ast
+
+from audit_python_package.command_line import find_repository_name
+from audit_python_package.engine import CheckEngine
+from audit_python_package.setup_model import parse_setup
+
+
+SETUP = '''
+import codecs
+from pip.req import parse_requirements
+from setuptools import setup
+
+version = "2.0"
+CLASSIFIERS = [
+    'Private :: Do Not Upload',
+]
+
+with codecs.open(
+        'README.rst', encoding='utf-8') as readme:
+    description = readme.read()
+
+session = PipSession()
+requirements = [str(r.req) for r in parse_requirements('requirements/base.txt', session = session)
+                if r.match_markers()]
+
+setup(
+    name = "example",
+    version=version,
+    classifiers=CLASSIFIERS,
+    long_description=description,
+    include_package_data = True,
+    install_requires=requirements,
+    entry_points={'console_scripts': ['example=example:main']},
+    **extra
+)
+'''
+
+
+def test_setup_keywords():
+    """Keyword arguments should be found however they're formatted, with names resolved where possible"""
+    model = parse_setup(SETUP)
+    assert model.keywords == ['name', 'version', 'classifiers', 'long_description', 'include_package_data',
+                              'install_requires', 'entry_points']
+    assert model.name == 'example'
+    assert model.version == '2.0'
+    assert model.classifiers == ['Private :: Do Not Upload']
+    assert model.entry_points == {'console_scripts': ['example=example:main']}
+    assert model.values['include_package_data'] is True
+    # Built from a requirements file, so it can't be determined without running the script
+    assert model.install_requires is None
+    assert 'long_description' not in model.values
+
+
+def test_script_facts():
+    """Imports, calls, strings, and the sources of keyword values should be found"""
+    model = parse_setup(SETUP)
+    assert {'codecs', 'pip.req', 'setuptools'} <= model.imports
+    assert model.calls_function('parse_requirements')
+    assert model.calls_function('match_markers')
+    assert not model.calls_function('match')
+    assert model.call_keywords['parse_requirements'] == {'session'}
+    assert 'requirements/base.txt' in model.strings
+    assert model.comprehension_elements == set()
+    assert model.keyword_source('long_description') == ('codecs.open', 'README.rst', 'utf-8')
+    assert model.keyword_source('version') is None
+    model = parse_setup('setup(install_requires=[r.req for r in parse_requirements("base.txt")])\n')
+    assert model.comprehension_elements == {'r.req'}
+
+
+def test_syntax_error():
+    """An unparseable script should produce an empty model"""
+    model = parse_setup('Good luck parsing a package name from this')
+    assert model.syntax_error
+    assert model.keywords == []
+    assert model.name is None
+
+
+def test_cached_by_content(monkeypatch):
+    """Identical content should only be parsed once"""
+    parsed = []
+    parse = ast.parse
+
+    def counting_parse(*args, **kwargs):
+        parsed.append(args[0])
+        return parse(*args, **kwargs)
+    monkeypatch.setattr(ast, 'parse', counting_parse)
+    text = 'from setuptools import setup\nsetup(name="cached-once")\n'
+    assert parse_setup(text) is parse_setup(text[:-1] + '\n')
+    assert parsed == [text]
+
+
+def test_find_repository_name():
+    """The package name should be found with either quote style, or via a variable"""
+    assert find_repository_name("setup(name='single')") == 'single'
+    assert find_repository_name('NAME = "double"\nsetup(\n    name = NAME,\n)') == 'double'
+    assert find_repository_name('setup(name=get_name())') is None
+    # Python 2 only syntax can't be parsed, so fall back to a text search
+    assert find_repository_name('print "Building"\nsetup(name="legacy")') == 'legacy'
+    assert find_repository_name('print "Building"\nsetup(name=NAME)') is None
+
+
+def test_setup_checks_fallback(tmpdir):
+    """The setup.py checks should fall back to the script's strings or text when values can't be resolved"""
+    engine = CheckEngine(['test_setup.py'])
+    tmpdir.join('setup.py').write(
+        'CLASSIFIERS = ["Programming Language :: Python"]\n'
+        'setup(classifiers=CLASSIFIERS + ["Private :: Do Not Upload"], include_package_data=True)\n')
+    results = {result.check: result.outcome for result in engine.run(str(tmpdir), 'upload or package_data')}
+    assert set(results.values()) == {'passed'}
+    tmpdir.join('setup.py').write('print "Private :: Do Not Upload"\nsetup(include_package_data=True)\n')
+    results = {result.check: result.outcome for result in engine.run(str(tmpdir), 'upload or package_data')}
+    assert set(results.values()) == {'passed'}
+    tmpdir.join('setup.py').write('setup(classifiers=CLASSIFIERS + ["Development Status :: 5"])\n')
+    results = {result.check: result.outcome for result in engine.run(str(tmpdir), 'upload')}
+    assert list(results.values()) == ['failed']
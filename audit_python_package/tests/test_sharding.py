@@ -0,0 +1,130 @@
+# encoding: utf-8
+"""
+Tests of splitting a fleet audit into shards and merging their results.  Not
+packaged for use in other repositories.
+"""
+
+from __future__ import unicode_literals
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import audit_python_package
+from audit_python_package.command_line import audit_merge
+from audit_python_package.report import CheckResult, merge_results, read_results, write_results
+from audit_python_package.sharding import assign_shards, load_check_costs, parse_shard, shard_units
+
+PACKAGE_PARENT = os.path.dirname(os.path.dirname(os.path.abspath(audit_python_package.__file__)))
+
+KEYWORD = 'TestTox'
+
+
+def test_parse_shard():
+    """Shard specifications should be 1-based and validated"""
+    assert parse_shard('1/1') == (1, 1)
+    assert parse_shard('3/4') == (3, 4)
+    for text in ('0/2', '3/2', '2', '1/0', 'a/b', '1/2/3'):
+        with pytest.raises(ValueError):
+            parse_shard(text)
+
+
+def test_deterministic_assignment():
+    """Every unit should be in exactly one shard, regardless of the order the units are listed in"""
+    units = [(repository, check) for repository in 'abcde' for check in ('x', 'y', 'z')]
+    shards = assign_shards(units, 4)
+    assert sorted(unit for shard in shards for unit in shard) == sorted(units)
+    assert assign_shards(list(reversed(units)), 4) == shards
+    assert [len(shard) for shard in shards] == [4, 4, 4, 3]
+    assert shard_units(units, 2, 4) == shards[1]
+
+
+def test_balanced_by_cost():
+    """Expensive checks should be spread across the shards, with unknown checks costing the average"""
+    units = [(repository, check) for repository in 'abcd' for check in ('slow', 'fast', 'new')]
+    costs = {'slow': 10.0, 'fast': 0.5}
+    shards = assign_shards(units, 2, costs)
+    loads = [sum(costs.get(check, 5.25) for _, check in shard) for shard in shards]
+    assert loads == [31.5, 31.5]
+    assert [sum(1 for _, check in shard if check == 'slow') for shard in shards] == [2, 2]
+
+
+def test_load_check_costs(tmpdir):
+    """Costs should be the average time of each check, ignoring other kinds of operation"""
+    path = tmpdir.join('timings.json')
+    path.write(json.dumps({'python': '3.6.0', 'samples': [
+        {'kind': 'check', 'name': 'test_tox.py::TestTox::test_python_35', 'calls': 4, 'wall': 2.0,
+         'cpu': 1.0, 'bytes_read': 0},
+        {'kind': 'fixture', 'name': 'tox_ini', 'calls': 1, 'wall': 1.0, 'cpu': 1.0, 'bytes_read': 0},
+    ]}))
+    assert load_check_costs(str(path)) == {'test_tox.py::TestTox::test_python_35': 0.5}
+
+
+def test_merge_results():
+    """Merged results should be grouped by repository, in check order, without duplicates"""
+    first = [CheckResult('a', 'check_2', 'passed', ''), CheckResult('b', '', 'error', 'Not a directory')]
+    second = [CheckResult('a', 'check_1', 'failed', 'Oops'), CheckResult('b', '', 'error', 'Not a directory'),
+              CheckResult('a', 'check_3', 'passed', '')]
+    assert merge_results([first, second], ['check_1', 'check_2']) == [
+        CheckResult('a', 'check_1', 'failed', 'Oops'), CheckResult('a', 'check_2', 'passed', ''),
+        CheckResult('a', 'check_3', 'passed', ''), CheckResult('b', '', 'error', 'Not a directory')]
+    with pytest.raises(ValueError):
+        merge_results([first, [CheckResult('a', 'check_2', 'failed', 'Oops')]])
+
+
+def test_merge_conflict(tmpdir, capsys):
+    """audit_merge should refuse to merge runs which disagree"""
+    paths = [str(tmpdir.join('1.json')), str(tmpdir.join('2.json'))]
+    write_results([CheckResult('a', 'check', 'passed', '')], paths[0])
+    write_results([CheckResult('a', 'check', 'failed', 'Oops')], paths[1])
+    with pytest.raises(SystemExit) as e:
+        audit_merge(paths)
+    assert e.value.code == 2
+    assert 'Conflicting results for check in a' in capsys.readouterr()[0]
+
+
+def _audit_fleet(args, cwd):
+    """Run audit_fleet in a separate process, as on a separate CI node"""
+    env = dict(os.environ, PYTHONPATH=PACKAGE_PARENT)
+    command = [sys.executable, '-c', 'from audit_python_package.command_line import audit_fleet; audit_fleet()']
+    process = subprocess.Popen(command + args, cwd=cwd, env=env, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, universal_newlines=True)
+    output = process.communicate()[0]
+    assert process.returncode in (0, 1), output
+    return output
+
+
+def test_sharded_audit(tmpdir, capsys):
+    """Shards run in separate processes should together give the same results as an unsharded run"""
+    roots = []
+    for name, envlist in (('first', 'py35'), ('second', 'py27,py35'), ('third', 'flake8')):
+        repository = tmpdir.mkdir(name)
+        repository.join('tox.ini').write('[tox]\nenvlist = {}\n'.format(envlist))
+        roots.append(str(repository))
+    cwd = str(tmpdir)
+    timings = str(tmpdir.join('timings.json'))
+    _audit_fleet(roots + ['-k', KEYWORD, '-j', '2', '--json', 'all.json', '--audit-timings-json', timings], cwd)
+    expected = read_results(str(tmpdir.join('all.json')))
+    assert len(expected) > len(roots)
+    assert set(load_check_costs(timings)) == {result.check for result in expected}
+    shard_paths = []
+    for index in (1, 2, 3):
+        path = 'shard-{}.json'.format(index)
+        _audit_fleet(roots + ['-k', KEYWORD, '--shard', '{}/3'.format(index), '--shard-timings', timings,
+                              '--json', path], cwd)
+        shard_paths.append(str(tmpdir.join(path)))
+    shards = [read_results(path) for path in shard_paths]
+    assert all(shards)
+    assert sorted(result for shard in shards for result in shard) == sorted(expected)
+    merged_path = str(tmpdir.join('merged.json'))
+    with pytest.raises(SystemExit):
+        audit_merge(shard_paths + ['--json', merged_path])
+    assert 'FAILED {}'.format(roots[2]) in capsys.readouterr()[0]
+    merged = read_results(merged_path)
+    assert sorted(merged) == sorted(expected)
+    for root in roots:
+        assert [result for result in merged if result.repository == root] == \
+            [result for result in expected if result.repository == root]
@@ -0,0 +1,241 @@
+# encoding: utf-8
+"""
+Tests of reading the files being audited from different sources, like a git
+revision or a built package.  Not packaged for use in other repositories.
+"""
+
+from __future__ import unicode_literals
+
+import io
+import os
+import subprocess
+import tarfile
+import zipfile
+
+import pytest
+
+from audit_python_package import file_exists, file_source, get_file_content, get_requirement_lines, is_executable
+from audit_python_package.command_line import audit_package
+from audit_python_package.fleet import audit_repository
+from audit_python_package.sources import ArchiveSource, GitTreeSource, WorkingTreeSource
+
+
+SDIST_FILES = [
+    ('pkg-1.0/MANIFEST.in', 'include README.rst\nrecursive-include requirements *.txt\n', 0o644),
+    ('pkg-1.0/README.rst', 'pkg\n===\n', 0o644),
+    ('pkg-1.0/git-hooks/post-merge', '#!/usr/bin/env python\n', 0o755),
+    ('pkg-1.0/pkg/__init__.py', 'VERSION = 1.0\n', 0o644),
+    ('pkg-1.0/requirements/base.txt', 'six==1.10.0\n', 0o644),
+]
+
+
+def git(repository, *args):
+    """Run a git command in the given repository"""
+    command = ['git', '-c', 'user.name=Audit', '-c', 'user.email=audit@example.com'] + list(args)
+    subprocess.check_call(command, cwd=str(repository), stdout=subprocess.PIPE)
+
+
+@pytest.fixture
+def repository(tmpdir):
+    """A git repository whose working directory differs from its last commit"""
+    tmpdir.join('tox.ini').write('[tox]\nenvlist = py35\n')
+    hooks = tmpdir.mkdir('git-hooks')
+    hooks.join('post-merge').write('#!/usr/bin/env python\n')
+    hooks.join('post-merge').chmod(0o755)
+    hooks.join('install-hooks').write('#!/usr/bin/env python\n')
+    requirements = tmpdir.mkdir('requirements')
+    requirements.join('base.txt').write('six==1.10.0\n')
+    requirements.join('tests.txt').write('-r base.txt\npytest==2.9.1\n')
+    git(tmpdir, 'init', '-q')
+    git(tmpdir, 'add', '.')
+    git(tmpdir, 'commit', '-q', '-m', 'Initial commit')
+    tmpdir.join('tox.ini').remove()
+    requirements.join('base.txt').write('six==1.9.0\n')
+    return tmpdir
+
+
+def test_git_tree_source(repository):
+    """Files and their modes should be read from the git tree, not the working directory"""
+    with GitTreeSource('HEAD', str(repository)) as source:
+        with repository.as_cwd():
+            assert source.read('tox.ini') == b'[tox]\nenvlist = py35\n'
+            assert source.is_file('tox.ini')
+            assert source.is_directory('requirements')
+            assert not source.is_file('requirements')
+            assert source.exists(os.path.join('git-hooks', 'post-merge'))
+            assert not source.exists('setup.py')
+            assert source.read('setup.py') is None
+            assert source.is_executable(os.path.join('git-hooks', 'post-merge'))
+            assert not source.is_executable(os.path.join('git-hooks', 'install-hooks'))
+            assert source.list_directory('git-hooks') == ['install-hooks', 'post-merge']
+            assert source.list_directory('tox.ini') == []
+            assert source.glob(os.path.join('requirements', '*.txt')) == [
+                os.path.join('requirements', 'base.txt'), os.path.join('requirements', 'tests.txt')]
+        # Paths outside the repository are read from the filesystem
+        assert source.read(__file__.replace('.pyc', '.py')).startswith(b'# encoding: utf-8')
+
+
+def test_single_process(repository, monkeypatch):
+    """All objects should be read through one git process"""
+    processes = []
+    popen = subprocess.Popen
+
+    def counting_popen(*args, **kwargs):
+        processes.append(args)
+        return popen(*args, **kwargs)
+    monkeypatch.setattr(subprocess, 'Popen', counting_popen)
+    with GitTreeSource('HEAD', str(repository)) as source:
+        for path in ('tox.ini', 'requirements/base.txt', 'requirements/tests.txt', 'git-hooks/post-merge'):
+            assert source.read(str(repository.join(path)))
+    assert len(processes) == 1
+
+
+def test_unknown_revision(repository):
+    """An unknown revision should be reported as such"""
+    with GitTreeSource('no-such-branch', str(repository)) as source:
+        with pytest.raises(ValueError) as exc_info:
+            source.tree_id
+    assert 'Unknown git revision no-such-branch' in str(exc_info.value)
+
+
+def test_file_helpers(repository):
+    """The file helper functions should read from the current file source"""
+    with repository.as_cwd():
+        assert not file_exists('tox.ini')
+        assert get_requirement_lines(os.path.join('requirements', 'tests.txt')) == ['six==1.9.0', 'pytest==2.9.1']
+        with GitTreeSource('HEAD', str(repository)) as source, file_source(source):
+            assert file_exists('tox.ini')
+            assert get_file_content('tox.ini') == '[tox]\nenvlist = py35\n'
+            assert is_executable(os.path.join('git-hooks', 'post-merge'))
+            assert get_requirement_lines(os.path.join('requirements', 'tests.txt')) == [
+                'six==1.10.0', 'pytest==2.9.1']
+        assert not file_exists('tox.ini')
+
+
+def test_working_tree_glob(tmpdir):
+    """Wildcards shouldn't match hidden files, as with glob.glob()"""
+    tmpdir.join('.hidden.txt').write('')
+    tmpdir.join('base.txt').write('')
+    source = WorkingTreeSource()
+    assert source.glob(str(tmpdir.join('*.txt'))) == [str(tmpdir.join('base.txt'))]
+    assert source.glob(str(tmpdir.join('.hidden.txt'))) == [str(tmpdir.join('.hidden.txt'))]
+
+
+@pytest.fixture
+def sdist(tmpdir):
+    """A gzipped tar file like a source distribution"""
+    path = str(tmpdir.join('dist', 'pkg-1.0.tar.gz'))
+    tmpdir.mkdir('dist')
+    with tarfile.open(path, 'w:gz') as archive:
+        for name, content, mode in SDIST_FILES:
+            info = tarfile.TarInfo(name)
+            data = content.encode('utf-8')
+            info.size = len(data)
+            info.mode = mode
+            archive.addfile(info, io.BytesIO(data))
+    return path
+
+
+@pytest.fixture
+def wheel(tmpdir):
+    """A zip file like a wheel"""
+    path = str(tmpdir.join('pkg-1.0-py2.py3-none-any.whl'))
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('pkg/__init__.py', 'VERSION = 1.0\n')
+        archive.writestr('pkg-1.0.dist-info/METADATA', 'Name: pkg\n')
+    return path
+
+
+def test_sdist_source(sdist):
+    """The files of an sdist should be served as though it had been extracted"""
+    root = os.path.dirname(sdist)
+    with ArchiveSource(sdist) as source:
+        assert source.read(os.path.join(root, 'MANIFEST.in')).startswith(b'include README.rst\n')
+        assert source.list_directory(root) == ['MANIFEST.in', 'README.rst', 'git-hooks', 'pkg', 'requirements']
+        assert source.is_directory(os.path.join(root, 'requirements'))
+        assert source.is_executable(os.path.join(root, 'git-hooks', 'post-merge'))
+        assert not source.is_executable(os.path.join(root, 'README.rst'))
+        assert not source.exists(os.path.join(root, 'tox.ini'))
+        assert source.glob(os.path.join(root, 'requirements', '*.txt')) == [
+            os.path.join(root, 'requirements', 'base.txt')]
+        # Not one of the check inputs, so it takes another pass to read
+        assert source.read(os.path.join(root, 'pkg', '__init__.py')) == b'VERSION = 1.0\n'
+
+
+def test_wheel_source(wheel, monkeypatch):
+    """Only the members of a zip file which are used should be decompressed"""
+    root = os.path.dirname(wheel)
+    decompressed = []
+    read = zipfile.ZipFile.read
+
+    def counting_read(self, name, *args):
+        decompressed.append(getattr(name, 'filename', name))
+        return read(self, name, *args)
+    monkeypatch.setattr(zipfile.ZipFile, 'read', counting_read)
+    with ArchiveSource(wheel) as source:
+        assert source.list_directory(root) == ['pkg', 'pkg-1.0.dist-info']
+        assert source.read(os.path.join(root, 'pkg-1.0.dist-info', 'METADATA')) == b'Name: pkg\n'
+    assert decompressed == ['pkg-1.0.dist-info/METADATA']
+
+
+def test_invalid_archive(tmpdir):
+    """An unreadable archive should be reported as such"""
+    path = tmpdir.join('pkg-1.0.tar.gz')
+    path.write('Not really a tar file')
+    with pytest.raises(ValueError) as exc_info:
+        ArchiveSource(str(path)).verify()
+    assert 'Unable to read' in str(exc_info.value)
+    results = audit_repository(str(path), 'test_manifest')
+    assert [result.outcome for result in results] == ['error']
+
+
+def test_audit_sdist(sdist, capsys):
+    """audit_package should be able to audit an sdist without extracting it"""
+    audit_package([sdist, '-k', 'TestManifest and not test_exclude_pyc'])
+    out, err = capsys.readouterr()
+    assert out.endswith('passed\n')
+    assert os.listdir(os.path.dirname(sdist)) == ['pkg-1.0.tar.gz']
+
+
+def test_audit_revision(repository, capsys):
+    """audit_package should be able to audit a git revision instead of the working directory"""
+    keyword = 'test_tox_ini_exists or test_post_merge_exists'
+    with pytest.raises(SystemExit):
+        audit_package([str(repository), '-k', keyword])
+    audit_package([str(repository), '-k', keyword, '--rev', 'HEAD'])
+    out, err = capsys.readouterr()
+    assert 'FAILED test_tox.py::TestTox::test_tox_ini_exists' in out
+    assert out.endswith('2 passed\n')
+
+
+def test_audit_repository_revision(repository):
+    """Fleet audit targets can specify a git revision to audit"""
+    target = '{}@HEAD'.format(repository)
+    results = audit_repository(target, 'test_tox_ini_exists')
+    assert [(result.repository, result.outcome) for result in results] == [(target, 'passed')]
+    results = audit_repository('{}@no-such-branch'.format(repository), 'test_tox_ini_exists')
+    assert results[0].outcome == 'error'
+
+
+def test_subdirectory_revision(tmpdir, capsys):
+    """A package in a subdirectory of a git repository should be read from that subdirectory's tree"""
+    tmpdir.join('tox.ini').write('[tox]\nenvlist = py27\n')
+    package = tmpdir.mkdir('pkg')
+    package.join('tox.ini').write('[tox]\nenvlist = py35\n')
+    git(tmpdir, 'init', '-q')
+    git(tmpdir, 'add', '.')
+    git(tmpdir, 'commit', '-q', '-m', 'Initial commit')
+    package.join('tox.ini').remove()
+    with GitTreeSource('HEAD', str(package)) as source:
+        assert source.read(str(package.join('tox.ini'))) == b'[tox]\nenvlist = py35\n'
+        assert source.list_directory(str(package)) == ['tox.ini']
+    audit_package([str(package), '-k', 'test_tox_ini_exists', '--rev', 'HEAD'])
+    assert capsys.readouterr()[0].endswith('1 passed\n')
+    target = '{}@HEAD'.format(package)
+    assert audit_repository(target, 'test_tox_ini_exists')[0].outcome == 'passed'
+    git(tmpdir, 'rm', '-q', '--cached', os.path.join('pkg', 'tox.ini'))
+    git(tmpdir, 'commit', '-q', '-m', 'Remove the package')
+    with GitTreeSource('HEAD', str(package)) as source:
+        with pytest.raises(ValueError) as exc_info:
+            source.verify()
+    assert 'does not exist in git revision HEAD' in str(exc_info.value)
@@ -0,0 +1,80 @@
+# encoding: utf-8
+"""
+Tests of the audit timing instrumentation.  Not packaged for use in other
+repositories.
+"""
+
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+import subprocess
+import sys
+
+import audit_python_package
+from audit_python_package.timing import RECORDER, TimingRecorder, load_timings, timed
+
+PACKAGE_PARENT = os.path.dirname(os.path.dirname(os.path.abspath(audit_python_package.__file__)))
+
+
+def test_aggregation():
+    """Samples should be aggregated by kind and name and sorted slowest first"""
+    recorder = TimingRecorder()
+    recorder.record('check', 'test_tox.py::TestTox::test_python_35', 0.01, 0.005, 100)
+    recorder.record('fixture', 'tox_ini', 0.02, 0.01, 200)
+    recorder.record('check', 'test_tox.py::TestTox::test_python_35', 0.02, 0.01)
+    samples = recorder.samples()
+    assert [(sample['kind'], sample['calls'], sample['bytes_read']) for sample in samples] == [
+        ('check', 2, 100), ('fixture', 1, 200)]
+    assert abs(samples[0]['wall'] - 0.03) < 1e-9
+    stream = io.StringIO()
+    recorder.format_table(1, stream)
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 2
+    assert lines[1].endswith('check      test_tox.py::TestTox::test_python_35')
+
+
+def test_timed_disabled():
+    """Nothing should be recorded unless the recorder is enabled"""
+    RECORDER.clear()
+    with timed('subprocess', 'git rev-parse'):
+        pass
+    assert RECORDER.samples() == []
+
+
+def test_timed_enabled(tmpdir):
+    """Time and file bytes read should be recorded while the recorder is enabled"""
+    path = tmpdir.join('tox.ini')
+    path.write('[tox]\n')
+    RECORDER.clear()
+    RECORDER.enabled = True
+    try:
+        with timed('fixture', 'tox_ini'):
+            audit_python_package.get_file_content(str(path))
+    finally:
+        RECORDER.enabled = False
+    samples = RECORDER.samples()
+    RECORDER.clear()
+    assert len(samples) == 1
+    assert samples[0]['bytes_read'] == 6
+
+
+def test_pytest_plugin(tmpdir):
+    """The pytest plugin should print the slowest operations and save them all as JSON"""
+    tmpdir.join('tox.ini').write('[tox]\nenvlist = py35\n')
+    json_path = str(tmpdir.join('timings.json'))
+    env = dict(os.environ, PYTHONPATH=PACKAGE_PARENT)
+    command = [sys.executable, '-m', 'pytest', '--pyargs', 'audit_python_package', '-c', os.devnull,
+               '-p', 'no:cacheprovider', '-p', 'audit_python_package.pytest_plugin', '-k', 'TestTox',
+               '--audit-timings', '5', '--audit-timings-json', json_path]
+    process = subprocess.Popen(command, cwd=str(tmpdir), env=env, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, universal_newlines=True)
+    output = process.communicate()[0]
+    assert 'slowest 5 audit operations' in output
+    timings = load_timings(json_path)
+    assert ('check', 'test_tox.py::TestTox::test_python_35') in timings
+    assert ('fixture', 'tox_ini') in timings
+    assert ('collection', 'pytest') in timings
+    with open(json_path) as f:
+        assert json.load(f)['python'].startswith('{}.{}'.format(*sys.version_info[:2]))
@@ -4,34 +4,61 @@
 
 from __future__ import unicode_literals
 
-import os
 import re
 
-import pytest
+from audit_python_package import file_exists, fixture, parse_config_file, RuleSet
 
-from audit_python_package import parse_config_file
 
-
-@pytest.fixture(scope='module')
+@fixture(scope='module')
 def tox_ini():
     """Fixture containing the parsed content of tox.ini"""
     return parse_config_file('tox.ini')
 
 
-@pytest.fixture(scope='module')
+def install_pattern(path):
+    """A pattern for a command which installs the specified requirements
+    file, either via pip or via install_requirements (which skips it if it
+    hasn't changed since it was last installed)"""
+    return r'^(?:pip .*install .*--requirement {0}|install_requirements (?:.* )?{0}(?:\s|$))'.format(re.escape(path))
+
+
+#: What the checks look for in the commands of a tox environment (one per
+#: line), all found in one pass
+COMMAND_RULES = RuleSet(
+    patterns={
+        'clean up requirements': r'^\{toxinidir\}/requirements/clean_up_requirements\.py$',
+        'install base': install_pattern('requirements/base.txt'),
+        'install documentation': install_pattern('requirements/documentation.txt'),
+        'install tests': install_pattern('requirements/tests.txt'),
+        'pytest': r'^py\.test',
+        'pytest posargs': r'py\.test [^\n]*\{posargs',
+        'check readme': r'^python setup\.py check --restructuredtext --strict$',
+        'sphinx-build': r'^sphinx-build -b \{posargs:html\} docs docs/_build$',
+    },
+    flags=re.MULTILINE)
+
+
+def command_rules(tox_ini, section):
+    """Get the names of the COMMAND_RULES found in the commands entry of the
+    given section of tox.ini"""
+    if not tox_ini.has_option(section, 'commands'):
+        return frozenset()
+    commands = [line.strip() for line in tox_ini.get(section, 'commands').split('\n')]
+    return COMMAND_RULES.scan('\n'.join(commands))
+
+
+@fixture(scope='module')
 def docs_commands(tox_ini):
-    """Fixture containing the commands entry from [testenv:docs]"""
-    if not tox_ini.has_option('testenv:docs', 'commands'):
-        return []
-    return [line.strip() for line in tox_ini.get('testenv:docs', 'commands').split('\n')]
+    """Fixture containing the names of the COMMAND_RULES found in the
+    commands entry from [testenv:docs]"""
+    return command_rules(tox_ini, 'testenv:docs')
 
 
-@pytest.fixture(scope='module')
+@fixture(scope='module')
 def testenv_commands(tox_ini):
-    """Fixture containing the commands entry from [testenv]"""
-    if not tox_ini.has_option('testenv', 'commands'):
-        return []
-    return [line.strip() for line in tox_ini.get('testenv', 'commands').split('\n')]
+    """Fixture containing the names of the COMMAND_RULES found in the
+    commands entry from [testenv]"""
+    return command_rules(tox_ini, 'testenv')
 
 
 class TestTox(object):
@@ -43,7 +70,7 @@ class TestTox(object):
 
     def test_tox_ini_exists(self):
         """There should be a tox.ini in the project's root directory"""
-        assert os.path.exists('tox.ini')
+        assert file_exists('tox.ini')
 
     def test_tox_section_exists(self, tox_ini):
         """There should be a [tox] section in tox.ini"""
@@ -90,23 +117,23 @@ class TestTox(object):
 
     def test_testenv_cleans_up_requirements(self, testenv_commands):
         """There should be a command in testenv to run requirements/clean_up_requirements.py"""
-        assert '{toxinidir}/requirements/clean_up_requirements.py' in testenv_commands
+        assert 'clean up requirements' in testenv_commands
 
     def test_testenv_installs_core_dependencies(self, testenv_commands):
         """There should be a command in testenv to install the core dependencies from base.txt in the requirements directory"""
-        assert any([re.match(r'pip .*install .*--requirement requirements/base.txt.*', command) for command in testenv_commands])
+        assert 'install base' in testenv_commands
 
     def test_testenv_installs_testing_dependencies(self, testenv_commands):
         """There should be a command in testenv to install the testing dependencies from requirements/tests.txt"""
-        assert any([re.match(r'pip .*install .*--requirement requirements/tests.txt.*', command) for command in testenv_commands])
+        assert 'install tests' in testenv_commands
 
     def test_testenv_uses_pytest(self, testenv_commands):
         """pytest should be the default test runner"""
-        assert any([command.startswith('py.test') for command in testenv_commands])
+        assert 'pytest' in testenv_commands
 
     def test_pytest_uses_posargs(self, testenv_commands):
         """The py.test command should accept positional arguments for running specific tests"""
-        assert any([re.search(r'py\.test [^\n]*\{posargs', command) for command in testenv_commands])
+        assert 'pytest posargs' in testenv_commands
 
     def test_docs_section_exists(self, tox_ini):
         """There should be a [testenv:docs] section in tox.ini"""
@@ -114,20 +141,20 @@ class TestTox(object):
 
     def test_docs_cleans_up_requirements(self, docs_commands):
         """The docs test environment should run requirements/clean_up_requirements.py"""
-        assert '{toxinidir}/requirements/clean_up_requirements.py' in docs_commands
+        assert 'clean up requirements' in docs_commands
 
     def test_docs_installs_core_dependencies(self, docs_commands):
         """The docs test environment should install the core dependencies from base.txt in the requirements directory"""
-        assert any([re.match(r'pip .*install .*--requirement requirements/base.txt.*', command) for command in docs_commands])
+        assert 'install base' in docs_commands
 
     def test_docs_installs_documentation_dependencies(self, docs_commands):
         """The docs test environment should install the doc generation dependencies from requirements/documentation.txt"""
-        assert any([re.match(r'pip .*install .*--requirement requirements/documentation.txt.*', command) for command in docs_commands])
+        assert 'install documentation' in docs_commands
 
     def test_docs_check_readme(self, docs_commands):
         """The docs test environment should include a validation of README.rst"""
-        assert 'python setup.py check --restructuredtext --strict' in docs_commands
+        assert 'check readme' in docs_commands
 
     def test_docs_sphinx_build(self, docs_commands):
         """The docs test environment should include a sphinx-build command"""
-        assert 'sphinx-build -b {posargs:html} docs docs/_build' in docs_commands
+        assert 'sphinx-build' in docs_commands
@@ -10,20 +10,28 @@ other repositories.
 
 from __future__ import unicode_literals
 
+import base64
+import json
 import os
 import re
 from subprocess import CalledProcessError, check_output, STDOUT
+import threading
 try:
     from unittest import mock
 except ImportError:
     import mock
 
+import pytest
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
 from audit_python_package.command_line import (
     get_branch_name,
     get_repository_name,
     requirements_file_paths,
     update_branch,
     update_repo,
+    upload_branches,
+    upload_requirements,
     verify_requires_token
 )
 
@@ -162,3 +170,73 @@ def test_verify_requires_token_not_present(monkeypatch):
     with mock.patch('audit_python_package.command_line.sys.exit') as exit_mock:
         verify_requires_token()
         exit_mock.assert_called_with(1)
+
+
+@pytest.fixture
+def requires_server(request):
+    """A local stand-in for the requires.io API which records each request,
+    and fails any request involving a repository named "broken" """
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_PUT(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            received.append((self.path, json.loads(body.decode('utf-8'))))
+            self.send_response(500 if '/repos/broken' in self.path else 200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    def stop():
+        server.shutdown()
+        server.server_close()
+    request.addfinalizer(stop)
+    return 'http://127.0.0.1:{}/api/v2/'.format(server.server_port), received
+
+
+def make_repository(directory, name):
+    """Create a minimal repository with a setup.py and requirements files"""
+    directory.join('setup.py').write("setup(\n    name='{}',\n)\n".format(name))
+    requirements = directory.mkdir('requirements')
+    requirements.join('base.txt').write('six==1.10.0\n')
+    requirements.join('uninstall.txt').write('readme\n')
+    return str(directory)
+
+
+def test_upload_branches(tmpdir, requires_server):
+    """upload_branches() should upload every repository and branch, collecting errors instead of exiting"""
+    url, received = requires_server
+    first = make_repository(tmpdir.mkdir('first'), 'first')
+    broken = make_repository(tmpdir.mkdir('broken'), 'broken')
+    nameless = str(tmpdir.mkdir('nameless'))
+    targets = [(first, 'master'), (first, 'feature'), (broken, 'master'), (nameless, 'master')]
+    results = upload_branches(targets, 'abc123', jobs=4, api_url=url)
+    assert [result.root for result in results] == [first, first, broken, nameless]
+    assert results[0].error is None
+    assert results[1].error is None
+    assert 'Unable to create or update broken on requires.io' in results[2].error
+    assert results[3].error == 'Could not find repository name in setup.py'
+    paths = sorted(path for path, payload in received)
+    assert paths == ['/api/v2/repos/broken', '/api/v2/repos/first', '/api/v2/repos/first/branches/feature',
+                     '/api/v2/repos/first/branches/master']
+    payload = dict(received)['/api/v2/repos/first/branches/master']
+    assert payload == [{'path': 'requirements/base.txt', 'content': base64.b64encode(b'six==1.10.0\n').decode('utf-8')}]
+
+
+def test_upload_requirements_bulk(tmpdir, requires_server, monkeypatch, capsys):
+    """upload_requirements should report failed bulk uploads and exit with an error afterwards"""
+    url, received = requires_server
+    monkeypatch.setenv('REQUIRES_TOKEN', 'abc123')
+    first = make_repository(tmpdir.mkdir('first'), 'first')
+    broken = make_repository(tmpdir.mkdir('broken'), 'broken')
+    with pytest.raises(SystemExit):
+        upload_requirements(['--api-url', url, first + '@master', broken + '@master'])
+    out, err = capsys.readouterr()
+    assert 'Uploaded {} (first master)'.format(first) in out
+    assert 'FAILED {} (broken master)'.format(broken) in out
@@ -0,0 +1,58 @@
+# encoding: utf-8
+"""
+Tests of the loading of the preferred versions table.  Not packaged for use
+in other repositories.
+"""
+
+from __future__ import unicode_literals
+
+import os
+import runpy
+
+from audit_python_package import DATA_DIRECTORY_PATH, _get_versions_dict
+from audit_python_package.versions import LazyVersions, parse_versions_file, write_versions_module
+
+SOURCE_PATH = os.path.join(DATA_DIRECTORY_PATH, 'requirements.txt')
+
+
+def test_lazy_loading():
+    """The versions table shouldn't be loaded until it is used"""
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {'pip': '8.1.1'}
+    versions = LazyVersions(loader)
+    assert not versions.loaded
+    assert versions['pip'] == '8.1.1'
+    assert 'setuptools' not in versions
+    assert list(versions) == ['pip']
+    assert len(calls) == 1
+
+
+def test_parse_versions_file():
+    """The standalone parser used at build time should agree with the runtime one"""
+    assert parse_versions_file(SOURCE_PATH) == _get_versions_dict()
+
+
+def test_write_versions_module(tmpdir):
+    """The precompiled module should contain the same table as the text file"""
+    module_path = str(tmpdir.join('_versions.py'))
+    write_versions_module(SOURCE_PATH, module_path)
+    assert runpy.run_path(module_path)['VERSIONS'] == _get_versions_dict()
+
+
+def test_normalized_names():
+    """Entries should be found by any spelling of the package name which normalizes to the same name"""
+    versions = LazyVersions(lambda: {'Jinja2': '2.8', 'sphinx_rtd_theme': '0.1.9'})
+    assert versions['jinja2'] == '2.8'
+    assert versions['Sphinx-RTD-Theme'] == '0.1.9'
+    assert 'markupsafe' not in versions
+    assert sorted(versions) == ['Jinja2', 'sphinx_rtd_theme']
+
+
+def test_version_ranges(tmpdir):
+    """Entries can be ranges as well as exact versions"""
+    path = tmpdir.join('requirements.txt')
+    path.write('# Comment\nJinja2==2.8\nSphinx >= 1.3, < 1.4  # Not 1.4 yet\n')
+    assert parse_versions_file(str(path)) == {'Jinja2': '2.8', 'Sphinx': '>=1.3,<1.4'}
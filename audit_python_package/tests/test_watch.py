@@ -0,0 +1,111 @@
+# encoding: utf-8
+"""
+Tests of the watch mode which re-runs checks as the audited files change.
+Not packaged for use in other repositories.
+"""
+
+from __future__ import unicode_literals
+
+import os
+import time
+
+import pytest
+
+from audit_python_package.command_line import audit_package
+from audit_python_package.engine import CheckEngine
+from audit_python_package.watch import Watcher
+
+KEYWORD = 'test_tox_ini_exists or test_pypy_does_not_exist or (TestBaseRequirements and test_exists)'
+
+
+@pytest.fixture
+def repository(tmpdir):
+    """A minimal repository with a tox.ini and a requirements file"""
+    tmpdir.join('tox.ini').write('[tox]\nenvlist = py35\n')
+    tmpdir.mkdir('requirements').join('base.txt').write('six==1.10.0\n')
+    return tmpdir
+
+
+@pytest.fixture
+def watcher(repository):
+    """A Watcher for a few checks in two different modules"""
+    engine = CheckEngine()
+    return Watcher(engine, engine.checks(KEYWORD), str(repository))
+
+
+def modify(path, content):
+    """Change a file's content, making sure its modification time changes"""
+    stat_result = os.stat(str(path))
+    path.write(content)
+    os.utime(str(path), (stat_result.st_atime, stat_result.st_mtime + 1))
+
+
+def test_poll(watcher, repository):
+    """Only the checks which read a changed file should be re-run"""
+    changed, results = watcher.poll()
+    assert changed == []
+    assert [result.outcome for result in results] == ['passed', 'passed', 'passed']
+    assert watcher.poll() == ([], [])
+    repository.join('requirements', 'pypy.txt').write('-r base.txt\n')
+    changed, results = watcher.poll()
+    assert changed == ['requirements/pypy.txt']
+    assert [(result.check, result.outcome) for result in results] == [
+        ('test_requirements.py::TestBaseRequirements::test_exists', 'passed'),
+        ('test_requirements.py::test_pypy_does_not_exist', 'failed')]
+    assert [result.check for result in watcher.failures()] == ['test_requirements.py::test_pypy_does_not_exist']
+    modify(repository.join('tox.ini'), '[tox]\nenvlist = py27\n')
+    changed, results = watcher.poll()
+    assert changed == ['tox.ini']
+    assert [result.check for result in results] == ['test_tox.py::TestTox::test_tox_ini_exists']
+    repository.join('requirements', 'pypy.txt').remove()
+    changed, results = watcher.poll()
+    assert changed == ['requirements/pypy.txt']
+    assert watcher.failures() == []
+
+
+def test_poll_referenced_files(tmpdir):
+    """Changing a requirements file included from outside the repository should re-run the requirements checks"""
+    shared = tmpdir.mkdir('common').join('base.txt')
+    shared.write('six==1.10.0\n')
+    repository = tmpdir.mkdir('package')
+    repository.join('tox.ini').write('[tox]\nenvlist = py35\n')
+    repository.mkdir('requirements').join('base.txt').write('-r ../../common/base.txt\n')
+    engine = CheckEngine()
+    watcher = Watcher(engine, engine.checks(KEYWORD), str(repository))
+    watcher.poll()
+    assert watcher.poll() == ([], [])
+    modify(shared, 'six==1.10.0\npytest==2.9.1\n')
+    changed, results = watcher.poll()
+    assert changed == ['../common/base.txt']
+    assert [result.check for result in results] == [
+        'test_requirements.py::TestBaseRequirements::test_exists', 'test_requirements.py::test_pypy_does_not_exist']
+
+
+def test_audit_package_watch(repository, monkeypatch, capsys):
+    """audit_package --watch should report each run until interrupted"""
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 1:
+            repository.join('requirements', 'pypy.txt').write('-r base.txt\n')
+        else:
+            raise KeyboardInterrupt()
+    monkeypatch.setattr(time, 'sleep', sleep)
+    with pytest.raises(SystemExit) as exc_info:
+        audit_package([str(repository), '-k', KEYWORD, '--watch'])
+    assert exc_info.value.code == 1
+    out, err = capsys.readouterr()
+    lines = out.splitlines()
+    assert lines[0].startswith('Ran 3 checks in ')
+    assert lines[1] == '3 passed'
+    assert lines[3].startswith('requirements/pypy.txt changed: re-ran 2 checks in ')
+    assert lines[4].startswith('FAILED test_requirements.py::test_pypy_does_not_exist')
+    assert lines[5] == '2 passed, 1 failed'
+
+
+def test_watch_revision(repository, capsys):
+    """Only a working directory can be watched"""
+    with pytest.raises(SystemExit) as exc_info:
+        audit_package([str(repository), '--rev', 'HEAD', '--watch'])
+    assert exc_info.value.code == 2
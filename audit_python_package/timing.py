@@ -0,0 +1,119 @@
+# encoding: utf-8
+"""
+Instrumentation for finding out where audit time is spent.  Code paths of
+interest (checks, fixtures, test collection, file parsing, subprocess calls,
+etc.) are wrapped in ``timed()``, which records the wall clock time, CPU
+time, and bytes read through the package's file helpers while the global
+``RECORDER`` is enabled, and does almost nothing otherwise.
+"""
+
+from __future__ import print_function, unicode_literals
+
+from collections import OrderedDict
+import codecs
+from contextlib import contextmanager
+import sys
+import time
+
+_wall_clock = getattr(time, 'perf_counter', time.time)
+_cpu_clock = getattr(time, 'process_time', None) or time.clock
+
+
+class TimingRecorder(object):
+    """Accumulates timing samples, aggregated by kind and name"""
+
+    def __init__(self):
+        self.enabled = False
+        self.totals = OrderedDict()
+
+    def record(self, kind, name, wall, cpu, bytes_read=0):
+        """Add a sample for the named operation of the given kind (like
+        ``'check'``, ``'fixture'``, or ``'subprocess'``)"""
+        key = (kind, name)
+        totals = self.totals.get(key)
+        if totals is None:
+            totals = self.totals[key] = [0, 0.0, 0.0, 0]
+        totals[0] += 1
+        totals[1] += wall
+        totals[2] += cpu
+        totals[3] += bytes_read
+
+    @contextmanager
+    def measure(self, kind, name):
+        """Context manager which records a sample for the code it wraps"""
+        from audit_python_package import FILE_CACHE
+        bytes_before = FILE_CACHE.bytes_read
+        wall_before = _wall_clock()
+        cpu_before = _cpu_clock()
+        try:
+            yield
+        finally:
+            self.record(kind, name, _wall_clock() - wall_before, _cpu_clock() - cpu_before,
+                        FILE_CACHE.bytes_read - bytes_before)
+
+    def samples(self):
+        """Get the aggregated samples as a list of dictionaries, slowest first"""
+        result = []
+        for (kind, name), (calls, wall, cpu, bytes_read) in self.totals.items():
+            result.append(OrderedDict([('kind', kind), ('name', name), ('calls', calls), ('wall', wall),
+                                       ('cpu', cpu), ('bytes_read', bytes_read)]))
+        result.sort(key=lambda sample: sample['wall'], reverse=True)
+        return result
+
+    def format_table(self, count, stream=None):
+        """Print a table of the slowest ``count`` operations"""
+        stream = stream or sys.stdout
+        print('{:>10} {:>10} {:>6} {:>10}  {:<10} {}'.format('wall (s)', 'cpu (s)', 'calls', 'bytes', 'kind', 'name'),
+              file=stream)
+        for sample in self.samples()[:count]:
+            print('{wall:10.4f} {cpu:10.4f} {calls:6d} {bytes_read:10d}  {kind:<10} {name}'.format(**sample),
+                  file=stream)
+
+    def dump(self, path):
+        """Save all of the samples to a JSON file"""
+        import json
+        data = OrderedDict([('python', '{0}.{1}.{2}'.format(*sys.version_info[:3])),
+                            ('samples', self.samples())])
+        with codecs.open(path, 'w', 'utf-8') as f:
+            f.write(json.dumps(data, indent=1))
+
+    def merge(self, totals):
+        """Add samples aggregated by another recorder (like one in a worker
+        process), given as its ``totals``"""
+        for (kind, name), (calls, wall, cpu, bytes_read) in totals.items():
+            key = (kind, name)
+            existing = self.totals.get(key)
+            if existing is None:
+                existing = self.totals[key] = [0, 0.0, 0.0, 0]
+            existing[0] += calls
+            existing[1] += wall
+            existing[2] += cpu
+            existing[3] += bytes_read
+
+    def clear(self):
+        """Discard all recorded samples"""
+        self.totals.clear()
+
+
+#: The recorder used by timed(); samples are only taken while it's enabled
+RECORDER = TimingRecorder()
+
+
+@contextmanager
+def timed(kind, name):
+    """Context manager which records the time taken by the code it wraps, if
+    timing has been enabled"""
+    if not RECORDER.enabled:
+        yield
+        return
+    with RECORDER.measure(kind, name):
+        yield
+
+
+def load_timings(path):
+    """Load the samples from a JSON file saved by TimingRecorder.dump(),
+    as a dictionary of wall clock times keyed by (kind, name)"""
+    import json
+    with codecs.open(path, 'r', 'utf-8') as f:
+        data = json.loads(f.read())
+    return {(sample['kind'], sample['name']): sample['wall'] for sample in data['samples']}
@@ -0,0 +1,129 @@
+# encoding: utf-8
+"""
+Loading of the table of preferred package versions from
+``data/requirements.txt``.  Each entry is either an exact version
+(``Jinja2==2.8``) or any other PEP 440 version specifier
+(``Sphinx>=1.3,<1.4``); entries can be looked up by any spelling of the
+package name which normalizes to the same name under PEP 503.  The table is
+only loaded when first used, so
+importing the package (for example to run one of its command line scripts)
+doesn't pay for reading and parsing it.  When the package is built, the
+table is also precompiled into a ``_versions`` module which is used instead
+of parsing the text file when available.
+
+This module is also run directly by setup.py when building the package, so
+it must not import anything outside of the standard library.
+"""
+
+from __future__ import unicode_literals
+
+import codecs
+import re
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+#: Name of the module (within this package) the precompiled table is written to
+PRECOMPILED_MODULE = '_versions'
+
+_ENTRY = re.compile(r'([A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?)\s*(?:\[[^\]]*\])?\s*([<>=!~].*)$')
+
+
+def normalize_name(name):
+    """Normalize a package name as described in PEP 503"""
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def preferred_value(specifier):
+    """The value recorded for a version specifier (with whitespace removed)
+    in the versions table: just the version for an exact pin, or the whole
+    specifier otherwise"""
+    if specifier.startswith('==') and not specifier.startswith('===') and ',' not in specifier:
+        return specifier[2:]
+    return specifier
+
+
+class LazyVersions(Mapping):
+    """Read-only mapping of package names to preferred versions (or version
+    specifiers), which is populated by calling the given loader function on
+    first access.  Keys are matched after PEP 503 normalization, so
+    ``VERSIONS['jinja2']`` finds the entry for ``Jinja2``."""
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._versions = None
+        self._normalized = None
+
+    @property
+    def loaded(self):
+        """True if the table has been loaded yet"""
+        return self._versions is not None
+
+    def _get_versions(self):
+        if self._versions is None:
+            versions = self._loader()
+            self._normalized = {normalize_name(name): version for name, version in versions.items()}
+            self._versions = versions
+        return self._versions
+
+    def __getitem__(self, key):
+        versions = self._get_versions()
+        if key in versions:
+            return versions[key]
+        return self._normalized[normalize_name(key)]
+
+    def __contains__(self, key):
+        return key in self._get_versions() or normalize_name(key) in self._normalized
+
+    def __iter__(self):
+        return iter(self._get_versions())
+
+    def __len__(self):
+        return len(self._get_versions())
+
+    def __repr__(self):
+        return 'LazyVersions({!r})'.format(self._get_versions())
+
+
+def parse_versions_file(path):
+    """Parse a file of ``name==version`` (or other version specifier) lines,
+    like data/requirements.txt, into a dictionary"""
+    result = {}
+    with codecs.open(path, 'r', 'utf-8') as f:
+        for line in f:
+            line = line.partition(';')[0].partition(' #')[0].strip()
+            match = _ENTRY.match(line)
+            if match:
+                result[match.group(1)] = preferred_value(re.sub(r'\s+', '', match.group(2)))
+    return result
+
+
+def write_versions_module(source_path, module_path):
+    """Precompile the versions file at source_path into a Python module"""
+    import json
+    versions = parse_versions_file(source_path)
+    lines = [
+        '# encoding: utf-8',
+        '# Generated from data/requirements.txt when the package was built; do not edit.',
+        'from __future__ import unicode_literals',
+        '',
+        'VERSIONS = {',
+    ]
+    for name in sorted(versions, key=lambda key: key.lower()):
+        lines.append('    {}: {},'.format(json.dumps(name), json.dumps(versions[name])))
+    lines.append('}')
+    with codecs.open(module_path, 'w', 'utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def load_versions(fallback):
+    """Get the preferred versions table from the precompiled module if the
+    package was built with one, or from the given fallback function (which
+    parses the text file) otherwise"""
+    try:
+        from audit_python_package._versions import VERSIONS
+    except ImportError:
+        return fallback()
+    return dict(VERSIONS)
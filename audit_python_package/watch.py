@@ -0,0 +1,163 @@
+# encoding: utf-8
+"""
+Watch mode for ``audit_package``, which stays running while problems are
+being fixed instead of starting a new audit each time.  Everything loaded by
+the first run (the check modules, the cached and parsed content of each
+file, the requirements graph, and ``VERSIONS``) stays in memory.  The files
+each module of checks reads (see incremental.CHECK_INPUTS, plus any files
+the requirements files include) are polled with just a stat call apiece, and when any of them are added, removed, or
+modified only the checks in the modules which read them are re-run.
+"""
+
+from __future__ import unicode_literals
+
+from fnmatch import fnmatch
+import os
+import time
+
+from audit_python_package.incremental import CHECK_INPUTS, referenced_paths
+from audit_python_package.report import PASSED
+
+
+def _has_wildcard(pattern):
+    return any(character in pattern for character in '*?[')
+
+
+def _signature(stat_result):
+    return getattr(stat_result, 'st_mtime_ns', stat_result.st_mtime), stat_result.st_size, stat_result.st_mode
+
+
+class Watcher(object):
+    """Re-runs the given checks (a list from ``CheckEngine.checks()``)
+    against the repository at ``root`` as the files they read change.
+    Checks in modules whose inputs aren't known are re-run after any
+    change.  ``keyword`` is the keyword expression the checks were selected
+    by, if any."""
+
+    def __init__(self, engine, checks, root='.', keyword=None):
+        self.engine = engine
+        self.checks = checks
+        self.root = root
+        self.keyword = keyword
+        self.results = {}
+        self.modules = []
+        for check in checks:
+            if check.module_name not in self.modules:
+                self.modules.append(check.module_name)
+        patterns = set()
+        for module_name in self.modules:
+            patterns.update(CHECK_INPUTS.get(module_name, ()))
+        self._files = sorted(pattern for pattern in patterns if not _has_wildcard(pattern))
+        self._directories = {}
+        for pattern in patterns:
+            if _has_wildcard(pattern):
+                directory, name_pattern = pattern.rsplit('/', 1) if '/' in pattern else ('.', pattern)
+                self._directories.setdefault(directory, []).append(name_pattern)
+        self._referenced = {}
+        self._snapshot = None
+
+    def snapshot(self):
+        """Get a dictionary of (modification time, size, mode) tuples for the
+        existing files matching any of the watched patterns, keyed by path
+        relative to the repository root"""
+        snapshot = {}
+        referenced = set(path for paths in self._referenced.values() for path in paths)
+        for path in self._files + sorted(referenced):
+            try:
+                snapshot[path] = _signature(os.stat(os.path.join(self.root, path)))
+            except OSError:
+                pass
+        scandir = getattr(os, 'scandir', None)
+        for directory, name_patterns in self._directories.items():
+            full_path = os.path.join(self.root, directory)
+            try:
+                if scandir is not None:
+                    entries = [(entry.name, entry) for entry in scandir(full_path)]
+                else:
+                    entries = [(name, None) for name in os.listdir(full_path)]
+            except OSError:
+                continue
+            for name, entry in entries:
+                if name.startswith('.') or not any(fnmatch(name, pattern) for pattern in name_patterns):
+                    continue
+                try:
+                    stat_result = entry.stat() if entry is not None else os.stat(os.path.join(full_path, name))
+                except OSError:
+                    continue
+                snapshot[name if directory == '.' else '{}/{}'.format(directory, name)] = _signature(stat_result)
+        return snapshot
+
+    def affected_modules(self, changed_paths):
+        """List the watched modules of checks which read any of the given
+        paths (relative to the repository root)"""
+        affected = []
+        for module_name in self.modules:
+            patterns = CHECK_INPUTS.get(module_name)
+            if patterns is None or any(fnmatch(path, pattern) for path in changed_paths for pattern in patterns):
+                affected.append(module_name)
+            elif self._referenced.get(module_name, set()).intersection(changed_paths):
+                affected.append(module_name)
+        return affected
+
+    def run(self, module_names=None):
+        """Run the checks in the named modules (by default, all of them),
+        returning the list of new CheckResults"""
+        checks = self.checks if module_names is None else [
+            check for check in self.checks if check.module_name in module_names]
+        results = self.engine.run(self.root, self.keyword, checks)
+        for result in results:
+            self.results[result.check] = result
+        self._update_referenced()
+        return results
+
+    def _update_referenced(self):
+        """Find the files referenced by the watched input files (which can
+        change along with them), and start watching any new ones"""
+        previous = set(path for paths in self._referenced.values() for path in paths)
+        self._referenced = {}
+        for module_name in self.modules:
+            paths = referenced_paths(module_name, self.root)
+            if paths:
+                self._referenced[module_name] = set(paths)
+        if self._snapshot is None:
+            return
+        for paths in self._referenced.values():
+            for path in paths.difference(previous, self._files):
+                try:
+                    self._snapshot[path] = _signature(os.stat(os.path.join(self.root, path)))
+                except OSError:
+                    pass
+
+    def poll(self):
+        """Check the watched files for changes, re-running the affected
+        checks if there are any.  The first call runs all of the checks.
+        Returns a (changed paths, new results) pair, where both are empty if
+        nothing has changed."""
+        snapshot = self.snapshot()
+        if self._snapshot is None:
+            self._snapshot = snapshot
+            return [], self.run()
+        previous, self._snapshot = self._snapshot, snapshot
+        changed = sorted(path for path in set(previous) | set(snapshot) if previous.get(path) != snapshot.get(path))
+        if not changed:
+            return [], []
+        return changed, self.run(self.affected_modules(changed))
+
+    def current_results(self):
+        """The latest result of each check, in the order the checks run"""
+        return [self.results[check.id] for check in self.checks if check.id in self.results]
+
+    def failures(self):
+        """The latest results of the checks which didn't pass"""
+        return [result for result in self.current_results() if result.outcome != PASSED]
+
+    def watch(self, callback, interval=0.25):
+        """Poll for changes every ``interval`` seconds until interrupted,
+        passing the changed paths, new results, and time taken to re-run
+        them to ``callback`` after the first run and after each change"""
+        while True:
+            start = time.time()
+            changed, results = self.poll()
+            if results or changed:
+                callback(changed, results, time.time() - start)
+            time.sleep(interval)
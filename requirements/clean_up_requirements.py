@@ -9,6 +9,12 @@ Utility to uninstall any installed packages listed in uninstall.txt.  Can't use
 which isn't currently installed.  Also installs the currently-recommended
 versions of setuptools and pip from requirements/base.txt (to avoid needing
 to replicate this logic in git-hooks/post-merge, tox.ini, quilter, etc.)
+
+This runs in every tox environment and after every merge, and there's
+usually nothing for it to do.  So the installed distributions are found by
+listing each directory in sys.path once (without importing pip or
+pkg_resources, which are slow to import), and pip is only run if something
+actually needs to be uninstalled or installed; at most once for each.
 """
 
 from __future__ import print_function, unicode_literals
@@ -16,38 +22,65 @@ from __future__ import print_function, unicode_literals
 import codecs
 import os
 import re
+import subprocess
+import sys
+
+
+def canonical_name(name):
+    """Normalize a project name for comparison, as pip does"""
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def installed_distributions():
+    """Get a dictionary of the installed version of each distribution (or
+    None for a development install) keyed by canonical project name"""
+    installed = {}
+    for directory in sys.path:
+        try:
+            names = os.listdir(directory or os.curdir)
+        except OSError:
+            continue
+        for name in names:
+            base, extension = os.path.splitext(name)
+            if extension in ('.dist-info', '.egg-info'):
+                parts = base.split('-')
+                installed.setdefault(canonical_name(parts[0]), parts[1] if len(parts) > 1 else None)
+            elif extension == '.egg-link':
+                installed.setdefault(canonical_name(base), None)
+    return installed
 
-from pip.download import PipSession
-from pip.exceptions import UninstallationError
-from pip.index import PackageFinder
-from pip.req import parse_requirements
+
+def requirement_names(path):
+    """Get the names of the packages listed in a requirements file"""
+    names = []
+    with codecs.open(path, 'r', 'utf-8') as f:
+        for line in f:
+            match = re.match(r'\s*([A-Za-z0-9][A-Za-z0-9._-]*)', line.split('#', 1)[0])
+            if match:
+                names.append(match.group(1))
+    return names
 
 
 if __name__ == '__main__':
     requirements_dir = os.path.abspath(os.path.dirname(__file__))
     requirements_path = os.path.join(requirements_dir, 'uninstall.txt')
+    installed = installed_distributions()
 
-    session = PipSession()
-    finder = PackageFinder([], [], session=session)
-    requirements = parse_requirements(requirements_path, finder, session=session)
-    print('Uninstalling former requirements...')
-    for req in requirements:
-        try:
-            req.uninstall(auto_confirm=True)
-            print('Uninstalled {}'.format(req.name))
-        except UninstallationError as e:
-            if 'not installed' in str(e):
-                # Good, the whole point was that we don't want it installed
-                pass
-            else:
-                # We probably want to hear about any other uninstallation problems
-                raise
-    print('Done')
+    former = [name for name in requirement_names(requirements_path) if canonical_name(name) in installed]
+    if former:
+        print('Uninstalling former requirements...')
+        subprocess.check_call([sys.executable, '-m', 'pip', 'uninstall', '-y'] + former)
+        print('Done')
 
     # Install the currently recommended setuptools and pip versions
-    with codecs.open('requirements/base.txt', 'r', 'utf-8') as f:
+    with codecs.open(os.path.join(requirements_dir, 'base.txt'), 'r', 'utf-8') as f:
         requirements = f.read()
+    install = []
     match = re.search(r'^setuptools==([\d\.]+)$', requirements, re.MULTILINE)
-    os.system('pip install setuptools=={}'.format(match.group(1)))
+    if installed.get('setuptools') != match.group(1):
+        install.append('setuptools=={}'.format(match.group(1)))
     match = re.search(r'^pip==([\d\.]+)$', requirements, re.MULTILINE)
-    os.system('pip install pip=={}'.format(match.group(1)))
+    if installed.get('pip') != match.group(1):
+        install.append('pip=={}'.format(match.group(1)))
+    if install:
+        subprocess.check_call([sys.executable, '-m', 'pip', 'install'] + install)
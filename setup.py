@@ -8,11 +8,16 @@ audit-python-package setup script
 from __future__ import unicode_literals
 
 import codecs
+import os
+import runpy
+
 from setuptools import find_packages, setup
+from setuptools.command.build_py import build_py
 
 version = '1.7.6'  # Don't forget to update docs/CHANGELOG.rst if you increment the version
 
 install_requires = [
+    'packaging',
     'pytest-cov',
     'readme_renderer',
     'requires.io==0.2.5'
@@ -21,6 +26,22 @@ install_requires = [
 with codecs.open('README.rst', 'r', 'utf-8') as f:
     long_description = f.read()
 
+
+class BuildPy(build_py):
+    """Also precompile the table of preferred versions in data/requirements.txt
+    into a module, so it doesn't need to be parsed at runtime"""
+
+    def run(self):
+        build_py.run(self)
+        if self.dry_run:
+            return
+        versions = runpy.run_path(os.path.join('audit_python_package', 'versions.py'))
+        source_path = os.path.join('audit_python_package', 'data', 'requirements.txt')
+        module_path = os.path.join(self.build_lib, 'audit_python_package',
+                                   '{}.py'.format(versions['PRECOMPILED_MODULE']))
+        versions['write_versions_module'](source_path, module_path)
+
+
 setup(
     name='audit-python-package',
     version=version,
@@ -43,10 +64,19 @@ setup(
     description='Checks for compliance with current Python packaging best practices',
     long_description=long_description,
     url='http://github.com/safarijv/audit-python-package',
+    cmdclass={'build_py': BuildPy},
     packages=find_packages(exclude=['ez_setup']),
     include_package_data=True,
     entry_points={
-        'console_scripts': ['upload_requirements=audit_python_package.command_line:upload_requirements']
+        'console_scripts': [
+            'audit_fleet=audit_python_package.command_line:audit_fleet',
+            'audit_history=audit_python_package.command_line:audit_history',
+            'audit_merge=audit_python_package.command_line:audit_merge',
+            'audit_package=audit_python_package.command_line:audit_package',
+            'audit_pins=audit_python_package.command_line:audit_pins',
+            'install_requirements=audit_python_package.command_line:install_requirements',
+            'upload_requirements=audit_python_package.command_line:upload_requirements',
+        ]
     },
     scripts=[],
     zip_safe=True,